@@ -0,0 +1,404 @@
+"""
+Traffic generation and measurement.
+
+A mix (mixes/*.json) describes the traffic: how many requests, at what
+concurrency (closed loop) or arrival rate (open loop, Poisson), the text
+length distribution, how many voices and how skewed their popularity is,
+and which share of requests are exact repeats (seeded, so cache-eligible),
+streamed, or memory searches. build_samples() turns it into a deterministic
+request list, so two commits are measured against identical traffic.
+
+Results are plain JSON: one entry per concurrency level with latency and
+time-to-first-byte percentiles, throughput, error/reject counts and peak RSS.
+compare() diffs two result files and flags regressions.
+"""
+
+import asyncio
+import base64
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import time
+import wave
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from targets import REPO_ROOT, RejectedError, Sample, Target
+
+DEFAULT_MIX = {
+    "requests": 50,
+    "concurrency": 1,
+    "rate": None,                # requests/s; None = closed loop
+    "warmup": 2,
+    "texts": [{"weight": 1, "min_chars": 40, "max_chars": 160}],
+    "voices": 4,
+    "voice_skew": 1.0,           # Zipf exponent over voices (0 = uniform)
+    "repeat_fraction": 0.0,
+    "stream_fraction": 0.0,
+    "search_fraction": 0.0,      # memory targets: /memory/search instead of /memory/add
+    "options": {},               # extra input fields sent with every request
+    "seed": 1234,
+}
+
+WORDS = (
+    "the a quiet storm over harbor lights we kept walking until morning and nobody said "
+    "anything about what happened on that bridge you know I never trusted the captain "
+    "but his map was right every time listen carefully because this matters more than "
+    "gold or glory remember the old song your mother used to hum by the fire"
+).split()
+
+RSS_SAMPLE_INTERVAL_S = 0.05
+
+
+@dataclass
+class Outcome:
+    status: str                      # "ok" | "error" | "rejected"
+    ttfb: float = 0.0                # seconds to the first response chunk
+    latency: float = 0.0             # seconds to the last response chunk
+    chunks: int = 0
+    audio_seconds: float = 0.0
+    bytes: int = 0
+    cached: bool = False
+    error: Optional[str] = None
+
+
+# ---------- traffic ----------
+
+def load_mix(path: Optional[str]) -> dict:
+    mix = dict(DEFAULT_MIX)
+    if path:
+        with open(path) as f:
+            mix.update(json.load(f))
+    return mix
+
+
+def make_text(rng: random.Random, min_chars: int, max_chars: int) -> str:
+    target = rng.randint(min_chars, max_chars)
+    sentences, length = [], 0
+    while length < target:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(5, 14))]
+        sentence = " ".join(words).capitalize() + rng.choice((".", ".", "!", "?"))
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)[:max_chars]
+
+
+def build_samples(mix: dict, count: int) -> List[Sample]:
+    rng = random.Random(mix["seed"])
+    voices = max(1, int(mix["voices"]))
+    voice_weights = [1.0 / (i + 1) ** mix["voice_skew"] for i in range(voices)]
+    buckets = mix["texts"]
+    bucket_weights = [b.get("weight", 1) for b in buckets]
+
+    samples: List[Sample] = []
+    for index in range(count):
+        kind = "search" if rng.random() < mix["search_fraction"] else "tts"
+        if samples and rng.random() < mix["repeat_fraction"]:
+            # An earlier request again, byte for byte (a popular greeting, a replayed line)
+            earlier = rng.choice([s for s in samples if s.seed is not None] or samples)
+            seed = earlier.seed if earlier.seed is not None else rng.randint(1, 2**31 - 1)
+            earlier.seed = seed
+            samples.append(Sample(index, earlier.kind, earlier.text, earlier.voice, seed, earlier.stream))
+            continue
+        bucket = rng.choices(buckets, bucket_weights)[0]
+        samples.append(Sample(
+            index=index,
+            kind=kind,
+            text=make_text(rng, bucket["min_chars"], bucket["max_chars"]),
+            voice=rng.choices(range(voices), voice_weights)[0],
+            stream=rng.random() < mix["stream_fraction"],
+        ))
+    return samples
+
+
+# ---------- measurement ----------
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def chunk_audio(chunk: dict) -> str:
+    """Base64 audio of a response chunk (Chatterbox calls the field audio_base64)"""
+    return chunk.get("audio") or chunk.get("audio_base64") or ""
+
+
+def audio_seconds(chunk: dict) -> float:
+    """Duration of a response's audio, when the format makes it cheap to tell"""
+    audio = chunk_audio(chunk)
+    if not audio:
+        return 0.0
+    fmt = chunk.get("format", "wav")
+    try:
+        raw = base64.b64decode(audio)
+        if fmt == "wav":
+            with wave.open(io.BytesIO(raw)) as w:
+                return w.getnframes() / w.getframerate()
+        if fmt == "pcm" and chunk.get("sample_rate"):
+            return len(raw) / 2 / chunk["sample_rate"]
+    except Exception:
+        pass
+    return 0.0
+
+
+async def measure(target: Target, sample: Sample, options: dict, start: Optional[float] = None) -> Outcome:
+    """`start`: when the request was due (open loop), so time spent queued for a client counts"""
+    payload = target.payload(sample, options)
+    start = time.perf_counter() if start is None else start
+    outcome = Outcome(status="ok")
+    chunks = []
+    try:
+        async for chunk in target.call(payload):
+            if not chunks:
+                outcome.ttfb = time.perf_counter() - start
+            chunks.append(chunk)
+    except RejectedError as e:
+        return Outcome(status="rejected", latency=time.perf_counter() - start, error=str(e))
+    except Exception as e:
+        return Outcome(status="error", latency=time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+    outcome.latency = time.perf_counter() - start
+
+    # Generator handlers called in-process may also hand back the aggregated list
+    if len(chunks) == 1 and isinstance(chunks[0], list):
+        chunks = chunks[0]
+    outcome.chunks = len(chunks)
+    for chunk in chunks:
+        if not isinstance(chunk, dict):
+            continue
+        if chunk.get("error"):
+            outcome.status = "error"
+            outcome.error = str(chunk["error"])
+        outcome.cached = outcome.cached or bool(chunk.get("cached"))
+        outcome.bytes += len(chunk_audio(chunk)) * 3 // 4
+        outcome.audio_seconds += audio_seconds(chunk)
+    return outcome
+
+
+class RSSSampler:
+    """Peak resident set size over one run (ru_maxrss only ever grows across runs)"""
+
+    def __init__(self):
+        self.peak = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sample(self):
+        while True:
+            self.peak = max(self.peak, current_rss_mb())
+            await asyncio.sleep(RSS_SAMPLE_INTERVAL_S)
+
+    def __enter__(self):
+        self.peak = current_rss_mb()
+        self._task = asyncio.create_task(self._sample())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+async def run_load(target: Target, samples: List[Sample], concurrency: int,
+                   rate: Optional[float], options: dict, seed: int = 0):
+    """-> (outcomes, wall seconds). Closed loop with `concurrency` clients, or Poisson arrivals at `rate`"""
+    outcomes: List[Outcome] = []
+    start = time.perf_counter()
+
+    if rate:
+        rng = random.Random(seed)
+        limit = asyncio.Semaphore(concurrency)
+
+        async def arrival(sample, due):
+            # Latency runs from the scheduled arrival, not from when a client
+            # frees up, or a slow service would hide its own queueing delay
+            async with limit:
+                outcomes.append(await measure(target, sample, options, start=due))
+
+        tasks = []
+        due = start
+        for sample in samples:
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(arrival(sample, due)))
+            due += rng.expovariate(rate)
+        await asyncio.gather(*tasks)
+    else:
+        pending = iter(samples)
+
+        async def client():
+            for sample in pending:
+                outcomes.append(await measure(target, sample, options))
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    return outcomes, time.perf_counter() - start
+
+
+# ---------- statistics ----------
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def distribution_ms(values: List[float]) -> Dict[str, float]:
+    ms = [v * 1000 for v in values]
+    return {
+        "p50": round(percentile(ms, 50), 2),
+        "p95": round(percentile(ms, 95), 2),
+        "p99": round(percentile(ms, 99), 2),
+        "mean": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "max": round(max(ms), 2) if ms else 0.0,
+    }
+
+
+def summarize(outcomes: List[Outcome], wall: float, concurrency: int, rate: Optional[float],
+              peak_rss: float) -> dict:
+    ok = [o for o in outcomes if o.status == "ok"]
+    errors = [o for o in outcomes if o.status == "error"]
+    audio = sum(o.audio_seconds for o in ok)
+    return {
+        "concurrency": concurrency,
+        "rate": rate,
+        "requests": len(outcomes),
+        "ok": len(ok),
+        "errors": len(errors),
+        "rejected": sum(o.status == "rejected" for o in outcomes),
+        "cached": sum(o.cached for o in ok),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall else 0.0,
+        "audio_seconds_per_second": round(audio / wall, 3) if wall else 0.0,
+        "latency_ms": distribution_ms([o.latency for o in ok]),
+        "ttfb_ms": distribution_ms([o.ttfb for o in ok]),
+        "mean_chunks": round(sum(o.chunks for o in ok) / len(ok), 2) if ok else 0.0,
+        "peak_rss_mb": round(peak_rss, 1),
+        "sample_errors": sorted({o.error for o in errors})[:5],
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+async def benchmark(target: Target, engine: str, mix: dict, concurrency_levels: List[int]) -> dict:
+    started = time.perf_counter()
+    await target.load(engine)
+    startup = time.perf_counter() - started
+    print(f"[Bench] {target.name} ({engine}) ready in {startup:.2f}s")
+
+    result = {
+        "target": target.name,
+        "engine": engine,
+        "mix": mix,
+        "environment": environment(),
+        "startup_seconds": round(startup, 3),
+        "runs": [],
+    }
+    try:
+        if mix["warmup"]:
+            await run_load(target, build_samples({**mix, "seed": mix["seed"] + 1}, mix["warmup"]),
+                           1, None, mix["options"])
+        for concurrency in concurrency_levels:
+            # A server-side limit below the client concurrency just queues requests
+            if target.max_concurrency and concurrency > target.max_concurrency:
+                print(f"[Bench] {target.name} serves {target.max_concurrency} at a time; "
+                      f"{concurrency} clients will queue")
+            samples = build_samples(mix, mix["requests"])
+            with RSSSampler() as rss:
+                outcomes, wall = await run_load(target, samples, concurrency, mix["rate"],
+                                                mix["options"], mix["seed"])
+            run = summarize(outcomes, wall, concurrency, mix["rate"], rss.peak)
+            result["runs"].append(run)
+            print(f"[Bench] c={concurrency}: {run['throughput_rps']} req/s, "
+                  f"p50 {run['latency_ms']['p50']}ms, p95 {run['latency_ms']['p95']}ms, "
+                  f"p99 {run['latency_ms']['p99']}ms, ttfb p50 {run['ttfb_ms']['p50']}ms, "
+                  f"errors {run['errors']}, rejected {run['rejected']}, rss {run['peak_rss_mb']}MB")
+    finally:
+        await target.close()
+    result["process_peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return result
+
+
+# ---------- comparison ----------
+
+# metric path -> True when higher is better
+COMPARED_METRICS = {
+    ("latency_ms", "p50"): False,
+    ("latency_ms", "p95"): False,
+    ("latency_ms", "p99"): False,
+    ("ttfb_ms", "p50"): False,
+    ("ttfb_ms", "p95"): False,
+    ("throughput_rps",): True,
+    ("peak_rss_mb",): False,
+}
+
+
+def metric(run: dict, path) -> float:
+    value = run
+    for key in path:
+        value = value[key]
+    return value
+
+
+def compare(base: dict, head: dict, threshold: float) -> List[str]:
+    """Print a per-run diff; returns the regressions beyond `threshold` (relative)"""
+    regressions = []
+    base_runs = {run["concurrency"]: run for run in base["runs"]}
+    print(f"[Bench] {base['target']}: {base['environment'].get('commit')} -> {head['environment'].get('commit')}")
+    for run in head["runs"]:
+        before = base_runs.get(run["concurrency"])
+        if before is None:
+            continue
+        print(f"  concurrency {run['concurrency']}")
+        for path, higher_is_better in COMPARED_METRICS.items():
+            old, new = metric(before, path), metric(run, path)
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > threshold else ""
+            name = ".".join(path)
+            print(f"    {name:<18} {old:>10.2f} -> {new:>10.2f}  {change:+7.1%} {flag}")
+            if flag:
+                regressions.append(f"c={run['concurrency']} {name} {change:+.1%}")
+        if run["errors"] > before["errors"]:
+            regressions.append(f"c={run['concurrency']} errors {before['errors']} -> {run['errors']}")
+    return regressions
+
+
+def write_result(result: dict, path: Optional[str]):
+    text = json.dumps(result, indent=2)
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text + "\n")
+        print(f"[Bench] Wrote {path}")
+    else:
+        print(text)
+
@@ -0,0 +1,181 @@
+"""
+Offline load tests for the TTS workers and the memory service.
+
+    python benchmarks/run.py run fastmaya --mix benchmarks/mixes/tts_chat.json --out results/fastmaya.json
+    python benchmarks/run.py run cognee --mix benchmarks/mixes/memory.json --concurrency 1,8,32
+    python benchmarks/run.py run f5-server --engine real            # needs the model weights
+    python benchmarks/run.py run chatterbox --url http://gpu-box:8000 --engine real
+    python benchmarks/run.py all --out-dir results/$(git rev-parse --short HEAD)
+    python benchmarks/run.py compare results/base/fastmaya.json results/head/fastmaya.json
+    python benchmarks/run.py smoke                                   # every service imports and serves
+
+Targets: chatterbox, f5, f5-server, fastmaya, cognee. With --engine stub
+(the default) model packages are replaced by stubs.py, so everything runs on
+a CPU-only box without network or weights.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MIXES_DIR = os.path.join(BENCH_DIR, "mixes")
+
+# Default mix per target
+TARGET_MIXES = {
+    "chatterbox": "tts_chat.json",
+    "f5": "tts_chat.json",
+    "f5-server": "tts_chat.json",
+    "fastmaya": "tts_chat.json",
+    "cognee": "memory.json",
+}
+
+
+def parse_levels(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def run_target(args) -> int:
+    # Stub timings are read at import, so set the scale before anything loads
+    if args.stub_speed is not None:
+        os.environ["BENCH_STUB_SPEED"] = str(args.stub_speed)
+    sys.path.insert(0, BENCH_DIR)
+
+    import loadgen
+    from targets import TARGETS, HttpTarget
+
+    mix = loadgen.load_mix(args.mix or os.path.join(MIXES_DIR, TARGET_MIXES[args.target]))
+    if args.requests:
+        mix["requests"] = args.requests
+    if args.rate is not None:
+        mix["rate"] = args.rate or None
+    levels = parse_levels(args.concurrency) if args.concurrency else mix["concurrency"]
+    if isinstance(levels, int):
+        levels = [levels]
+
+    target = TARGETS[args.target]()
+    if args.url:
+        target = HttpTarget(target, args.url)
+
+    result = asyncio.run(loadgen.benchmark(target, args.engine, mix, levels))
+    if args.url:
+        result["url"] = args.url
+    loadgen.write_result(result, args.out)
+    if args.fail_on_error and any(run["errors"] or run["rejected"] for run in result["runs"]):
+        return 1
+    return 1 if any(run["ok"] == 0 for run in result["runs"]) else 0
+
+
+def run_each(names, args, out_dir=None, extra=()) -> int:
+    """Each target in its own process: the services share module names and global state"""
+    failed = []
+    for name in names:
+        out = os.path.join(out_dir, f"{name}.json") if out_dir else os.devnull
+        command = [sys.executable, os.path.abspath(__file__), "run", name, "--engine", args.engine, "--out", out, *extra]
+        if args.requests:
+            command += ["--requests", str(args.requests)]
+        if args.concurrency:
+            command += ["--concurrency", args.concurrency]
+        if args.stub_speed is not None:
+            command += ["--stub-speed", str(args.stub_speed)]
+        print(f"[Bench] === {name} ===")
+        if subprocess.run(command).returncode != 0:
+            failed.append(name)
+    if failed:
+        print(f"[Bench] Failed: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+def run_all(args) -> int:
+    return run_each(TARGET_MIXES, args, out_dir=args.out_dir)
+
+
+def run_smoke(args) -> int:
+    """Import every service and serve a couple of requests; any error fails the check"""
+    args.requests = args.requests or 2
+    args.concurrency = args.concurrency or "1"
+    if args.stub_speed is None:
+        args.stub_speed = 0.01
+    unknown = [name for name in args.targets if name not in TARGET_MIXES]
+    if unknown:
+        print(f"[Bench] Unknown target(s): {', '.join(unknown)} (choose from {', '.join(sorted(TARGET_MIXES))})")
+        return 2
+    return run_each(args.targets or TARGET_MIXES, args, extra=["--fail-on-error"])
+
+
+def run_compare(args) -> int:
+    sys.path.insert(0, BENCH_DIR)
+    import loadgen
+
+    regressions = []
+    pairs = [(args.base, args.head)]
+    if os.path.isdir(args.base):
+        pairs = [
+            (os.path.join(args.base, name), os.path.join(args.head, name))
+            for name in sorted(os.listdir(args.base))
+            if name.endswith(".json") and os.path.exists(os.path.join(args.head, name))
+        ]
+    for base_path, head_path in pairs:
+        with open(base_path) as f:
+            base = json.load(f)
+        with open(head_path) as f:
+            head = json.load(f)
+        regressions += [f"{head['target']}: {r}" for r in loadgen.compare(base, head, args.threshold)]
+
+    if regressions:
+        print(f"[Bench] {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("[Bench] No regressions")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline load tests for the character-chat services")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def common(p):
+        p.add_argument("--engine", choices=("stub", "real"), default="stub",
+                       help="stub: synthetic engines, CPU only (default); real: the actual models")
+        p.add_argument("--requests", type=int, help="Requests per concurrency level (overrides the mix)")
+        p.add_argument("--concurrency", help="Comma-separated client counts, e.g. 1,4,16 (overrides the mix)")
+        p.add_argument("--stub-speed", type=float, help="Scale stub durations (e.g. 0.1 for a smoke run)")
+
+    run = commands.add_parser("run", help="Benchmark one target")
+    run.add_argument("target", choices=sorted(TARGET_MIXES))
+    run.add_argument("--mix", help="Traffic mix JSON (default: per target, from mixes/)")
+    run.add_argument("--rate", type=float, help="Open loop: Poisson arrivals per second (0 = closed loop)")
+    run.add_argument("--url", help="Send requests to a running service instead of loading it in-process")
+    run.add_argument("--out", help="Write the result JSON here (default: stdout)")
+    run.add_argument("--fail-on-error", action="store_true", help="Exit 1 if any request errors or is rejected")
+    common(run)
+    run.set_defaults(func=run_target)
+
+    every = commands.add_parser("all", help="Benchmark every target, one result file each")
+    every.add_argument("--out-dir", required=True)
+    common(every)
+    every.set_defaults(func=run_all)
+
+    smoke = commands.add_parser("smoke", help="Import each service with stub engines and serve a few requests")
+    # No argparse choices: Python < 3.12 rejects an empty nargs="*" list against them
+    smoke.add_argument("targets", nargs="*", help=f"Any of {', '.join(sorted(TARGET_MIXES))} (default: all)")
+    common(smoke)
+    smoke.set_defaults(func=run_smoke)
+
+    diff = commands.add_parser("compare", help="Compare two result files (or directories)")
+    diff.add_argument("base")
+    diff.add_argument("head")
+    diff.add_argument("--threshold", type=float, default=0.10,
+                      help="Relative change that counts as a regression (default 0.10)")
+    diff.set_defaults(func=run_compare)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""
+Stub engines for offline benchmarking.
+
+Each stub stands in for a model package (chatterbox, Maya1, f5_tts, cognee)
+and is installed into sys.modules before the service module is imported, so
+the service code itself runs unmodified. Stubs produce synthetic audio of a
+plausible length and spend wall-clock time like the real engine would
+(StubTiming): a fixed overhead plus a real-time factor, with extra batch
+items costing only a fraction of the first. Sleeping releases the GIL the way
+a GPU kernel does, so queueing, batching and encoding behave realistically
+on a CPU-only box.
+
+`runpod.serverless.start` is always captured (stub or real engine) so the
+harness can call the handler directly.
+
+BENCH_STUB_SPEED scales every stub duration (e.g. 0.1 for quick smoke runs).
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import re
+import sys
+import time
+import types
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+BENCH_STUB_SPEED = float(os.environ.get("BENCH_STUB_SPEED", "1.0"))
+
+RUNPOD_CONFIG: Dict[str, object] = {}
+
+
+@dataclass
+class StubTiming:
+    """Wall-clock model of an inference engine"""
+    overhead_s: float
+    rtf: float                      # seconds of compute per second of audio, single item
+    batch_efficiency: float = 0.85  # share of each extra batch item's compute that overlaps the first
+    chars_per_second: float = 15.0  # speaking rate
+
+    def audio_seconds(self, text: str) -> float:
+        return max(0.3, len(text) / self.chars_per_second)
+
+    def seconds(self, texts: List[str], factor: float = 1.0) -> float:
+        durations = sorted((self.audio_seconds(t) for t in texts), reverse=True)
+        compute = durations[0] + sum(durations[1:]) * (1.0 - self.batch_efficiency)
+        return (self.overhead_s + compute * self.rtf * factor) * BENCH_STUB_SPEED
+
+    def run(self, texts: List[str], factor: float = 1.0):
+        time.sleep(self.seconds(texts, factor))
+
+
+# Defaults loosely follow the engines' published / observed speeds on an L40S
+CHATTERBOX_TIMING = StubTiming(overhead_s=0.15, rtf=0.35, batch_efficiency=0.0)
+F5_TIMING = StubTiming(overhead_s=0.05, rtf=0.12)   # at 32 NFE steps
+MAYA_TIMING = StubTiming(overhead_s=0.08, rtf=0.02)
+AUDIOSR_RTF = 0.03
+
+
+def synthetic_audio(text: str, sample_rate: int, timing: StubTiming, seed: int = 0) -> np.ndarray:
+    """Speech-length, speech-band test signal (a wobbling tone plus a little noise)"""
+    n = int(timing.audio_seconds(text) * sample_rate)
+    t = np.arange(n, dtype=np.float32) / sample_rate
+    pitch = 140.0 + 40.0 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    rng = np.random.default_rng(seed or len(text))
+    return (0.3 * np.sin(phase) + 0.02 * rng.standard_normal(n)).astype(np.float32)
+
+
+def fake_module(name: str, **attrs) -> types.ModuleType:
+    """Register a module (and any missing parent packages) in sys.modules"""
+    parts = name.split(".")
+    for i in range(1, len(parts)):
+        parent = ".".join(parts[:i])
+        if parent not in sys.modules:
+            sys.modules[parent] = types.ModuleType(parent)
+            sys.modules[parent].__path__ = []
+    module = types.ModuleType(name)
+    module.__path__ = []
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    if len(parts) > 1:
+        setattr(sys.modules[".".join(parts[:-1])], parts[-1], module)
+    return module
+
+
+# ---------- runpod ----------
+
+def capture_runpod():
+    def start(config):
+        RUNPOD_CONFIG.clear()
+        RUNPOD_CONFIG.update(config)
+
+    fake_module("runpod.serverless", start=start)
+
+
+# ---------- Chatterbox ----------
+
+class StubConditionals:
+    def __init__(self):
+        import torch
+        self.t3 = types.SimpleNamespace(speaker_emb=torch.zeros(256))
+        self.gen = {"prompt_feat": torch.zeros(150, 80)}
+
+
+class StubChatterboxTTS:
+    sr = 24000
+
+    def __init__(self, device="cpu"):
+        self.device = device
+        self.conds = StubConditionals()
+
+    @classmethod
+    def from_pretrained(cls, device="cpu"):
+        time.sleep(1.0 * BENCH_STUB_SPEED)
+        return cls(device)
+
+    @classmethod
+    def from_local(cls, path, device="cpu"):
+        return cls.from_pretrained(device)
+
+    def prepare_conditionals(self, wav_fpath, exaggeration=0.5):
+        time.sleep(0.2 * BENCH_STUB_SPEED)  # voice encoder + S3 tokenizer
+        self.conds = StubConditionals()
+
+    def generate(self, text, audio_prompt_path=None, exaggeration=0.5, temperature=0.8, **kwargs):
+        import torch
+        if audio_prompt_path:
+            self.prepare_conditionals(audio_prompt_path)
+        CHATTERBOX_TIMING.run([text])
+        return torch.from_numpy(synthetic_audio(text, self.sr, CHATTERBOX_TIMING)).unsqueeze(0)
+
+
+def install_chatterbox():
+    fake_module("chatterbox", ChatterboxTTS=StubChatterboxTTS)
+
+
+# ---------- FastMaya ----------
+
+SNAC_FRAME_SAMPLES = 2048
+SNAC_TOKENS_PER_FRAME = 7
+
+
+class StubSnac:
+    """SNAC decoder stand-in: 2048 samples per frame of codes"""
+
+    def __init__(self):
+        import torch
+        self._param = torch.zeros(1)
+
+    def parameters(self):
+        yield self._param
+
+    def decode(self, codes):
+        import torch
+        frames = codes[0].shape[-1]
+        time.sleep((0.004 + 0.0005 * frames) * BENCH_STUB_SPEED)
+        t = torch.arange(frames * SNAC_FRAME_SAMPLES, dtype=torch.float32) / 24000
+        return (0.3 * torch.sin(2 * math.pi * 160 * t)).reshape(1, 1, -1)
+
+
+class StubPipeline:
+    """lmdeploy-style pipeline emitting Maya-1 SNAC tokens at the engine's pace"""
+
+    def _tokens(self, prompt: str) -> List[int]:
+        from maya_stream import CODE_END_TOKEN_ID, CODE_TOKEN_OFFSET
+        text = prompt.split("> ", 1)[-1]
+        frames = int(MAYA_TIMING.audio_seconds(text) * 24000 / SNAC_FRAME_SAMPLES)
+        return [CODE_TOKEN_OFFSET + (i % 4096) for i in range(frames * SNAC_TOKENS_PER_FRAME)] + [CODE_END_TOKEN_ID]
+
+    def stream_infer(self, prompts, gen_config=None, do_preprocess=False):
+        tokens = self._tokens(prompts[0])
+        step = 8
+        time.sleep(MAYA_TIMING.overhead_s * BENCH_STUB_SPEED)
+        per_token = MAYA_TIMING.rtf * MAYA_TIMING.audio_seconds(prompts[0].split("> ", 1)[-1]) / len(tokens)
+        for i in range(0, len(tokens), step):
+            time.sleep(per_token * step * BENCH_STUB_SPEED)
+            yield types.SimpleNamespace(token_ids=tokens[i:i + step])
+
+    def __call__(self, prompts, gen_config=None, do_preprocess=False):
+        MAYA_TIMING.run([p.split("> ", 1)[-1] for p in prompts])
+        return [types.SimpleNamespace(token_ids=self._tokens(p)) for p in prompts]
+
+
+class StubTTSEngine:
+    def __init__(self, memory_util=0.8, tp=1, enable_prefix_caching=True):
+        time.sleep(2.0 * BENCH_STUB_SPEED)
+        self.pipe = StubPipeline()
+        self.gen_config = types.SimpleNamespace(random_seed=None)
+        self.snac_model = StubSnac()
+
+    def batch_generate(self, texts, descriptions, upsample=True):
+        MAYA_TIMING.run(texts)
+        if not upsample:
+            return [synthetic_audio(t, 24000, MAYA_TIMING) for t in texts]
+        time.sleep(sum(MAYA_TIMING.audio_seconds(t) for t in texts) * AUDIOSR_RTF * BENCH_STUB_SPEED)
+        return [synthetic_audio(t, 48000, MAYA_TIMING) for t in texts]
+
+    def generate(self, text, description, upsample=True):
+        return self.batch_generate([text], [description], upsample)[0]
+
+
+def install_maya():
+    fake_module("Maya1.tts_engine", TTSEngine=StubTTSEngine)
+
+
+# ---------- F5-TTS ----------
+
+@dataclass
+class StubF5Job:
+    gen_text: str
+    nfe_step: int = 32
+    seed: Optional[int] = None
+
+    @property
+    def cost(self) -> int:
+        # mel frames, same unit as BATCH_MAX_FRAMES
+        return int(F5_TIMING.audio_seconds(self.gen_text) * 24000 / 256) * 2
+
+    @property
+    def batch_key(self):
+        return (self.nfe_step, self.seed)
+
+
+class StubRefCache:
+    """Reference preprocessing (resample, trim, ASR when ref_text is empty), memoized by hash"""
+
+    def __init__(self):
+        self._seen = set()
+        self.hits = 0
+        self.misses = 0
+
+    def prepare(self, ref_audio: bytes, ref_text: str):
+        digest = hashlib.sha256(ref_audio).hexdigest()
+        if digest in self._seen:
+            self.hits += 1
+            return
+        self.misses += 1
+        time.sleep((0.05 if ref_text else 0.8) * BENCH_STUB_SPEED)
+        self._seen.add(digest)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._seen), "hits": self.hits, "misses": self.misses}
+
+
+class StubF5BatchRunner:
+    def __init__(self, model, vocoder, device, mel_spec_type: str = "vocos", ref_cache=None):
+        self.ref_cache = StubRefCache()
+
+    def prepare(self, ref_audio: bytes, ref_text: str, gen_text: str, speed: float = 1.0,
+                nfe_step: int = 32, seed: Optional[int] = None) -> StubF5Job:
+        self.ref_cache.prepare(ref_audio, ref_text)
+        return StubF5Job(gen_text, nfe_step, seed)
+
+    def __call__(self, jobs: List[StubF5Job]):
+        F5_TIMING.run([job.gen_text for job in jobs], factor=jobs[0].nfe_step / 32)
+        return [(synthetic_audio(job.gen_text, 24000, F5_TIMING), 24000) for job in jobs]
+
+
+def install_f5(service_dir: str):
+    """f5_tts/torchaudio placeholders, then swap the runner and loader the service imports"""
+    def chunk_text(text, max_chars=135):
+        return [text]
+
+    fake_module("f5_tts.model", DiT=object)
+    fake_module(
+        "f5_tts.infer.utils_infer",
+        cfg_strength=2.0, cross_fade_duration=0.15, hop_length=256, sway_sampling_coef=-1.0,
+        target_rms=0.1, target_sample_rate=24000, chunk_text=chunk_text,
+        convert_char_to_pinyin=lambda texts: texts, load_checkpoint=None, load_vocoder=None,
+        load_model=None, preprocess_ref_audio_text=None,
+    )
+    try:
+        import torchaudio  # noqa: F401
+    except ImportError:
+        fake_module("torchaudio")
+
+    sys.path.insert(0, service_dir)
+    import f5_batch
+    import f5_models
+    f5_batch.F5BatchRunner = StubF5BatchRunner
+    f5_models.load_f5_models = lambda device, timer=None: (None, None)
+
+
+# ---------- Cognee ----------
+
+COGNEE_TIMING = {
+    "add": 0.005,            # + 0.0005 per item
+    "cognify": 1.2,          # + 0.08 per item (LLM extraction)
+    "search": 0.3,           # graph query + LLM completion
+    "embed": 0.015,          # + 0.0005 per text
+}
+EMBED_DIM = 128
+_WORD = re.compile(r"\w+")
+
+
+def hashed_embedding(text: str) -> List[float]:
+    vector = np.zeros(EMBED_DIM, dtype=np.float32)
+    for word in _WORD.findall(text.lower()):
+        vector[int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % EMBED_DIM] += 1.0
+    return vector.tolist()
+
+
+@dataclass
+class StubGraph:
+    texts: Dict[str, List[str]] = field(default_factory=dict)
+
+
+def install_cognee():
+    graph = StubGraph()
+
+    async def add(data, dataset_name: str = "main_dataset", incremental_loading: bool = True):
+        items = data if isinstance(data, list) else [data]
+        await asyncio.sleep((COGNEE_TIMING["add"] + 0.0005 * len(items)) * BENCH_STUB_SPEED)
+        graph.texts.setdefault(dataset_name, []).extend(items)
+
+    async def cognify(datasets=None, incremental_loading: bool = True):
+        items = sum(len(graph.texts.get(d, [])) for d in datasets or [])
+        await asyncio.sleep((COGNEE_TIMING["cognify"] + 0.08 * min(items, 64)) * BENCH_STUB_SPEED)
+
+    async def search(query_text: str, datasets=None, **kwargs):
+        await asyncio.sleep(COGNEE_TIMING["search"] * BENCH_STUB_SPEED)
+        words = set(_WORD.findall(query_text.lower()))
+        texts = [t for d in datasets or [] for t in graph.texts.get(d, [])]
+        ranked = sorted(texts, key=lambda t: len(words & set(_WORD.findall(t.lower()))), reverse=True)
+        return ranked[:5]
+
+    async def prune_data(datasets=None):
+        for dataset in datasets or []:
+            graph.texts.pop(dataset, None)
+
+    async def list_datasets():
+        return [types.SimpleNamespace(name=name, id=name) for name in graph.texts]
+
+    async def list_data(dataset_id):
+        return []
+
+    async def delete(data_id=None, dataset_id=None):
+        return None
+
+    class EmbeddingEngine:
+        async def embed_text(self, texts):
+            await asyncio.sleep((COGNEE_TIMING["embed"] + 0.0005 * len(texts)) * BENCH_STUB_SPEED)
+            return [hashed_embedding(t) for t in texts]
+
+    class LLMGateway:
+        @staticmethod
+        async def acreate_structured_output(text_input, system_prompt, response_model):
+            await asyncio.sleep(2.0 * BENCH_STUB_SPEED)
+            return response_model(summary=text_input[:400])
+
+    fake_module(
+        "cognee", add=add, cognify=cognify, search=search, delete=delete,
+    )
+    fake_module("cognee.prune", prune_data=prune_data)
+    fake_module("cognee.datasets", list_datasets=list_datasets, list_data=list_data)
+    fake_module("cognee.infrastructure.databases.vector.embeddings", get_embedding_engine=lambda: EmbeddingEngine())
+    fake_module("cognee.infrastructure.llm.config",
+                get_llm_config=lambda: types.SimpleNamespace(llm_provider="stub", llm_endpoint=None, llm_model=None))
+    fake_module("cognee.infrastructure.llm.LLMGateway", LLMGateway=LLMGateway)
@@ -0,0 +1,422 @@
+"""
+Benchmark targets: how to start each service and send it one request.
+
+In-process targets import the service module itself (with stub engines
+installed first when engine="stub") and call it directly: RunPod handlers
+through the captured handler function, FastAPI services through a minimal
+ASGI client. HttpTarget sends the same payloads to a running service
+instead (e.g. a GPU box, or `python handler.py --rp_serve_api`).
+
+Every target turns one Sample into a payload and yields response chunks;
+streaming handlers yield several, everything else one.
+"""
+
+import asyncio
+import base64
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+CHARACTER_CHAT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(CHARACTER_CHAT)
+
+VOICE_DESCRIPTIONS = [
+    "Male, middle-aged, commanding Ghanaian motivational coach with a high-energy West African accent.",
+    "Female, young adult, soft-spoken and warm, slight British accent, gentle pacing.",
+    "Male, elderly, gravelly and slow, wise mentor with a deep resonant voice.",
+    "Female, thirties, confident news anchor, crisp American accent.",
+    "Male, twenties, sarcastic and quick, rebellious streetwise tone.",
+    "Female, forties, cold and authoritative, clipped precise delivery.",
+]
+
+
+@dataclass
+class Sample:
+    index: int
+    kind: str               # "tts" | "add" | "search"
+    text: str
+    voice: int
+    seed: Optional[int] = None
+    stream: bool = False
+
+
+class RejectedError(Exception):
+    """The service shed the request (HTTP 429)"""
+
+
+def load_script(path: str, name: str):
+    """Import a service script (handler.py, server.py, main.py) as a module"""
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def reference_clip(voice: int) -> str:
+    """A 4 s synthetic reference recording per voice, base64 WAV (F5 ref_audio)"""
+    sys.path.insert(0, CHARACTER_CHAT)
+    import numpy as np
+    from tts_common.audio_encoding import encode_audio
+
+    t = np.arange(4 * 24000, dtype=np.float32) / 24000
+    audio = 0.3 * np.sin(2 * np.pi * (110 + 15 * voice) * t)
+    return encode_audio(audio, 24000, "wav").to_base64()
+
+
+# ---------- in-process ASGI ----------
+
+class ASGIClient:
+    """Just enough of an ASGI server to drive a FastAPI app in-process"""
+
+    def __init__(self, app):
+        self.app = app
+        self._lifespan: Optional[asyncio.Task] = None
+        self._lifespan_events: Optional[asyncio.Queue] = None
+
+    async def start(self):
+        self._lifespan_events = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+
+        async def receive():
+            return await self._lifespan_events.get()
+
+        async def send(message):
+            if message["type"] == "lifespan.startup.complete" and not started.done():
+                started.set_result(None)
+            elif message["type"] == "lifespan.startup.failed" and not started.done():
+                started.set_exception(RuntimeError(message.get("message", "startup failed")))
+
+        await self._lifespan_events.put({"type": "lifespan.startup"})
+        self._lifespan = asyncio.create_task(self.app({"type": "lifespan", "asgi": {"version": "3.0"}}, receive, send))
+        await started
+
+    async def stop(self):
+        if self._lifespan is not None:
+            await self._lifespan_events.put({"type": "lifespan.shutdown"})
+            try:
+                await asyncio.wait_for(self._lifespan, 10)
+            except (asyncio.TimeoutError, Exception):
+                self._lifespan.cancel()
+
+    async def request(self, method: str, path: str, body=None):
+        """-> (status, parsed JSON body)"""
+        payload = json.dumps(body).encode() if body is not None else b""
+        done = asyncio.Event()
+        request_sent = False
+        status = 500
+        chunks = []
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    done.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "root_path": "", "query_string": b"",
+            "headers": [(b"content-type", b"application/json"), (b"host", b"bench")],
+            "client": ("127.0.0.1", 0), "server": ("bench", 80),
+        }
+        await self.app(scope, receive, send)
+        done.set()
+        raw = b"".join(chunks)
+        return status, json.loads(raw) if raw else None
+
+
+# ---------- targets ----------
+
+class Target:
+    name = ""
+    # Requests the service processes at once; more wait in line (None: no limit)
+    max_concurrency: Optional[int] = None
+
+    async def load(self, engine: str):
+        raise NotImplementedError
+
+    def payload(self, sample: Sample, options: dict):
+        raise NotImplementedError
+
+    def call(self, payload) -> AsyncIterator[dict]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class RunPodHandlerTarget(Target):
+    """A RunPod serverless handler, called like the RunPod worker loop would"""
+    script = ""
+
+    async def load(self, engine: str):
+        import stubs
+        stubs.capture_runpod()
+        if engine == "stub":
+            self.install_stubs()
+        self.module = load_script(self.script, f"bench_{self.name.replace('-', '_')}")
+        config = dict(stubs.RUNPOD_CONFIG)
+        self.handler = config["handler"]
+        modifier = config.get("concurrency_modifier")
+        self.max_concurrency = modifier(1) if modifier else 1
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="bench-handler")
+        # The worker admits at most concurrency_modifier jobs, whatever the handler kind
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.warm)
+
+    def install_stubs(self):
+        pass
+
+    def warm(self):
+        pass
+
+    async def call(self, payload):
+        async with self.slots:
+            async for output in self._run(payload):
+                yield output
+
+    async def _run(self, payload):
+        loop = asyncio.get_running_loop()
+        handler = self.handler
+        if inspect.isasyncgenfunction(handler):
+            async for output in handler(payload):
+                yield output
+        elif inspect.iscoroutinefunction(handler):
+            yield await handler(payload)
+        elif inspect.isgeneratorfunction(handler):
+            outputs = handler(payload)
+            done = object()
+            while True:
+                output = await loop.run_in_executor(self.executor, next, outputs, done)
+                if output is done:
+                    return
+                yield output
+        else:
+            yield await loop.run_in_executor(self.executor, handler, payload)
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class ChatterboxTarget(RunPodHandlerTarget):
+    name = "chatterbox"
+    script = os.path.join(REPO_ROOT, "handler.py")
+
+    def install_stubs(self):
+        import stubs
+        stubs.install_chatterbox()
+
+    def warm(self):
+        # The handler loads lazily unless EAGER_LOAD=1; keep model load out of request latency
+        self.module.load_model()
+        self.voices = sorted({(v.archetype, v.gender) for v in self.module.VOICE_REGISTRY.profiles.values()})
+
+    def payload(self, sample, options):
+        job = {"text": sample.text, "stream": sample.stream, **options}
+        if self.voices:
+            job["archetype"], job["gender"] = self.voices[sample.voice % len(self.voices)]
+        if sample.seed is not None:
+            job["seed"] = sample.seed
+        return {"id": f"bench-{sample.index}", "input": job}
+
+
+class F5HandlerTarget(RunPodHandlerTarget):
+    name = "f5"
+    script = os.path.join(CHARACTER_CHAT, "runpod-f5-tts", "handler.py")
+    _clips = {}
+
+    def install_stubs(self):
+        import stubs
+        stubs.install_f5(os.path.dirname(self.script))
+
+    def clip(self, voice):
+        if voice not in self._clips:
+            self._clips[voice] = reference_clip(voice)
+        return self._clips[voice]
+
+    def payload(self, sample, options):
+        job = {
+            "text": sample.text,
+            "ref_audio": self.clip(sample.voice),
+            "ref_text": "This is a short reference recording.",
+            "seed": sample.seed if sample.seed is not None else -1,
+            **options,
+        }
+        return {"id": f"bench-{sample.index}", "input": job}
+
+
+class FastMayaTarget(RunPodHandlerTarget):
+    name = "fastmaya"
+    script = os.path.join(CHARACTER_CHAT, "runpod-fastmaya", "handler.py")
+
+    def install_stubs(self):
+        import stubs
+        stubs.install_maya()
+
+    def payload(self, sample, options):
+        job = {
+            "text": sample.text,
+            "voice_description": VOICE_DESCRIPTIONS[sample.voice % len(VOICE_DESCRIPTIONS)],
+            "seed": sample.seed if sample.seed is not None else -1,
+            "stream": sample.stream,
+            **options,
+        }
+        return {"id": f"bench-{sample.index}", "input": job}
+
+
+class ASGITarget(Target):
+    script = ""
+    ready_timeout = 300.0
+
+    async def load(self, engine: str):
+        if engine == "stub":
+            self.install_stubs()
+        self.module = load_script(self.script, f"bench_{self.name.replace('-', '_')}")
+        self.client = ASGIClient(self.module.app)
+        await self.client.start()
+        await self.wait_ready()
+
+    def install_stubs(self):
+        pass
+
+    async def wait_ready(self):
+        pass
+
+    def route(self, sample: Sample):
+        raise NotImplementedError
+
+    async def call(self, payload):
+        path, body = payload
+        status, response = await self.client.request("POST", path, body)
+        if status == 429:
+            raise RejectedError(str(response))
+        if status >= 400:
+            yield {"error": f"HTTP {status}: {response}"}
+            return
+        yield response
+
+    async def close(self):
+        await self.client.stop()
+
+
+class F5ServerTarget(ASGITarget, F5HandlerTarget):
+    name = "f5-server"
+    script = os.path.join(CHARACTER_CHAT, "runpod-f5-tts", "server.py")
+
+    def install_stubs(self):
+        import stubs
+        stubs.install_f5(os.path.dirname(self.script))
+
+    async def wait_ready(self):
+        deadline = time.monotonic() + self.ready_timeout
+        while not self.module.ready_flag:
+            if time.monotonic() > deadline:
+                raise RuntimeError("F5 server did not become ready")
+            await asyncio.sleep(0.1)
+
+    def payload(self, sample, options):
+        return "/run", {"input": F5HandlerTarget.payload(self, sample, options)["input"]}
+
+    async def call(self, payload):
+        async for response in ASGITarget.call(self, payload):
+            # /run wraps the result like RunPod does
+            yield response.get("output", response) if isinstance(response, dict) else response
+
+
+class CogneeTarget(ASGITarget):
+    name = "cognee"
+    script = os.path.join(CHARACTER_CHAT, "cognee-service", "main.py")
+
+    async def load(self, engine: str):
+        # Keep the journal out of the source tree and the compactor idle
+        os.environ.setdefault("COGNEE_QUEUE_DIR", tempfile.mkdtemp(prefix="bench-cognee-"))
+        os.environ.setdefault("COMPACT_INTERVAL_S", "0")
+        await super().load(engine)
+
+    def install_stubs(self):
+        import stubs
+        stubs.install_cognee()
+
+    def payload(self, sample, options):
+        user = {"user_id": f"u{sample.voice:05d}", "character_id": "benchchar"}
+        if sample.kind == "search":
+            return "/memory/search", {**user, "query": sample.text, "limit": 5, **options}
+        return "/memory/add", {**user, "content": sample.text, "role": "user", **options}
+
+
+class HttpTarget(Target):
+    """The same payloads, POSTed to a running service"""
+
+    def __init__(self, inner: Target, url: str, max_concurrency: Optional[int] = None):
+        self.inner = inner
+        self.name = inner.name
+        self.url = url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="bench-http")
+
+    async def load(self, engine: str):
+        # Remote anchors are unknown; Chatterbox falls back to its legacy voice
+        self.inner.voices = []
+
+    def payload(self, sample, options):
+        payload = self.inner.payload(sample, options)
+        if isinstance(payload, tuple):
+            return payload
+        # RunPod handlers: the local/test API and RunPod both take {"input": ...} at /runsync
+        return "/runsync", payload
+
+    def post(self, path, body):
+        request = urllib.request.Request(
+            self.url + path, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=600) as response:
+                return response.status, json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode(errors="replace")
+
+    async def call(self, payload):
+        path, body = payload
+        status, response = await asyncio.get_running_loop().run_in_executor(self.executor, self.post, path, body)
+        if status == 429:
+            raise RejectedError(str(response))
+        if status >= 400:
+            yield {"error": f"HTTP {status}: {response}"}
+            return
+        output = response.get("output", response) if isinstance(response, dict) else response
+        # Generator handlers come back as an aggregated list
+        for chunk in output if isinstance(output, list) else [output]:
+            yield chunk
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+
+
+TARGETS = {
+    target.name: target
+    for target in (ChatterboxTarget, F5HandlerTarget, F5ServerTarget, FastMayaTarget, CogneeTarget)
+}
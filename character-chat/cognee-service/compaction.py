@@ -0,0 +1,218 @@
+"""
+Background compaction of per user-character memory datasets.
+
+Every chat message becomes one Cognee data item, so long relationships grow
+datasets (and the search / cognify working set) without bound. Compaction
+keeps each dataset at or under `max_items`:
+
+  1. List the dataset's data items, oldest first.
+  2. Leave the newest `keep_recent` items untouched; roll the older ones up
+     in chunks of `chunk_items` into LLM-written summary memories. Earlier
+     summaries are rolled up again, so old history keeps collapsing.
+  3. Ingest the summaries (add + cognify), then delete the raw items they
+     replace.
+
+Compaction of a dataset holds that dataset's ingest lock, so it never
+interleaves with a write-behind cognify batch for the same dataset.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from metrics import timed
+
+SUMMARY_HEADER = "[MEMORY SUMMARY]"
+
+SUMMARY_PROMPT = """You compress chat history between a user and an AI character into long-term memory.
+Write a concise third-person summary of the conversation excerpt below. Keep every durable fact:
+names, relationships, preferences, plans, promises, important events and how the user feels about
+them. Drop greetings, filler and anything already superseded. Plain prose, no lists."""
+
+
+class MemorySummary(BaseModel):
+    summary: str
+
+
+def read_item_text(item) -> str:
+    """Text of a Cognee data item (stored as a file under raw_data_location)"""
+    location = item.raw_data_location or ""
+    if location.startswith("file://"):
+        location = location[len("file://"):]
+    with open(location, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def item_created_at(item) -> float:
+    created = getattr(item, "created_at", None)
+    return created.timestamp() if created is not None else 0.0
+
+
+async def summarize(texts: List[str]) -> str:
+    from cognee.infrastructure.llm.LLMGateway import LLMGateway
+
+    with timed("llm_summarize"):
+        result = await LLMGateway.acreate_structured_output(
+            text_input="\n\n".join(t.strip() for t in texts),
+            system_prompt=SUMMARY_PROMPT,
+            response_model=MemorySummary,
+        )
+    return f"{SUMMARY_HEADER}\n{result.summary.strip()}\n"
+
+
+class Compactor:
+    def __init__(
+        self,
+        dataset_lock: Callable[[str], asyncio.Lock],
+        ingest: Callable[[str, List[str]], Awaitable[None]],
+        on_compacted: Callable[[str], None],
+        max_items: int = 400,
+        keep_recent: int = 100,
+        chunk_items: int = 50,
+        interval: float = 3600.0,
+        dataset_prefix: str = "user_",
+    ):
+        self.dataset_lock = dataset_lock
+        self.ingest = ingest
+        self.on_compacted = on_compacted
+        self.max_items = max_items
+        self.keep_recent = min(keep_recent, max_items)
+        self.chunk_items = max(2, chunk_items)
+        self.interval = interval
+        self.dataset_prefix = dataset_prefix
+
+        self._task: Optional[asyncio.Task] = None
+        self._running = asyncio.Lock()
+        self.runs = 0
+        self.items_compacted = 0
+        self.summaries_written = 0
+        self.last_run: Optional[dict] = None
+        self.last_error: Optional[str] = None
+
+    # ---------- Cognee access ----------
+
+    async def _datasets(self) -> Dict[str, object]:
+        import cognee
+        return {d.name: d for d in await cognee.datasets.list_datasets() if d.name.startswith(self.dataset_prefix)}
+
+    async def _items(self, dataset) -> list:
+        import cognee
+        items = await cognee.datasets.list_data(dataset.id)
+        return sorted(items, key=item_created_at)
+
+    # ---------- reporting ----------
+
+    async def dataset_sizes(self) -> List[dict]:
+        sizes = []
+        for name, dataset in (await self._datasets()).items():
+            items = await self._items(dataset)
+            sizes.append({
+                "dataset": name,
+                "items": len(items),
+                "bytes": sum(getattr(i, "data_size", None) or 0 for i in items),
+                "tokens": sum(getattr(i, "token_count", None) or 0 for i in items),
+                "over_cap": len(items) > self.max_items,
+            })
+        return sorted(sizes, key=lambda s: s["items"], reverse=True)
+
+    # ---------- compaction ----------
+
+    async def compact(self, dataset_name: str, dataset=None) -> dict:
+        """Roll up old items of one dataset if it is over max_items"""
+        import cognee
+
+        if dataset is None:
+            dataset = (await self._datasets()).get(dataset_name)
+            if dataset is None:
+                return {"dataset": dataset_name, "status": "missing"}
+
+        async with self.dataset_lock(dataset_name):
+            items = await self._items(dataset)
+            if len(items) <= self.max_items:
+                return {"dataset": dataset_name, "status": "under_cap", "items": len(items)}
+
+            started = time.perf_counter()
+            old = items[:len(items) - self.keep_recent]
+            summaries = []
+            for start in range(0, len(old), self.chunk_items):
+                chunk = old[start:start + self.chunk_items]
+                texts = [read_item_text(item) for item in chunk]
+                summaries.append(await summarize(texts))
+
+            # Same add + cognify path as chat messages
+            await self.ingest(dataset_name, summaries)
+            # Only drop raw items once their summaries are in the graph
+            for item in old:
+                await cognee.delete(data_id=item.id, dataset_id=dataset.id)
+
+            self.on_compacted(dataset_name)
+            self.items_compacted += len(old)
+            self.summaries_written += len(summaries)
+            report = {
+                "dataset": dataset_name,
+                "status": "compacted",
+                "items_before": len(items),
+                "items_after": len(items) - len(old) + len(summaries),
+                "summaries": len(summaries),
+                "seconds": round(time.perf_counter() - started, 2),
+            }
+            print(f"[Compaction] {dataset_name}: {report['items_before']} -> {report['items_after']} items "
+                  f"in {report['seconds']:.1f}s")
+            return report
+
+    async def compact_all(self) -> List[dict]:
+        async with self._running:
+            reports = []
+            for name, dataset in (await self._datasets()).items():
+                try:
+                    reports.append(await self.compact(name, dataset))
+                except Exception as e:
+                    self.last_error = f"{name}: {e}"
+                    print(f"[Compaction] {name} failed: {e}")
+                    reports.append({"dataset": name, "status": "error", "error": str(e)})
+            self.runs += 1
+            self.last_run = {
+                "at": time.time(),
+                "compacted": sum(1 for r in reports if r["status"] == "compacted"),
+                "errors": sum(1 for r in reports if r["status"] == "error"),
+            }
+            return [r for r in reports if r["status"] != "under_cap"]
+
+    # ---------- schedule ----------
+
+    async def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.compact_all()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[Compaction] Scheduled run failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "max_items": self.max_items,
+            "keep_recent": self.keep_recent,
+            "chunk_items": self.chunk_items,
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "items_compacted": self.items_compacted,
+            "summaries_written": self.summaries_written,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
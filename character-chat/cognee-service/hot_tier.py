@@ -0,0 +1,163 @@
+"""
+In-process vector index of each dataset's most recent messages.
+
+Most lookups are about recent context ("what did we just talk about"), which
+doesn't need a graph query. Every added message is embedded (coalesced per
+dataset, one embedding call per burst) into a small NumPy matrix of unit
+vectors; a search is then one matrix-vector product, and its cosine
+similarities are real scores.
+
+Bounded twice: at most `max_messages` per dataset (oldest dropped first) and
+at most `max_datasets` datasets (least recently used dropped first).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+EmbedFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def unit_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+@dataclass
+class DatasetIndex:
+    """Ring buffer of (text, unit vector) for one dataset"""
+    capacity: int
+    vectors: Optional[np.ndarray] = None      # (capacity, dim)
+    texts: List[Optional[str]] = field(default_factory=list)
+    next_slot: int = 0
+    size: int = 0
+
+    def add(self, texts: List[str], vectors: np.ndarray):
+        if self.vectors is None or self.vectors.shape[1] != vectors.shape[1]:
+            # First batch (or the embedding model changed): start over
+            self.vectors = np.zeros((self.capacity, vectors.shape[1]), dtype=np.float32)
+            self.texts = [None] * self.capacity
+            self.next_slot = self.size = 0
+        for text, vector in zip(texts, vectors):
+            self.vectors[self.next_slot] = vector
+            self.texts[self.next_slot] = text
+            self.next_slot = (self.next_slot + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        if not self.size or self.vectors is None or query.shape[-1] != self.vectors.shape[1]:
+            return []
+        scores = self.vectors[:self.size] @ query
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.texts[i], float(scores[i])) for i in top]
+
+
+class HotTier:
+    def __init__(self, embed: EmbedFn, max_messages: int = 64, max_datasets: int = 256,
+                 query_cache_size: int = 256):
+        self.embed = embed
+        self.max_messages = max(1, max_messages)
+        self.max_datasets = max(1, max_datasets)
+        self.query_cache_size = query_cache_size
+
+        self._indexes: "OrderedDict[str, DatasetIndex]" = OrderedDict()
+        self._pending: Dict[str, List[str]] = {}
+        self._embed_tasks: Dict[str, asyncio.Task] = {}
+        self._query_vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        self.searches = 0
+        self.search_seconds = 0.0
+        self.embed_errors = 0
+        self.evicted_datasets = 0
+
+    def __contains__(self, dataset: str) -> bool:
+        index = self._indexes.get(dataset)
+        return index is not None and index.size > 0
+
+    # ---------- writes ----------
+
+    def add(self, dataset: str, text: str):
+        """Queue a message for embedding; returns immediately"""
+        self._pending.setdefault(dataset, []).append(text)
+        if dataset not in self._embed_tasks:
+            self._embed_tasks[dataset] = asyncio.create_task(self._embed_pending(dataset))
+
+    async def _embed_pending(self, dataset: str):
+        try:
+            # Everything queued while the previous call ran goes in the next one
+            while self._pending.get(dataset):
+                texts = self._pending.pop(dataset)[-self.max_messages:]
+                try:
+                    vectors = unit_rows(await self.embed(texts))
+                except Exception as e:
+                    self.embed_errors += 1
+                    print(f"[HotTier] Embedding {len(texts)} messages for {dataset} failed: {e}")
+                    return
+                self._index_for(dataset).add(texts, vectors)
+        finally:
+            self._embed_tasks.pop(dataset, None)
+
+    def _index_for(self, dataset: str) -> DatasetIndex:
+        index = self._indexes.get(dataset)
+        if index is None:
+            index = self._indexes[dataset] = DatasetIndex(self.max_messages)
+        self._indexes.move_to_end(dataset)
+        while len(self._indexes) > self.max_datasets:
+            self._indexes.popitem(last=False)
+            self.evicted_datasets += 1
+        return index
+
+    def drop(self, dataset: str):
+        self._indexes.pop(dataset, None)
+        self._pending.pop(dataset, None)
+
+    # ---------- reads ----------
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        vector = self._query_vectors.get(query)
+        if vector is None:
+            vector = unit_rows(await self.embed([query]))[0]
+            self._query_vectors[query] = vector
+            while len(self._query_vectors) > self.query_cache_size:
+                self._query_vectors.popitem(last=False)
+        else:
+            self._query_vectors.move_to_end(query)
+        return vector
+
+    def search(self, dataset: str, query_vector: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        index = self._indexes.get(dataset)
+        if index is None:
+            return []
+        self._indexes.move_to_end(dataset)
+        started = time.perf_counter()
+        hits = index.search(query_vector, k)
+        self.searches += 1
+        self.search_seconds += time.perf_counter() - started
+        return hits
+
+    async def score(self, query_vector: np.ndarray, texts: List[str]) -> List[float]:
+        """Cosine similarity of arbitrary texts (e.g. graph results) to a query"""
+        if not texts:
+            return []
+        return [float(s) for s in unit_rows(await self.embed(texts)) @ query_vector]
+
+    def stats(self) -> dict:
+        return {
+            "datasets": len(self._indexes),
+            "max_datasets": self.max_datasets,
+            "messages": sum(index.size for index in self._indexes.values()),
+            "max_messages_per_dataset": self.max_messages,
+            "searches": self.searches,
+            "avg_search_us": round(self.search_seconds / self.searches * 1e6, 1) if self.searches else None,
+            "embed_errors": self.embed_errors,
+            "evicted_datasets": self.evicted_datasets,
+        }
@@ -0,0 +1,255 @@
+"""
+Write-behind ingestion for the Cognee memory service.
+
+Running cognee.add() + cognee.cognify() per chat message makes every turn pay
+for graph extraction and its LLM calls. Instead, /memory/add appends the
+message to a per-dataset buffer and returns immediately; a background task
+hands each dataset's buffer to `process_batch(dataset, contents, ids)` once it
+holds `max_batch_items` messages or its oldest message is `max_delay`
+seconds old, so one cognify run covers many messages.
+
+Pending messages are journaled to `journal_dir` (one JSONL file per dataset)
+before the request is acknowledged and removed only after their batch was
+processed, so a restart picks up where it left off.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+@dataclass
+class PendingMemory:
+    dataset: str
+    content: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    enqueued_at: float = field(default_factory=time.time)
+
+
+class IngestQueue:
+    def __init__(
+        self,
+        process_batch: Callable[[str, List[str], List[str]], Awaitable[None]],
+        journal_dir: str,
+        max_batch_items: int = 16,
+        max_delay: float = 5.0,
+        retry_delay: float = 15.0,
+        max_concurrent: int = 2,
+        fsync: bool = False,
+    ):
+        self.process_batch = process_batch
+        self.journal_dir = journal_dir
+        self.max_batch_items = max(1, max_batch_items)
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.fsync = fsync
+
+        self._buffers: Dict[str, List[PendingMemory]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.processed = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+        os.makedirs(journal_dir, exist_ok=True)
+
+    # ---------- journal ----------
+
+    def _journal_path(self, dataset: str) -> str:
+        # Dataset names embed client ids; hash them rather than trusting them in a path
+        name = hashlib.sha256(dataset.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.journal_dir, f"{name}.jsonl")
+
+    def _append_journal(self, item: PendingMemory):
+        with open(self._journal_path(item.dataset), "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(item)) + "\n")
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _rewrite_journal(self, dataset: str):
+        path = self._journal_path(dataset)
+        remaining = self._buffers.get(dataset) or []
+        if not remaining:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for item in remaining:
+                f.write(json.dumps(asdict(item)) + "\n")
+        os.replace(tmp_path, path)
+
+    def _load_journals(self) -> int:
+        loaded = 0
+        for filename in sorted(os.listdir(self.journal_dir)):
+            if not filename.endswith(".jsonl"):
+                continue
+            with open(os.path.join(self.journal_dir, filename), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = PendingMemory(**json.loads(line))
+                    except (ValueError, TypeError):
+                        continue  # torn write from a crash mid-append
+                    self._buffers.setdefault(item.dataset, []).append(item)
+                    loaded += 1
+        return loaded
+
+    # ---------- lifecycle ----------
+
+    async def start(self):
+        if self._task is not None:
+            return
+        loaded = self._load_journals()
+        if loaded:
+            print(f"[Ingest] Recovered {loaded} pending memories across {len(self._buffers)} datasets")
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop the loop and try to flush what is buffered; leftovers stay journaled"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.wait_for(self.flush_all(), timeout)
+        except Exception as e:
+            print(f"[Ingest] Shutdown flush incomplete ({self.pending} pending, journaled): {e}")
+
+    # ---------- public API ----------
+
+    @property
+    def pending(self) -> int:
+        return sum(len(items) for items in self._buffers.values())
+
+    def pending_for(self, dataset: str) -> int:
+        return len(self._buffers.get(dataset, ()))
+
+    def pending_ids(self, dataset: str) -> List[str]:
+        """Ids of a dataset's journaled items, including a batch being processed"""
+        return [item.id for item in self._buffers.get(dataset, ())]
+
+    def enqueue(self, dataset: str, content: str) -> PendingMemory:
+        item = PendingMemory(dataset=dataset, content=content)
+        self._append_journal(item)
+        self._buffers.setdefault(dataset, []).append(item)
+        self.enqueued += 1
+        if len(self._buffers[dataset]) >= self.max_batch_items and self._wakeup is not None:
+            self._wakeup.set()
+        return item
+
+    def lock(self, dataset: str) -> asyncio.Lock:
+        """Held while a dataset's batch is processed; other writers can share it"""
+        return self._locks.setdefault(dataset, asyncio.Lock())
+
+    async def flush(self, dataset: str) -> int:
+        """Process everything buffered for a dataset now; returns items processed"""
+        async with self.lock(dataset), self._semaphore:
+            batch = list(self._buffers.get(dataset, ()))
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                await self.process_batch(dataset, [item.content for item in batch], [item.id for item in batch])
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{dataset}: {e}"
+                self._retry_at[dataset] = time.time() + self.retry_delay
+                print(f"[Ingest] Batch of {len(batch)} for {dataset} failed, retrying in {self.retry_delay:.0f}s: {e}")
+                raise
+
+            done = {item.id for item in batch}
+            self._buffers[dataset] = [item for item in self._buffers.get(dataset, ()) if item.id not in done]
+            if not self._buffers[dataset]:
+                del self._buffers[dataset]
+            self._rewrite_journal(dataset)
+            self._retry_at.pop(dataset, None)
+            self.processed += len(batch)
+            self.batches += 1
+            print(f"[Ingest] Processed {len(batch)} memories for {dataset} in {time.perf_counter() - started:.2f}s")
+            return len(batch)
+
+    async def flush_all(self) -> int:
+        results = await asyncio.gather(*(self.flush(d) for d in list(self._buffers)), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            raise errors[0]
+        return sum(results)
+
+    def discard(self, dataset: str) -> int:
+        """Drop pending items for a dataset (e.g. before pruning it)"""
+        dropped = len(self._buffers.pop(dataset, ()))
+        self._retry_at.pop(dataset, None)
+        self._rewrite_journal(dataset)
+        return dropped
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "datasets_pending": len(self._buffers),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "max_batch_items": self.max_batch_items,
+            "max_delay_seconds": self.max_delay,
+        }
+
+    # ---------- background loop ----------
+
+    def _due_at(self, dataset: str) -> float:
+        items = self._buffers[dataset]
+        due = self._retry_at.get(dataset, 0.0)
+        if len(items) >= self.max_batch_items:
+            return due
+        return max(due, items[0].enqueued_at + self.max_delay)
+
+    def _start_flush(self, dataset: str):
+        task = asyncio.create_task(self.flush(dataset))
+        self._inflight[dataset] = task
+        task.add_done_callback(lambda t: self._flush_done(dataset, t))
+
+    def _flush_done(self, dataset: str, task: asyncio.Task):
+        self._inflight.pop(dataset, None)
+        if not task.cancelled():
+            task.exception()  # recorded and scheduled for retry by flush()
+        # Items may have piled up while this batch ran
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run_forever(self):
+        while True:
+            now = time.time()
+            next_due = None
+            for dataset in list(self._buffers):
+                if dataset in self._inflight:
+                    continue
+                due = self._due_at(dataset)
+                if due <= now:
+                    self._start_flush(dataset)
+                elif next_due is None or due < next_due:
+                    next_due = due
+
+            self._wakeup.clear()
+            timeout = self.max_delay if next_due is None else max(0.05, next_due - now)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
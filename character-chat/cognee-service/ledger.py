@@ -0,0 +1,96 @@
+"""
+Per-dataset record of which memories are already in the knowledge graph.
+
+Each dataset keeps a file of the keys of memories cognify has processed.
+Chat messages are keyed by their ingest-queue id, so journal replays after a
+crash never reach cognee.add()/cognify() again while a user repeating a
+short message ("ok", "lol") still gets every copy stored. Memories without
+an id (compaction summaries) fall back to a content hash.
+
+Only keys that could still be replayed are worth keeping: after each batch
+the ledger is trimmed to the ids still in the ingest journal, so it stays
+about one batch long no matter how long the conversation history gets.
+"""
+
+import hashlib
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+
+
+def memory_keys(contents: List[str], ids: Optional[List[str]] = None) -> List[str]:
+    """Ledger key per memory: its queue id when known, else a hash of its content"""
+    if ids is not None:
+        return list(ids)
+    return [content_hash(c) for c in contents]
+
+
+class ProcessedLedger:
+    def __init__(self, state_dir: str):
+        self.state_dir = state_dir
+        self._hashes: Dict[str, Set[str]] = {}
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _path(self, dataset: str) -> str:
+        name = hashlib.sha256(dataset.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.state_dir, f"{name}.processed")
+
+    def _load(self, dataset: str) -> Set[str]:
+        hashes = self._hashes.get(dataset)
+        if hashes is None:
+            hashes = set()
+            path = self._path(dataset)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    hashes.update(line.strip() for line in f if line.strip())
+            self._hashes[dataset] = hashes
+        return hashes
+
+    def filter_new(self, dataset: str, keys: Iterable[str]) -> List[str]:
+        """Keys not yet processed for this dataset, de-duplicated, in order"""
+        seen = self._load(dataset)
+        return [k for k in dict.fromkeys(keys) if k not in seen]
+
+    def mark(self, dataset: str, keys: Iterable[str]):
+        seen = self._load(dataset)
+        new = [k for k in dict.fromkeys(keys) if k not in seen]
+        if not new:
+            return
+        with open(self._path(dataset), "a", encoding="utf-8") as f:
+            f.write("".join(f"{k}\n" for k in new))
+        seen.update(new)
+
+    def retain(self, dataset: str, keys: Iterable[str]):
+        """Drop every processed key not in `keys` (e.g. ids no longer journaled)"""
+        seen = self._load(dataset)
+        kept = seen.intersection(keys)
+        if len(kept) == len(seen):
+            return
+        self._hashes[dataset] = kept
+        path = self._path(dataset)
+        if not kept:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(f"{k}\n" for k in kept))
+        os.replace(tmp_path, path)
+
+    def count(self, dataset: str) -> int:
+        return len(self._load(dataset))
+
+    def forget(self, dataset: str):
+        self._hashes.pop(dataset, None)
+        path = self._path(dataset)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def stats(self) -> dict:
+        return {
+            "datasets_loaded": len(self._hashes),
+            "items_loaded": sum(len(h) for h in self._hashes.values()),
+        }
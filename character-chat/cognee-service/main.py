@@ -7,16 +7,65 @@ to store and retrieve character memories using Cognee's knowledge graph.
 
 import os
 import asyncio
+import inspect
 from typing import Optional, List
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 import cognee
 
+from ingest import IngestQueue
+from ledger import ProcessedLedger, memory_keys
+from metrics import count_error, counter, gauge, install as install_metrics, timed
+from compaction import Compactor
+from hot_tier import HotTier
+from search_cache import SearchCache, normalize_query
+
 load_dotenv()
 
+# Write-behind ingestion: /memory/add is acknowledged once journaled, and
+# cognify runs per dataset on batches of COGNEE_BATCH_SIZE messages or after
+# COGNEE_BATCH_DELAY_S seconds, whichever comes first.
+COGNEE_BATCH_SIZE = int(os.getenv("COGNEE_BATCH_SIZE", "16"))
+COGNEE_BATCH_DELAY_S = float(os.getenv("COGNEE_BATCH_DELAY_S", "5"))
+COGNEE_RETRY_DELAY_S = float(os.getenv("COGNEE_RETRY_DELAY_S", "15"))
+COGNEE_MAX_CONCURRENT_COGNIFY = int(os.getenv("COGNEE_MAX_CONCURRENT_COGNIFY", "2"))
+COGNEE_QUEUE_DIR = os.getenv("COGNEE_QUEUE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ingest_queue"))
+COGNEE_QUEUE_FSYNC = os.getenv("COGNEE_QUEUE_FSYNC", "0") == "1"
+# Queue ids of memories already cognified, per dataset
+COGNEE_LEDGER_DIR = os.getenv("COGNEE_LEDGER_DIR", os.path.join(COGNEE_QUEUE_DIR, "processed"))
+# Without incremental cognify every batch rebuilds its whole dataset; refuse to start unless allowed
+COGNEE_ALLOW_FULL_COGNIFY = os.getenv("COGNEE_ALLOW_FULL_COGNIFY", "0") == "1"
+
+# Search result cache; SEARCH_CACHE_TTL_S=0 disables it
+SEARCH_CACHE_ENTRIES = int(os.getenv("SEARCH_CACHE_ENTRIES", "1024"))
+SEARCH_CACHE_TTL_S = float(os.getenv("SEARCH_CACHE_TTL_S", "300"))
+
+# Hot tier: embeddings of each dataset's recent messages, searched in-process.
+# A recent hit scoring >= HOT_TIER_CONFIDENCE answers without a graph query;
+# otherwise recent hits >= HOT_TIER_MIN_SCORE are merged with graph results.
+HOT_TIER_ENABLED = os.getenv("HOT_TIER_ENABLED", "1") == "1"
+HOT_TIER_MAX_MESSAGES = int(os.getenv("HOT_TIER_MAX_MESSAGES", "64"))
+HOT_TIER_MAX_DATASETS = int(os.getenv("HOT_TIER_MAX_DATASETS", "256"))
+HOT_TIER_MIN_SCORE = float(os.getenv("HOT_TIER_MIN_SCORE", "0.5"))
+HOT_TIER_CONFIDENCE = float(os.getenv("HOT_TIER_CONFIDENCE", "0.8"))
+
+# Compaction: datasets above COMPACT_MAX_ITEMS have all but their newest
+# COMPACT_KEEP_RECENT items rolled up into summaries, every COMPACT_INTERVAL_S
+# seconds (0 = only via POST /admin/compact)
+COMPACT_MAX_ITEMS = int(os.getenv("COMPACT_MAX_ITEMS", "400"))
+COMPACT_KEEP_RECENT = int(os.getenv("COMPACT_KEEP_RECENT", "100"))
+COMPACT_CHUNK_ITEMS = int(os.getenv("COMPACT_CHUNK_ITEMS", "50"))
+COMPACT_INTERVAL_S = float(os.getenv("COMPACT_INTERVAL_S", "3600"))
+# Required as X-Admin-Token on /admin/* when set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Batch endpoints: max items per call and how many run concurrently
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
 app = FastAPI(
     title="Cognee Memory Service",
     description="Graph RAG memory for AI characters",
@@ -30,8 +79,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Prometheus /metrics, request histograms and optional Server-Timing headers
+install_metrics(app)
+
 
 # =====================
 # Request/Response Models
@@ -44,6 +97,7 @@ class AddMemoryRequest(BaseModel):
     content: str
     role: str  # 'user' or 'assistant'
     metadata: Optional[dict] = None
+    wait: Optional[bool] = False  # block until cognify has processed this message
 
 
 class SearchMemoryRequest(BaseModel):
@@ -67,6 +121,27 @@ class SearchMemoryResponse(BaseModel):
     context_prompt: str  # Pre-formatted context for LLM injection
 
 
+class AddMemoryBatchRequest(BaseModel):
+    """Many memories, possibly across user-character pairs"""
+    items: List[AddMemoryRequest]
+    wait: Optional[bool] = False  # block until every touched dataset is cognified
+
+
+class SearchMemoryBatchRequest(BaseModel):
+    """Many searches, possibly across user-character pairs"""
+    queries: List[SearchMemoryRequest]
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of one item of a batch call; error is set when it failed"""
+    index: int
+    dataset: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+    results: Optional[List[MemoryResult]] = None
+    context_prompt: Optional[str] = None
+
+
 class HealthResponse(BaseModel):
     status: str
     version: str
@@ -88,6 +163,102 @@ async def ensure_dataset(dataset_name: str):
     pass  # Cognee handles this implicitly
 
 
+def format_memory(request: AddMemoryRequest) -> str:
+    """Format content with metadata for better graph extraction"""
+    return f"""
+[{request.role.upper()} MESSAGE]
+Character: {request.character_id}
+User: {request.user_id}
+Content: {request.content}
+"""
+
+
+processed_ledger = ProcessedLedger(COGNEE_LEDGER_DIR)
+search_cache = SearchCache(max_entries=SEARCH_CACHE_ENTRIES, ttl=SEARCH_CACHE_TTL_S)
+
+
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embed with the same engine Cognee uses for its vector store"""
+    from cognee.infrastructure.databases.vector.embeddings import get_embedding_engine
+    with timed("embed"):
+        return await get_embedding_engine().embed_text(texts)
+
+
+hot_tier = HotTier(embed_texts, HOT_TIER_MAX_MESSAGES, HOT_TIER_MAX_DATASETS) if HOT_TIER_ENABLED else None
+
+
+gauge("cognee_ingest_pending", "Memories waiting for a cognify batch", lambda: ingest_queue.pending)
+gauge("cognee_ingest_datasets_pending", "Datasets with queued memories", lambda: ingest_queue.stats()["datasets_pending"])
+gauge("cognee_ingest_batches_failed", "Cognify batches that failed (retried later)", lambda: ingest_queue.failures)
+gauge("cognee_search_cache_entries", "Entries in the search result cache", lambda: search_cache.stats()["entries"])
+counter("cognee_search_cache_hits", "Search cache hits", lambda: search_cache.hits)
+counter("cognee_search_cache_misses", "Search cache misses", lambda: search_cache.misses)
+if hot_tier is not None:
+    gauge("cognee_hot_tier_datasets", "Datasets held in the recent-message index", lambda: hot_tier.stats()["datasets"])
+
+
+def check_admin(token: Optional[str]):
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def enqueue_memory(dataset: str, request: AddMemoryRequest):
+    """Queue a memory for cognify and make it searchable in the hot tier right away"""
+    ingest_queue.enqueue(dataset, format_memory(request))
+    if hot_tier is not None:
+        hot_tier.add(dataset, f"{request.role}: {request.content}")
+
+# Cognee versions with per-item pipeline status only extract data items that
+# cognify hasn't processed yet; ask for it explicitly where it exists.
+INCREMENTAL_COGNIFY = "incremental_loading" in inspect.signature(cognee.cognify).parameters
+COGNIFY_KWARGS = {"incremental_loading": True} if INCREMENTAL_COGNIFY else {}
+ADD_KWARGS = {"incremental_loading": True} if "incremental_loading" in inspect.signature(cognee.add).parameters else {}
+
+
+async def ingest_batch(dataset: str, contents: List[str], ids: Optional[List[str]] = None):
+    """
+    Add a coalesced batch of messages and build the graph once for all of them.
+    Only the delta is sent: memories already in the ledger (journal replays of
+    the same queue item) are skipped, and cognify runs incrementally.
+    Afterwards the ledger keeps only ids still in the journal; nothing else
+    can be replayed.
+    """
+    by_key = dict(zip(memory_keys(contents, ids), contents))
+    new_keys = processed_ledger.filter_new(dataset, by_key)
+    if not new_keys:
+        return
+    with timed("add"):
+        await cognee.add([by_key[k] for k in new_keys], dataset_name=dataset, **ADD_KWARGS)
+    with timed("cognify"):
+        await cognee.cognify(datasets=[dataset], **COGNIFY_KWARGS)
+    processed_ledger.mark(dataset, new_keys)
+    processed_ledger.retain(dataset, ingest_queue.pending_ids(dataset))
+    # The graph changed: cached searches for this dataset are stale
+    search_cache.invalidate(dataset)
+
+
+ingest_queue = IngestQueue(
+    ingest_batch,
+    journal_dir=COGNEE_QUEUE_DIR,
+    max_batch_items=COGNEE_BATCH_SIZE,
+    max_delay=COGNEE_BATCH_DELAY_S,
+    retry_delay=COGNEE_RETRY_DELAY_S,
+    max_concurrent=COGNEE_MAX_CONCURRENT_COGNIFY,
+    fsync=COGNEE_QUEUE_FSYNC,
+)
+
+# Compaction re-ingests summaries through the same batch path, under the queue's dataset lock
+compactor = Compactor(
+    dataset_lock=ingest_queue.lock,
+    ingest=ingest_batch,
+    on_compacted=search_cache.invalidate,
+    max_items=COMPACT_MAX_ITEMS,
+    keep_recent=COMPACT_KEEP_RECENT,
+    chunk_items=COMPACT_CHUNK_ITEMS,
+    interval=COMPACT_INTERVAL_S,
+)
+
+
 # =====================
 # API Endpoints
 # =====================
@@ -104,33 +275,65 @@ async def add_memory(request: AddMemoryRequest):
     Add a new memory to the knowledge graph.
     
     This will:
-    1. Add the content to Cognee
-    2. Run cognify() to extract entities and relationships
-    3. Store in the knowledge graph
+    1. Journal the message and queue it for its dataset (returns here)
+    2. Later, add the queued batch to Cognee and run cognify() once
+       to extract entities and relationships into the knowledge graph
+
+    Pass "wait": true to block until the message has been processed.
     """
     try:
         dataset = get_dataset_name(request.user_id, request.character_id)
-        
-        # Format content with metadata for better graph extraction
-        formatted_content = f"""
-[{request.role.upper()} MESSAGE]
-Character: {request.character_id}
-User: {request.user_id}
-Content: {request.content}
-"""
-        
-        # Add to Cognee
-        await cognee.add(formatted_content, dataset_name=dataset)
-        
-        # Process into knowledge graph
-        await cognee.cognify(datasets=[dataset])
-        
-        return {"status": "success", "dataset": dataset}
+        enqueue_memory(dataset, request)
+
+        if request.wait:
+            await ingest_queue.flush(dataset)
+            return {"status": "success", "dataset": dataset}
+
+        return {"status": "queued", "dataset": dataset, "pending": ingest_queue.pending_for(dataset)}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/memory/flush")
+async def flush_memory(user_id: Optional[str] = None, character_id: Optional[str] = None):
+    """
+    Process queued memories now instead of waiting for the batch thresholds.
+    Flushes one user-character pair when both ids are given, else everything.
+    """
+    try:
+        if user_id and character_id:
+            dataset = get_dataset_name(user_id, character_id)
+            processed = await ingest_queue.flush(dataset)
+            return {"status": "flushed", "dataset": dataset, "processed": processed}
+        processed = await ingest_queue.flush_all()
+        return {"status": "flushed", "processed": processed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/memory/search/cache")
+async def search_cache_stats():
+    """Search result cache hit/miss statistics"""
+    return search_cache.stats()
+
+
+@app.get("/memory/hot_tier")
+async def hot_tier_stats():
+    """Recent-message vector index statistics"""
+    return hot_tier.stats() if hot_tier is not None else {"enabled": False}
+
+
+@app.get("/memory/ingest")
+async def ingest_status():
+    """Write-behind queue statistics"""
+    return {
+        **ingest_queue.stats(),
+        "incremental_cognify": INCREMENTAL_COGNIFY,
+        "ledger": processed_ledger.stats(),
+    }
+
+
 @app.post("/memory/search", response_model=SearchMemoryResponse)
 async def search_memory(request: SearchMemoryRequest):
     """
@@ -140,49 +343,211 @@ async def search_memory(request: SearchMemoryRequest):
     for injection into LLM prompts.
     """
     try:
-        dataset = get_dataset_name(request.user_id, request.character_id)
-        
-        # Search the knowledge graph
-        results = await cognee.search(
-            query_text=request.query,
-            datasets=[dataset]
-        )
-        
-        # Format results
-        memory_results = []
-        for i, result in enumerate(results[:request.limit]):
-            # Cognee returns different formats, normalize
-            content = str(result) if not hasattr(result, 'content') else result.content
-            score = 1.0 - (i * 0.1)  # Approximate score based on ranking
-            
-            memory_results.append(MemoryResult(
-                content=content,
-                score=score,
-                metadata={}
-            ))
-        
-        # Build context prompt for LLM
-        if memory_results:
-            context_lines = [
-                "\n[COGNEE MEMORY - KNOWLEDGE GRAPH CONTEXT]",
-                "The following information is retrieved from the structured knowledge graph:",
-                ""
+        return await run_search(request)
+    except Exception as e:
+        # Return empty results on error (don't block chat), but keep count
+        count_error("search_request")
+        print(f"WARN: memory search failed, returning no context: {e}")
+        return SearchMemoryResponse(results=[], context_prompt="")
+
+
+async def graph_search(dataset: str, query: str, limit: int, query_vector=None) -> List[MemoryResult]:
+    """
+    Graph RAG search, scored by cosine similarity to the query when an
+    embedding is available (rank-based placeholder otherwise). Cached.
+    """
+    memory_results = search_cache.get(dataset, query)
+    if memory_results is None:
+        generation = search_cache.generation(dataset)
+        with timed("search"):
+            results = await cognee.search(
+                query_text=query,
+                datasets=[dataset]
+            )
+
+        # Cognee returns different formats, normalize
+        contents = [str(result) if not hasattr(result, 'content') else result.content for result in results]
+        scores = None
+        if query_vector is not None:
+            try:
+                scores = await hot_tier.score(query_vector, contents)
+            except Exception as e:
+                count_error("score_graph_results")
+                print(f"WARN: scoring graph results failed: {e}")
+        if scores is None:
+            scores = [1.0 - (i * 0.1) for i in range(len(contents))]  # Approximate score based on ranking
+
+        memory_results = [
+            MemoryResult(content=content, score=round(score, 4), metadata={"source": "graph"})
+            for content, score in zip(contents, scores)
+        ]
+        search_cache.put(dataset, query, memory_results, generation)
+    return memory_results[:limit]
+
+
+def build_context_prompt(memory_results: List[MemoryResult]) -> str:
+    """Build context prompt for LLM"""
+    if not memory_results:
+        return ""
+    context_lines = [
+        "\n[COGNEE MEMORY - KNOWLEDGE GRAPH CONTEXT]",
+        "The following information is retrieved from the structured knowledge graph:",
+        ""
+    ]
+    for mem in memory_results:
+        context_lines.append(f"• {mem.content}")
+    context_lines.append("\n[END COGNEE MEMORY]\n")
+    return "\n".join(context_lines)
+
+
+async def run_search(request: SearchMemoryRequest) -> SearchMemoryResponse:
+    """Search one dataset (recent-message hot tier first, then the graph); raises on failure"""
+    dataset = get_dataset_name(request.user_id, request.character_id)
+    limit = request.limit or 5
+
+    # Only datasets with recent messages need the query embedded: the hot
+    # tier search and graph-result scoring are the only consumers, and a
+    # search-cache hit for anything else costs no embedding round trip
+    query_vector = None
+    recent: List[MemoryResult] = []
+    if hot_tier is not None and dataset in hot_tier:
+        try:
+            query_vector = await hot_tier.embed_query(normalize_query(request.query))
+            with timed("hot_tier_search"):
+                hits = hot_tier.search(dataset, query_vector, limit)
+            recent = [
+                MemoryResult(content=text, score=round(score, 4), metadata={"source": "recent"})
+                for text, score in hits
+                if score >= HOT_TIER_MIN_SCORE
             ]
-            for mem in memory_results:
-                context_lines.append(f"• {mem.content}")
-            context_lines.append("\n[END COGNEE MEMORY]\n")
-            context_prompt = "\n".join(context_lines)
+        except Exception as e:
+            count_error("hot_tier")
+            print(f"WARN: hot tier search failed: {e}")
+
+    # Confident recent match: skip the graph query entirely
+    if recent and recent[0].score >= HOT_TIER_CONFIDENCE:
+        memory_results = recent
+    else:
+        # graph_search checks search_cache before querying (or scoring) anything
+        graph = await graph_search(dataset, request.query, limit, query_vector)
+        seen = {mem.content for mem in recent}
+        merged = recent + [mem for mem in graph if mem.content not in seen]
+        memory_results = sorted(merged, key=lambda mem: mem.score, reverse=True)[:limit]
+
+    with timed("prompt_assembly"):
+        context_prompt = build_context_prompt(memory_results)
+    return SearchMemoryResponse(
+        results=memory_results,
+        context_prompt=context_prompt
+    )
+
+
+async def gather_bounded(coros, limit: int = BATCH_CONCURRENCY):
+    """asyncio.gather with at most `limit` coroutines running; exceptions are returned"""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(c) for c in coros), return_exceptions=True)
+
+
+def check_batch_size(count: int):
+    if count > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch of {count} exceeds BATCH_MAX_ITEMS={BATCH_MAX_ITEMS}")
+
+
+@app.post("/memory/add_batch")
+async def add_memory_batch(request: AddMemoryBatchRequest):
+    """
+    Queue many memories in one call (e.g. backfilling an imported history).
+
+    Items are grouped per dataset, so each group is cognified in a single
+    batch. With "wait": true the touched datasets are flushed (at most
+    BATCH_CONCURRENCY at a time) before returning. Returns one result per item.
+    """
+    check_batch_size(len(request.items))
+    results: List[BatchItemResult] = []
+    groups = {}
+    for index, item in enumerate(request.items):
+        dataset = get_dataset_name(item.user_id, item.character_id)
+        try:
+            enqueue_memory(dataset, item)
+            results.append(BatchItemResult(index=index, dataset=dataset, status="queued"))
+            groups.setdefault(dataset, []).append(index)
+        except Exception as e:
+            results.append(BatchItemResult(index=index, dataset=dataset, status="error", error=str(e)))
+
+    if request.wait and groups:
+        datasets = list(groups)
+        outcomes = await gather_bounded(ingest_queue.flush(d) for d in datasets)
+        for dataset, outcome in zip(datasets, outcomes):
+            for index in groups[dataset]:
+                if isinstance(outcome, Exception):
+                    results[index].status = "error"
+                    results[index].error = f"Queued, but cognify failed (will retry): {outcome}"
+                else:
+                    results[index].status = "success"
+
+    return {
+        "results": results,
+        "datasets": len(groups),
+        "failed": sum(1 for r in results if r.status == "error"),
+    }
+
+
+@app.post("/memory/search_batch")
+async def search_memory_batch(request: SearchMemoryBatchRequest):
+    """
+    Run many searches in one call, at most BATCH_CONCURRENCY at a time.
+    Returns one result per query, in order; a failed query carries its error.
+    """
+    check_batch_size(len(request.queries))
+    outcomes = await gather_bounded(run_search(q) for q in request.queries)
+
+    results = []
+    for index, (query, outcome) in enumerate(zip(request.queries, outcomes)):
+        dataset = get_dataset_name(query.user_id, query.character_id)
+        if isinstance(outcome, Exception):
+            results.append(BatchItemResult(index=index, dataset=dataset, status="error", error=str(outcome)))
         else:
-            context_prompt = ""
-        
-        return SearchMemoryResponse(
-            results=memory_results,
-            context_prompt=context_prompt
-        )
-        
+            results.append(BatchItemResult(
+                index=index,
+                dataset=dataset,
+                status="success",
+                results=outcome.results,
+                context_prompt=outcome.context_prompt,
+            ))
+
+    return {"results": results, "failed": sum(1 for r in results if r.status == "error")}
+
+
+@app.get("/admin/datasets")
+async def admin_dataset_sizes(x_admin_token: Optional[str] = Header(None)):
+    """Item/byte/token counts per dataset, largest first"""
+    check_admin(x_admin_token)
+    try:
+        datasets = await compactor.dataset_sizes()
+        return {"datasets": datasets, "pending": ingest_queue.stats()["pending"], "compaction": compactor.stats()}
     except Exception as e:
-        # Return empty results on error (don't block chat)
-        return SearchMemoryResponse(results=[], context_prompt="")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/admin/compact")
+async def admin_compact(user_id: Optional[str] = None, character_id: Optional[str] = None,
+                        x_admin_token: Optional[str] = Header(None)):
+    """
+    Compact one user-character dataset when both ids are given, else every
+    dataset over COMPACT_MAX_ITEMS. Runs to completion before returning.
+    """
+    check_admin(x_admin_token)
+    try:
+        if user_id and character_id:
+            return await compactor.compact(get_dataset_name(user_id, character_id))
+        return {"reports": await compactor.compact_all()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/memory/prune")
@@ -193,8 +558,13 @@ async def prune_memory(user_id: str, character_id: str):
     """
     try:
         dataset = get_dataset_name(user_id, character_id)
+        dropped = ingest_queue.discard(dataset)
+        processed_ledger.forget(dataset)
+        if hot_tier is not None:
+            hot_tier.drop(dataset)
         await cognee.prune.prune_data(datasets=[dataset])
-        return {"status": "pruned", "dataset": dataset}
+        search_cache.invalidate(dataset)
+        return {"status": "pruned", "dataset": dataset, "pending_dropped": dropped}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -217,9 +587,28 @@ async def startup_event():
         config.llm_endpoint = os.getenv("LLM_ENDPOINT")
         config.llm_model = os.getenv("LLM_MODEL")
 
+    if not INCREMENTAL_COGNIFY:
+        if not COGNEE_ALLOW_FULL_COGNIFY:
+            raise RuntimeError(
+                "Installed cognee has no incremental_loading: every batch would re-cognify its whole dataset. "
+                "Upgrade cognee, or set COGNEE_ALLOW_FULL_COGNIFY=1 to accept full rebuilds."
+            )
+        print("WARN: installed cognee has no incremental cognify; each batch re-processes its whole dataset "
+              "(COGNEE_ALLOW_FULL_COGNIFY=1)")
+    await ingest_queue.start()
+    await compactor.start()
+    print(f"📥 Write-behind ingestion: batches of {COGNEE_BATCH_SIZE} / {COGNEE_BATCH_DELAY_S}s, journal at {COGNEE_QUEUE_DIR}")
+
     print(f"✅ Cognee ready! Provider: {config.llm_provider}")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush what we can; anything left stays journaled for the next start"""
+    await compactor.stop()
+    await ingest_queue.stop()
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8001))
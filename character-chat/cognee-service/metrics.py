@@ -0,0 +1,122 @@
+"""
+Prometheus metrics for the Cognee memory service.
+
+    with timed("cognify"):
+        await cognee.cognify(...)
+
+records the stage duration in the `cognee_stage_seconds{stage}` histogram and
+counts exceptions in `cognee_errors_total{stage}`. HTTP requests get their own
+histogram, counters and an in-flight gauge via install().
+
+Per-request timing: when METRICS_TIMING_HEADERS=1, or the client sends
+`X-Timing: 1`, the response carries a `Server-Timing` header with every stage
+that ran inside the request (background ingestion is only in the histograms).
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import FastAPI, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily
+
+METRICS_TIMING_HEADERS = os.getenv("METRICS_TIMING_HEADERS", "0") == "1"
+
+# 1ms .. 2min: covers in-process lookups as well as cognify runs
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram("cognee_stage_seconds", "Duration of a processing stage", ["stage"], buckets=LATENCY_BUCKETS)
+ERRORS = Counter("cognee_errors_total", "Errors per stage (including ones hidden from clients)", ["stage"])
+REQUEST_SECONDS = Histogram("cognee_request_seconds", "HTTP request duration", ["endpoint"], buckets=LATENCY_BUCKETS)
+REQUESTS = Counter("cognee_requests_total", "HTTP requests", ["endpoint", "status"])
+IN_FLIGHT = Gauge("cognee_requests_in_flight", "HTTP requests being processed")
+
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.labels(stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def count_error(stage: str):
+    ERRORS.labels(stage).inc()
+
+
+def gauge(name: str, documentation: str, read: Callable[[], float]):
+    """Gauge sampled at scrape time (queue depth, cache sizes, ...)"""
+    Gauge(name, documentation).set_function(read)
+
+
+class _TotalCollector:
+    """Exposes a running total kept elsewhere as a counter"""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def describe(self):
+        yield CounterMetricFamily(self.name, self.documentation)
+
+    def collect(self):
+        yield CounterMetricFamily(self.name, self.documentation, value=self.read())
+
+
+def counter(name: str, documentation: str, read: Callable[[], float]):
+    """Counter sampled at scrape time from a monotonic total (cache hits, ...); exposed as <name>_total"""
+    REGISTRY.register(_TotalCollector(name, documentation, read))
+
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    # Repeated stages (e.g. several embed calls) are summed
+    merged = {}
+    for stage, seconds in timings:
+        merged[stage] = merged.get(stage, 0.0) + seconds
+    merged["total"] = total
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in merged.items())
+
+
+def install(app: FastAPI):
+    """Request metrics middleware, optional Server-Timing header and GET /metrics"""
+
+    @app.middleware("http")
+    async def record_request(request: Request, call_next):
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            _request_timings.reset(token)
+            route = request.scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.labels(endpoint).observe(elapsed)
+            REQUESTS.labels(endpoint, str(status)).inc()
+
+        if METRICS_TIMING_HEADERS or request.headers.get("x-timing") == "1":
+            response.headers["Server-Timing"] = server_timing(timings, elapsed)
+        return response
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
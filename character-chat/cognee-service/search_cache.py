@@ -0,0 +1,102 @@
+"""
+TTL + LRU cache for /memory/search results.
+
+Chat turns often repeat near-identical queries against the same
+user-character dataset. Results are cached per (dataset, normalized query)
+for `ttl` seconds, the least recently used entries are evicted beyond
+`max_entries`, and every entry of a dataset is dropped as soon as its graph
+changes (a cognify batch lands or the dataset is pruned).
+"""
+
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCT = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation don't change a graph search"""
+    return _TRAILING_PUNCT.sub("", _WHITESPACE.sub(" ", query.strip().lower()))
+
+
+class SearchCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._by_dataset: Dict[str, Set[Tuple[str, str]]] = {}
+        # Bumped on invalidation so a search that started before a write can't cache stale results
+        self._generations: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def _remove(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        keys = self._by_dataset.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_dataset[key[0]]
+
+    def get(self, dataset: str, query: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        key = (dataset, normalize_query(query))
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def generation(self, dataset: str) -> int:
+        return self._generations.get(dataset, 0)
+
+    def put(self, dataset: str, query: str, results: Any, generation: Optional[int] = None):
+        if not self.enabled:
+            return
+        if generation is not None and generation != self.generation(dataset):
+            return
+        key = (dataset, normalize_query(query))
+        self._entries[key] = (time.monotonic() + self.ttl, results)
+        self._entries.move_to_end(key)
+        self._by_dataset.setdefault(dataset, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, dataset: str) -> int:
+        self._generations[dataset] = self.generation(dataset) + 1
+        keys = self._by_dataset.pop(dataset, set())
+        for key in keys:
+            self._entries.pop(key, None)
+        if keys:
+            self.invalidations += 1
+        return len(keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -114,6 +114,94 @@ export async function searchCogneeMemory(
     }
 }
 
+export interface CogneeBatchMemory {
+    userId: string;
+    characterId: string;
+    content: string;
+    role: 'user' | 'assistant';
+}
+
+export interface CogneeBatchQuery {
+    userId: string;
+    characterId: string;
+    query: string;
+    limit?: number;
+}
+
+export interface CogneeBatchItemResult {
+    index: number;
+    dataset?: string;
+    status: 'queued' | 'success' | 'error';
+    error?: string;
+    results?: CogneeMemoryResult[];
+    context_prompt?: string;
+}
+
+/**
+ * Save many memories in one round trip (e.g. backfilling imported history).
+ * Returns one result per memory, in order.
+ */
+export async function saveCogneeMemories(
+    memories: CogneeBatchMemory[],
+    wait: boolean = false
+): Promise<CogneeBatchItemResult[]> {
+    const response = await fetch(`${COGNEE_SERVICE_URL}/memory/add_batch`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            items: memories.map((m) => ({
+                user_id: m.userId,
+                character_id: m.characterId,
+                content: m.content,
+                role: m.role,
+            })),
+            wait,
+        }),
+    });
+
+    if (!response.ok) {
+        throw new Error(`Cognee batch save failed: ${response.status}`);
+    }
+
+    const data: { results: CogneeBatchItemResult[] } = await response.json();
+    return data.results;
+}
+
+/**
+ * Run several memory searches in one round trip.
+ * Returns the context prompt per query, in order ('' for failed queries).
+ */
+export async function searchCogneeMemoryBatch(queries: CogneeBatchQuery[]): Promise<string[]> {
+    try {
+        const response = await fetch(`${COGNEE_SERVICE_URL}/memory/search_batch`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                queries: queries.map((q) => ({
+                    user_id: q.userId,
+                    character_id: q.characterId,
+                    query: q.query,
+                    limit: q.limit ?? 5,
+                })),
+            }),
+        });
+
+        if (!response.ok) {
+            throw new Error(`Cognee batch search failed: ${response.status}`);
+        }
+
+        const data: { results: CogneeBatchItemResult[] } = await response.json();
+        return data.results.map((r) => r.context_prompt ?? '');
+    } catch (error) {
+        console.error('[Cognee] Failed to batch search memory:', error);
+        return queries.map(() => '');
+    }
+}
+
 /**
  * Augment a prompt with Cognee memory context.
  * 
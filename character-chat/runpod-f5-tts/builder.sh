@@ -12,8 +12,9 @@ fi
 IMAGE_NAME=$1
 
 echo "Building Docker image: $IMAGE_NAME..."
-# Use host network to ensure pip install works
-docker build -t $IMAGE_NAME .
+# Build from character-chat/ so the image can include the shared tts_common package
+cd "$(dirname "$0")/.."
+docker build -t $IMAGE_NAME -f runpod-f5-tts/Dockerfile .
 
 echo "Pushing to registry..."
 docker push $IMAGE_NAME
@@ -0,0 +1,143 @@
+"""
+Padded batch inference for F5-TTS.
+
+infer_process() handles one reference clip at a time. This module splits the
+same work into two phases so several requests can share one DiT pass:
+
+  prepare()   per request, CPU-side: reference preprocessing (+ ASR when
+              ref_text is empty, both served from RefAudioCache) and text
+              chunking. Produces one F5Job with one row per text chunk.
+  __call__()  per batch: pads every row's reference mel to a common length,
+              runs model.sample() once, then vocodes and re-assembles each
+              job's chunks with a short cross-fade.
+
+It mirrors infer_batch_process() from f5_tts.infer.utils_infer so output
+matches the single-request path.
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import torch
+from torch.nn.utils.rnn import pad_sequence
+
+from f5_tts.infer.utils_infer import (
+    cfg_strength,
+    chunk_text,
+    convert_char_to_pinyin,
+    cross_fade_duration,
+    hop_length,
+    sway_sampling_coef,
+    target_rms,
+    target_sample_rate,
+)
+
+from ref_cache import PreparedReference, RefAudioCache
+from tts_common.audio_stitching import crossfade_concat
+
+
+@dataclass
+class F5Job:
+    """One request, prepared for batching"""
+    reference: PreparedReference
+    ref_text: str
+    gen_texts: List[str]
+    durations: List[int]                     # total mel frames per chunk (ref + gen)
+    nfe_step: int = 32
+    seed: Optional[int] = None
+    ref_frames: int = field(init=False)
+
+    def __post_init__(self):
+        self.ref_frames = self.reference.audio.shape[-1] // hop_length
+
+    @property
+    def cost(self) -> int:
+        return sum(self.durations)
+
+    @property
+    def batch_key(self):
+        # model.sample() takes one step count and one seed per call
+        return (self.nfe_step, self.seed)
+
+
+class F5BatchRunner:
+    def __init__(self, model, vocoder, device, mel_spec_type: str = "vocos",
+                 ref_cache: Optional[RefAudioCache] = None):
+        self.model = model
+        self.vocoder = vocoder
+        self.device = device
+        self.mel_spec_type = mel_spec_type
+        self.ref_cache = ref_cache if ref_cache is not None else RefAudioCache()
+
+    def prepare(self, ref_audio: bytes, ref_text: str, gen_text: str,
+                speed: float = 1.0, nfe_step: int = 32, seed: Optional[int] = None) -> F5Job:
+        """Build a job from raw (decoded) reference audio bytes"""
+        reference, ref_text = self.ref_cache.get(ref_audio, ref_text or "")
+
+        ref_seconds = reference.seconds
+        max_chars = int(len(ref_text.encode("utf-8")) / ref_seconds * (22 - ref_seconds))
+        gen_texts = chunk_text(gen_text, max_chars=max_chars)
+
+        ref_frames = reference.audio.shape[-1] // hop_length
+        ref_text_len = len(ref_text.encode("utf-8"))
+        durations = [
+            ref_frames + int(ref_frames / ref_text_len * len(text.encode("utf-8")) / speed)
+            for text in gen_texts
+        ]
+
+        return F5Job(
+            reference=reference,
+            ref_text=ref_text,
+            gen_texts=gen_texts,
+            durations=durations,
+            nfe_step=nfe_step,
+            seed=seed,
+        )
+
+    def reference_mel(self, reference: PreparedReference) -> torch.Tensor:
+        """(frames, mels) features for a reference, computed once per cache entry"""
+        if reference.mel is None:
+            with torch.inference_mode():
+                reference.mel = self.model.mel_spec(reference.audio.to(self.device)).permute(0, 2, 1)[0]
+        return reference.mel
+
+    def __call__(self, jobs: List[F5Job]):
+        """Run all chunks of all jobs as one padded batch; returns [(wave, sr)] per job"""
+        conds, texts, durations, owners = [], [], [], []
+        for job_idx, job in enumerate(jobs):
+            mel = self.reference_mel(job.reference)
+            for gen_text, duration in zip(job.gen_texts, job.durations):
+                conds.append(mel)
+                texts.append(convert_char_to_pinyin([job.ref_text + gen_text])[0])
+                durations.append(duration)
+                owners.append(job_idx)
+
+        lens = torch.tensor([c.shape[0] for c in conds], dtype=torch.long, device=self.device)
+        cond = pad_sequence(conds, batch_first=True)
+
+        with torch.inference_mode():
+            generated, _ = self.model.sample(
+                cond=cond,
+                text=texts,
+                duration=torch.tensor(durations, dtype=torch.long, device=self.device),
+                lens=lens,
+                steps=jobs[0].nfe_step,
+                cfg_strength=cfg_strength,
+                sway_sampling_coef=sway_sampling_coef,
+                seed=jobs[0].seed,
+            )
+
+            waves: List[List[np.ndarray]] = [[] for _ in jobs]
+            for row, job_idx in enumerate(owners):
+                job = jobs[job_idx]
+                mel = generated[row:row + 1, job.ref_frames:durations[row], :].permute(0, 2, 1).to(torch.float32)
+                if self.mel_spec_type == "bigvgan":
+                    wave = self.vocoder(mel)
+                else:
+                    wave = self.vocoder.decode(mel)
+                if job.reference.rms < target_rms:
+                    wave = wave * job.reference.rms / target_rms
+                waves[job_idx].append(wave.squeeze().cpu().numpy())
+
+        return [(crossfade_concat(w, target_sample_rate, cross_fade_duration), target_sample_rate) for w in waves]
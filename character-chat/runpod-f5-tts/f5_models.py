@@ -0,0 +1,51 @@
+"""
+F5-TTS model + vocoder loading.
+
+Prefers the verified local snapshot from tts_common.model_store (safetensors,
+memory-mapped, no network); falls back to the hub-backed loaders otherwise.
+"""
+
+import os
+import sys
+
+from f5_tts.infer.utils_infer import load_checkpoint, load_vocoder
+
+# Shared TTS helpers (character-chat/tts_common, copied next to this file in the image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tts_common.model_store import activate_store
+
+F5_REPO = "SWivid/F5-TTS"
+F5_CKPT = "F5TTS_Base/model_1200000.safetensors"
+F5TTS_BASE_CFG = dict(dim=1024, depth=22, heads=16, ff_mult=2, text_dim=512, conv_layers=4)
+VOCOS_REPO = "charactr/vocos-mel-24khz"
+
+
+def load_from_store(store, device):
+    from f5_tts.model import DiT
+    from f5_tts.infer.utils_infer import load_model
+    from safetensors.torch import load_file
+    from vocos import Vocos
+
+    model = load_model(DiT, F5TTS_BASE_CFG, os.path.join(store.repo_path(F5_REPO), F5_CKPT),
+                       mel_spec_type="vocos", device=device)
+
+    vocoder = Vocos.from_hparams(os.path.join(store.repo_path(VOCOS_REPO), "config.yaml"))
+    vocoder.load_state_dict(load_file(store.converted_path(VOCOS_REPO, "pytorch_model.bin")))
+    vocoder = vocoder.eval().to(device)
+    return model, vocoder
+
+
+def load_f5_models(device, timer):
+    """Returns (model, vocoder), recording load phases on a StartupTimer"""
+    with timer.phase("model_store"):
+        store = activate_store("f5")
+
+    if store is not None:
+        with timer.phase("load_from_store"):
+            return load_from_store(store, device)
+
+    with timer.phase("load_checkpoint"):
+        model = load_checkpoint(target_dir=None, checkpoint_name="F5-TTS", device=device, show_progress=True)
+    with timer.phase("load_vocoder"):
+        vocoder = load_vocoder(is_local=False)
+    return model, vocoder
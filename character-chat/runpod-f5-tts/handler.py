@@ -1,16 +1,26 @@
 import runpod
 import torch
-import soundfile as sf
 import base64
-import io
 import os
 import random
+import sys
 import numpy as np
-import uuid
 
 # Import F5-TTS
 from f5_tts.model import DiT
-from f5_tts.infer.utils_infer import load_checkpoint, load_vocoder, infer_process
+
+# Shared TTS helpers (character-chat/tts_common, copied next to this file in the image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from f5_batch import F5BatchRunner
+from f5_models import load_f5_models
+from quality_tiers import choose_steps
+from ref_cache import RefAudioCache
+from voice_store import VoiceStore, voice_identity
+from warmup import StartupTimer, run_warmup
+
+from tts_common.audio_cache import audio_cache, is_cacheable, synthesis_key
+from tts_common.audio_encoding import output_options, submit_encode
 
 # ============== GLOBAL STATE ==============
 # Load model at import time (BEFORE runpod.serverless.start)
@@ -19,11 +29,41 @@ device = "cuda" if torch.cuda.is_available() else "cpu"
 print(f"[F5-TTS] Device: {device}")
 
 print("[F5-TTS] Loading model into memory (this may take 30-60s)...")
-model = load_checkpoint(target_dir=None, checkpoint_name="F5-TTS", device=device, show_progress=True)
-vocoder = load_vocoder(is_local=False)
+startup_timer = StartupTimer("[F5-TTS]")
+model, vocoder = load_f5_models(device, startup_timer)
+
+# Decoded/resampled reference clips and ASR transcripts, keyed by audio hash
+ref_cache = RefAudioCache(
+    max_entries=int(os.environ.get("REF_CACHE_ENTRIES", "128")),
+    max_bytes=int(float(os.environ.get("REF_CACHE_MB", "512")) * 1024 * 1024),
+)
+runner = F5BatchRunner(model, vocoder, device, ref_cache=ref_cache)
+run_warmup(runner, startup_timer)
+startup_timer.summary()
+
+# Registered reference voices. Point VOICE_STORE_DIR at a network volume so
+# every worker sees voices registered through any of them.
+voice_store = VoiceStore(os.environ.get("VOICE_STORE_DIR") or None)
 print("[F5-TTS] Model loaded successfully! Worker is WARM.")
 
 # ============== HANDLER ==============
+def register_voice(input_data):
+    """
+    {"action": "register_voice", "ref_audio": <base64>, "ref_text": "", "name": ""}
+    -> {"voice_id": ..., "ref_text": ...}
+    """
+    ref_audio_base64 = input_data.get("ref_audio")
+    if not ref_audio_base64:
+        return {"error": "Reference audio (ref_audio) is required"}
+    try:
+        audio_data = base64.b64decode(ref_audio_base64)
+        voice = voice_store.register(audio_data, input_data.get("ref_text", ""), input_data.get("name"))
+        # Preprocess (and transcribe) now so the first job with this voice is a cache hit
+        _, ref_text = ref_cache.get(voice.audio, voice.ref_text)
+    except Exception as e:
+        return {"error": f"Invalid reference audio: {str(e)}"}
+    return {**voice.info(), "ref_text": voice.ref_text or ref_text.strip()}
+
 def handler(event):
     """
     RunPod Serverless handler function.
@@ -32,6 +72,9 @@ def handler(event):
     global model, vocoder
     
     input_data = event.get("input", {})
+
+    if input_data.get("action") == "register_voice":
+        return register_voice(input_data)
     
     # --- INPUT VALIDATION ---
     text = input_data.get("text")
@@ -39,27 +82,57 @@ def handler(event):
         return {"error": "No text provided"}
 
     ref_audio_base64 = input_data.get("ref_audio")
+    voice_id = input_data.get("voice_id")
     ref_text = input_data.get("ref_text", "")
     
     # Custom parameters
     seed = input_data.get("seed", -1)  # -1 = Random
-    n_steps = input_data.get("steps", 32)
-    speed = input_data.get("speed", 1.0)
+    try:
+        # 1 and 1.0 must share a cache key
+        speed = float(input_data.get("speed", 1.0))
+        output_format, output_sample_rate = output_options(input_data)
+        # One job per worker, so only text length moves the tier down here;
+        # explicit "steps" still wins when no "quality" is given
+        choice = choose_steps(input_data.get("quality"), len(text), steps=input_data.get("steps"))
+    except (TypeError, ValueError) as e:
+        return {"error": str(e)}
     
     # --- PREPARE REFERENCE AUDIO ---
-    temp_id = str(uuid.uuid4())[:8]
-    ref_audio_path = f"/tmp/ref_audio_{temp_id}.mp3"
-    
-    if ref_audio_base64:
+    if voice_id:
+        voice = voice_store.get(voice_id)
+        if voice is None:
+            return {"error": f"Unknown voice_id: {voice_id}"}
+        audio_data = voice.audio
+        ref_text = ref_text or voice.ref_text
+    elif ref_audio_base64:
         try:
             audio_data = base64.b64decode(ref_audio_base64)
-            with open(ref_audio_path, "wb") as f:
-                f.write(audio_data)
             print(f"[F5-TTS] Reference audio: {len(audio_data)} bytes")
         except Exception as e:
             return {"error": f"Invalid reference audio base64: {str(e)}"}
     else:
-        return {"error": "Reference audio (ref_audio) is required"}
+        return {"error": "Reference audio (ref_audio) or voice_id is required"}
+
+    # --- AUDIO CACHE (deterministic requests only) ---
+    cache_key = None
+    if is_cacheable(input_data):
+        # Keyed on the requested quality, not the steps actually used, so a
+        # full-quality rendering also serves requests that would be degraded
+        cache_key = synthesis_key(
+            "f5", text, voice_identity(audio_data, ref_text), seed,
+            {"quality": choice.quality, "steps": None if choice.quality else choice.steps, "speed": speed},
+            output_format, output_sample_rate,
+        )
+        encoded = audio_cache().get(cache_key)
+        if encoded is not None:
+            return {
+                "audio": encoded.to_base64(),
+                "format": encoded.format,
+                "sample_rate": encoded.sample_rate,
+                "seed_used": seed,
+                "cached": True,
+                "engine": "f5"
+            }
 
     # --- SET SEED ---
     if seed != -1:
@@ -69,40 +142,28 @@ def handler(event):
     
     # --- INFERENCE ---
     try:
-        audio_output, sample_rate, _ = infer_process(
-            ref_audio_path,
-            ref_text,
-            text,
-            model,
-            vocoder,
-            nfe_step=n_steps,
-            speed=speed,
-            device=device
-        )
-        
-        # Cleanup temp file
-        if os.path.exists(ref_audio_path):
-            os.remove(ref_audio_path)
-
-        # Encode output as base64 WAV
-        buffer = io.BytesIO()
-        sf.write(buffer, audio_output, sample_rate, format='WAV')
-        audio_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        # Reference preprocessing/ASR is served from ref_cache on repeat voices
+        job = runner.prepare(audio_data, ref_text, text, speed=speed, nfe_step=choice.steps,
+                             seed=seed if seed != -1 else None)
+        (audio_output, sample_rate), = runner([job])
+
+        # Encode output (wav by default) on the shared encoder pool
+        encoded = submit_encode(audio_output, sample_rate, output_format, output_sample_rate).result()
+        if cache_key is not None and not choice.degraded:
+            audio_cache().put(cache_key, encoded)
         
         return {
-            "audio": audio_base64,
-            "format": "wav",
-            "sample_rate": sample_rate,
+            "audio": encoded.to_base64(),
+            "format": encoded.format,
+            "sample_rate": encoded.sample_rate,
             "seed_used": seed,
-            "steps_used": n_steps,
+            **choice.info(),
+            "cached": False,
             "engine": "f5"
         }
         
     except Exception as e:
         print(f"[F5-TTS] Inference Error: {str(e)}")
-        # Cleanup on error
-        if os.path.exists(ref_audio_path):
-            os.remove(ref_audio_path)
         return {"error": f"Inference failed: {str(e)}"}
 
 # ============== START SERVERLESS ==============
@@ -0,0 +1,102 @@
+"""
+Named quality tiers for F5-TTS.
+
+Instead of a raw `steps` value, clients ask for a tier and the server picks the
+NFE step count per request. Each tier is a ladder of step counts, best first;
+the server walks down the ladder for long utterances and when the queue is
+backed up, so peak traffic gets slightly lower fidelity on time instead of
+everyone waiting behind 32-step jobs.
+
+    realtime   16 -> 12 -> 8
+    balanced   24 -> 16 -> 12
+    studio     32 -> 24 -> 16
+
+Levels: +1 for text longer than TIER_LONG_TEXT_CHARS, +1 once the queue
+reaches TIER_QUEUE_SOFT, +2 at TIER_QUEUE_HARD. An explicit `steps` in the
+request bypasses tiers entirely.
+"""
+
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+DEFAULT_QUALITY = os.environ.get("DEFAULT_QUALITY", "studio")
+TIER_LONG_TEXT_CHARS = int(os.environ.get("TIER_LONG_TEXT_CHARS", "300"))
+TIER_QUEUE_SOFT = int(os.environ.get("TIER_QUEUE_SOFT", "4"))
+TIER_QUEUE_HARD = int(os.environ.get("TIER_QUEUE_HARD", "12"))
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    name: str
+    steps: Tuple[int, ...]  # best first
+
+
+TIERS = {
+    tier.name: tier
+    for tier in (
+        QualityTier("realtime", (16, 12, 8)),
+        QualityTier("balanced", (24, 16, 12)),
+        QualityTier("studio", (32, 24, 16)),
+    )
+}
+
+# Every step count a tier can produce; warmup.py warms all of them with WARMUP_ALL_TIERS=1
+TIER_STEPS = sorted({steps for tier in TIERS.values() for steps in tier.steps})
+
+
+@dataclass
+class StepChoice:
+    steps: int
+    quality: Optional[str]  # None when the client sent explicit steps
+    degraded: bool = False
+
+    def info(self) -> dict:
+        return {"steps_used": self.steps, "quality": self.quality, "quality_degraded": self.degraded}
+
+
+def normalize_quality(quality: Optional[str]) -> str:
+    name = (quality or DEFAULT_QUALITY).strip().lower()
+    if name not in TIERS:
+        raise ValueError(f"Unknown quality '{quality}' (choose from {', '.join(TIERS)})")
+    return name
+
+
+def pressure_level(text_chars: int, queue_depth: int) -> int:
+    level = 1 if text_chars > TIER_LONG_TEXT_CHARS else 0
+    if queue_depth >= TIER_QUEUE_HARD:
+        level += 2
+    elif queue_depth >= TIER_QUEUE_SOFT:
+        level += 1
+    return level
+
+
+def choose_steps(quality: Optional[str], text_chars: int, queue_depth: int = 0,
+                 steps: Optional[int] = None) -> StepChoice:
+    """
+    Resolve the NFE step count for one request. `queue_depth` is the number
+    of other requests ahead of or alongside this one.
+    """
+    if steps is not None and quality is None:
+        return StepChoice(steps=int(steps), quality=None)
+
+    tier = TIERS[normalize_quality(quality)]
+    level = min(pressure_level(text_chars, queue_depth), len(tier.steps) - 1)
+    return StepChoice(steps=tier.steps[level], quality=tier.name, degraded=level > 0)
+
+
+class TierStats:
+    """Counts of (quality, steps) actually served, for /queue"""
+
+    def __init__(self):
+        self.served = Counter()
+        self.degraded = 0
+
+    def record(self, choice: StepChoice):
+        self.served[f"{choice.quality or 'explicit'}:{choice.steps}"] += 1
+        if choice.degraded:
+            self.degraded += 1
+
+    def stats(self) -> dict:
+        return {"served": dict(self.served), "degraded": self.degraded}
@@ -0,0 +1,158 @@
+"""
+Content-addressed cache for F5 reference audio.
+
+Characters reuse a handful of reference clips, so every request used to pay
+for the same base64 decode, temp-file write, clipping/resampling and (when
+ref_text is empty) Whisper transcription. Entries are keyed by the SHA-256 of
+the decoded audio bytes and hold everything derived from the clip:
+
+  - the clipped, RMS-normalised waveform resampled to target_sample_rate
+  - the reference mel features (filled in lazily on the inference device)
+  - the ASR transcript, if one was ever needed
+
+Eviction is LRU, bounded by entry count and by resident tensor bytes.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+import torch
+import torchaudio
+
+from f5_tts.infer.utils_infer import preprocess_ref_audio_text, target_rms, target_sample_rate
+
+
+def audio_digest(audio_bytes: bytes) -> str:
+    return hashlib.sha256(audio_bytes).hexdigest()
+
+
+def normalize_ref_text(ref_text: str) -> str:
+    """Same trailing-punctuation rule preprocess_ref_audio_text applies"""
+    if not ref_text.endswith(". ") and not ref_text.endswith("。"):
+        ref_text += " " if ref_text.endswith(".") else ". "
+    return ref_text
+
+
+@dataclass
+class PreparedReference:
+    digest: str
+    audio: torch.Tensor                      # (1, samples) at target_sample_rate
+    rms: float
+    transcript: Optional[str] = None         # ASR output, only set when it was needed
+    mel: Optional[torch.Tensor] = field(default=None, repr=False)
+
+    @property
+    def seconds(self) -> float:
+        return self.audio.shape[-1] / target_sample_rate
+
+    @property
+    def nbytes(self) -> int:
+        total = self.audio.element_size() * self.audio.nelement()
+        if self.mel is not None:
+            total += self.mel.element_size() * self.mel.nelement()
+        return total
+
+
+class RefAudioCache:
+    def __init__(self, max_entries: int = 128, max_bytes: int = 512 * 1024 * 1024, tmp_dir: str = "/tmp"):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.tmp_dir = tmp_dir
+
+        self.hits = 0
+        self.misses = 0
+        self.asr_runs = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()  # digest -> PreparedReference
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(ref.nbytes for ref in self._entries.values())
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "asr_runs": self.asr_runs,
+            "evictions": self.evictions,
+        }
+
+    def lookup(self, digest: str) -> Optional[PreparedReference]:
+        with self._lock:
+            ref = self._entries.get(digest)
+            if ref is not None:
+                self._entries.move_to_end(digest)
+            return ref
+
+    def get(self, audio_bytes: bytes, ref_text: str = ""):
+        """
+        Return (PreparedReference, ref_text) for raw reference audio bytes.
+        An empty ref_text is replaced by the (cached) ASR transcript.
+        """
+        digest = audio_digest(audio_bytes)
+        ref = self.lookup(digest)
+        if ref is not None and (ref_text or ref.transcript is not None):
+            self.hits += 1
+            return ref, normalize_ref_text(ref_text) if ref_text else ref.transcript
+
+        self.misses += 1
+        ref, ref_text = self._prepare(digest, audio_bytes, ref_text)
+        self._store(ref)
+        return ref, ref_text
+
+    def _prepare(self, digest: str, audio_bytes: bytes, ref_text: str):
+        tmp_path = os.path.join(self.tmp_dir, f"ref_audio_{uuid.uuid4().hex[:8]}.mp3")
+        with open(tmp_path, "wb") as f:
+            f.write(audio_bytes)
+        try:
+            processed_path, processed_text = preprocess_ref_audio_text(tmp_path, ref_text or "")
+            if not ref_text:
+                self.asr_runs += 1
+
+            audio, sr = torchaudio.load(processed_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        if audio.shape[0] > 1:
+            audio = torch.mean(audio, dim=0, keepdim=True)
+        rms = torch.sqrt(torch.mean(torch.square(audio))).item()
+        if rms < target_rms:
+            audio = audio * target_rms / rms
+        if sr != target_sample_rate:
+            audio = torchaudio.transforms.Resample(sr, target_sample_rate)(audio)
+
+        ref = PreparedReference(
+            digest=digest,
+            audio=audio,
+            rms=rms,
+            transcript=processed_text if not ref_text else None,
+        )
+        return ref, processed_text
+
+    def _store(self, ref: PreparedReference):
+        with self._lock:
+            existing = self._entries.get(ref.digest)
+            if existing is not None and ref.transcript is None:
+                ref.transcript = existing.transcript
+            self._entries[ref.digest] = ref
+            self._entries.move_to_end(ref.digest)
+
+            total = sum(r.nbytes for r in self._entries.values())
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or total > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                total -= evicted.nbytes
+                self.evictions += 1
@@ -1,49 +1,131 @@
 from fastapi import FastAPI, HTTPException, Body
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import torch
 import base64
-import io
 import uuid
 import os
-import soundfile as sf
+import sys
 import uvicorn
 import numpy as np
 import random
 
 # Import F5-TTS
 from f5_tts.model import DiT
-from f5_tts.infer.utils_infer import load_checkpoint, load_vocoder, infer_process
+
+# Shared TTS helpers (character-chat/tts_common, copied next to this file in the image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from f5_batch import F5BatchRunner
+from f5_models import load_f5_models
+from quality_tiers import TierStats, choose_steps, normalize_quality
+from ref_cache import RefAudioCache
+from voice_store import VoiceStore, voice_identity
+from warmup import StartupTimer, run_warmup
+
+from tts_common.audio_cache import audio_cache, is_cacheable, synthesis_key
+from tts_common.audio_encoding import encode_audio, normalize_format
+from tts_common.batching import AdmissionControl, MicroBatchScheduler, QueueFullError
 
 app = FastAPI()
 
 # --- GLOBAL STATE ---
 model = None
 vocoder = None
+runner = None
+scheduler = None
+ready_flag = False  # flips only after the model is loaded AND warmed up
+startup_timer = StartupTimer("[SERVER]")
+startup_report = None
+tier_stats = TierStats()
+# Registered reference voices; set VOICE_STORE_DIR to persist them on disk
+voice_store = VoiceStore(os.environ.get("VOICE_STORE_DIR") or None)
 device = "cuda" if torch.cuda.is_available() else "cpu"
 
+# --- BATCHING CONFIG ---
+# Requests arriving within BATCH_WINDOW_MS of each other share one DiT pass,
+# capped by request count and by total mel frames (the padded token budget).
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "8"))
+BATCH_WINDOW_MS = float(os.environ.get("BATCH_WINDOW_MS", "15"))
+BATCH_MAX_FRAMES = int(os.environ.get("BATCH_MAX_FRAMES", "24000"))
+
+# --- REFERENCE CACHE ---
+REF_CACHE_ENTRIES = int(os.environ.get("REF_CACHE_ENTRIES", "128"))
+REF_CACHE_MB = float(os.environ.get("REF_CACHE_MB", "512"))
+
+# --- ADMISSION / EXECUTORS ---
+# Blocking work never runs on the event loop, so /health and /ready stay
+# responsive during long syntheses. GPU batches run on a single dedicated
+# thread; decoding, reference preprocessing and ASR get their own small pool.
+# Requests beyond MAX_QUEUE_DEPTH are rejected with 429 + Retry-After.
+MAX_QUEUE_DEPTH = int(os.environ.get("MAX_QUEUE_DEPTH", "32"))
+PREP_WORKERS = int(os.environ.get("PREP_WORKERS", "2"))
+infer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="f5-infer")
+prep_executor = ThreadPoolExecutor(max_workers=PREP_WORKERS, thread_name_prefix="f5-prep")
+admission = AdmissionControl(
+    MAX_QUEUE_DEPTH,
+    retry_after=lambda: scheduler.estimated_wait(admission.pending) if scheduler else 5,
+)
+
 # --- PYDANTIC MODELS ---
 class InputPayload(BaseModel):
     text: str
     ref_audio: Optional[str] = None # Base64
+    voice_id: Optional[str] = None # From POST /voices, replaces ref_audio
     ref_text: Optional[str] = ""
     seed: Optional[int] = -1
-    steps: Optional[int] = 32
+    steps: Optional[int] = None # Fixed NFE steps; omit to let the server pick via quality
+    quality: Optional[str] = None # realtime | balanced | studio (default DEFAULT_QUALITY)
     speed: Optional[float] = 1.0
     engine: Optional[str] = "f5"
+    output_format: Optional[str] = "wav" # wav | flac | opus/ogg | mp3 | pcm
+    output_sample_rate: Optional[int] = None
+    cache: Optional[bool] = None # default: cache only when a seed is given
 
 class RunRequest(BaseModel):
     input: InputPayload
 
+class RegisterVoiceRequest(BaseModel):
+    ref_audio: str # Base64
+    ref_text: Optional[str] = ""
+    name: Optional[str] = None
+
 # --- LIFECYCLE ---
-@app.on_event("startup")
-async def startup_event():
+def load_models():
     global model, vocoder
+    model, vocoder = load_f5_models(device, startup_timer)
+
+async def initialize():
+    """Single startup path: load once, warm up in-process, then mark ready"""
+    global runner, scheduler, ready_flag, startup_report
+    loop = asyncio.get_running_loop()
     print(f"[SERVER] Loading F5-TTS model on {device}...")
     try:
-        model = load_checkpoint("F5-TTS", device=device)
-        vocoder = load_vocoder(is_local=False)
+        # Load and warm up on the inference thread so /health answers meanwhile
+        await loop.run_in_executor(infer_executor, load_models)
         print("[SERVER] Model loaded successfully!")
+
+        ref_cache = RefAudioCache(
+            max_entries=REF_CACHE_ENTRIES,
+            max_bytes=int(REF_CACHE_MB * 1024 * 1024),
+        )
+        runner = F5BatchRunner(model, vocoder, device, ref_cache=ref_cache)
+        await loop.run_in_executor(infer_executor, run_warmup, runner, startup_timer)
+
+        scheduler = MicroBatchScheduler(
+            runner,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_WINDOW_MS,
+            max_batch_cost=BATCH_MAX_FRAMES,
+            executor=infer_executor,
+        )
+        await scheduler.start()
+        print(f"[SERVER] Batching up to {BATCH_MAX_SIZE} requests / {BATCH_WINDOW_MS}ms window")
+
+        startup_report = startup_timer.summary()
+        ready_flag = True
         
         # Signal readiness to entrypoint script
         with open("/tmp/READY", "w") as f:
@@ -52,80 +134,203 @@ async def startup_event():
         print(f"[SERVER] CRITICAL FAILURE loading model: {e}")
         # We don't exit here, but /ready will fail
 
+@app.on_event("startup")
+async def startup_event():
+    app.state.init_task = asyncio.create_task(initialize())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if scheduler is not None:
+        await scheduler.stop()
+    infer_executor.shutdown(wait=False)
+    prep_executor.shutdown(wait=False)
+
+def queue_stats():
+    return {
+        "pending": admission.pending,
+        "max_pending": admission.max_pending,
+        "waiting_for_batch": scheduler.depth if scheduler else 0,
+        "rejected": admission.rejected,
+        "batches_run": scheduler.batches_run if scheduler else 0,
+        "avg_batch_seconds": round(scheduler.avg_batch_seconds, 3) if scheduler else None,
+        "ref_cache": runner.ref_cache.stats() if runner else None,
+        "quality": tier_stats.stats(),
+        "audio_cache": audio_cache().stats(),
+    }
+
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+async def health():
+    return {"status": "ok", "queue_depth": admission.pending}
+
+@app.get("/queue")
+async def queue():
+    return queue_stats()
 
 @app.get("/ready")
-def ready():
-    if model is not None and vocoder is not None:
-        return {"ready": True}
-    raise HTTPException(status_code=503, detail="Model not loaded")
+async def ready():
+    if ready_flag:
+        return {"ready": True, "startup": startup_report}
+    raise HTTPException(status_code=503, detail="Model loading or warming up")
+
+def register_voice_sync(request: RegisterVoiceRequest):
+    audio_data = base64.b64decode(request.ref_audio)
+    voice = voice_store.register(audio_data, request.ref_text or "", request.name)
+    # Preprocess (and transcribe) now so the first job with this voice is a cache hit
+    _, ref_text = runner.ref_cache.get(voice.audio, voice.ref_text)
+    return {**voice.info(), "ref_text": voice.ref_text or ref_text.strip()}
+
+@app.post("/voices")
+async def register_voice(request: RegisterVoiceRequest):
+    if not ready_flag:
+        raise HTTPException(status_code=503, detail="Model not loaded yet")
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(prep_executor, register_voice_sync, request)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid reference audio: {str(e)}")
+
+@app.get("/voices")
+async def list_voices():
+    return {"voices": voice_store.list()}
+
+@app.delete("/voices/{voice_id}")
+async def delete_voice(voice_id: str):
+    if not voice_store.delete(voice_id):
+        raise HTTPException(status_code=404, detail=f"Unknown voice_id: {voice_id}")
+    return {"deleted": voice_id}
 
 @app.post("/run")
 async def run(request: RunRequest):
     global model, vocoder
     
-    if model is None:
+    if not ready_flag:
         raise HTTPException(status_code=503, detail="Model not loaded yet")
 
     input_data = request.input
     
     if not input_data.text:
         return {"error": "No text provided"}
+    if input_data.voice_id:
+        if voice_store.get(input_data.voice_id) is None:
+            return {"error": f"Unknown voice_id: {input_data.voice_id}"}
+    elif not input_data.ref_audio:
+        return {"error": "Reference audio (ref_audio) or voice_id is required"}
+    try:
+        normalize_format(input_data.output_format)
+        if input_data.quality is not None or input_data.steps is None:
+            normalize_quality(input_data.quality)
+    except ValueError as e:
+        return {"error": str(e)}
 
-    # Reference Audio Handling
-    temp_id = str(uuid.uuid4())[:8]
-    ref_audio_path = f"/tmp/ref_audio_{temp_id}.mp3"
-    
-    if input_data.ref_audio:
+    # Deterministic repeats are answered from the audio cache without queueing
+    cache_key = None
+    if is_cacheable({"cache": input_data.cache, "seed": input_data.seed}):
+        loop = asyncio.get_running_loop()
         try:
-            audio_data = base64.b64decode(input_data.ref_audio)
-            with open(ref_audio_path, "wb") as f:
-                f.write(audio_data)
+            cache_key, encoded = await loop.run_in_executor(prep_executor, cache_lookup, input_data)
         except Exception as e:
-            return {"error": f"Invalid reference audio base64: {str(e)}"}
+            return {"error": f"Invalid reference audio: {str(e)}"}
+        if encoded is not None:
+            return completed_response(encoded, {"cached": True})
+
+    try:
+        with admission:
+            return await synthesize(input_data, cache_key)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+def audio_cache_key(input_data: InputPayload) -> str:
+    """Same key the RunPod handler builds, so both can share AUDIO_CACHE_DIR"""
+    ref_text = input_data.ref_text or ""
+    if input_data.voice_id:
+        voice = voice_store.get(input_data.voice_id)
+        audio_data = voice.audio
+        ref_text = ref_text or voice.ref_text
+    else:
+        audio_data = base64.b64decode(input_data.ref_audio)
+    # Keyed on the requested quality, not the steps actually used, so a
+    # full-quality rendering also serves requests that would be degraded
+    explicit = input_data.steps is not None and input_data.quality is None
+    return synthesis_key(
+        "f5", input_data.text, voice_identity(audio_data, ref_text), input_data.seed,
+        {
+            "quality": None if explicit else normalize_quality(input_data.quality),
+            "steps": int(input_data.steps) if explicit else None,
+            "speed": float(input_data.speed) if input_data.speed is not None else None,
+        },
+        normalize_format(input_data.output_format),
+        input_data.output_sample_rate,
+    )
+
+def cache_lookup(input_data: InputPayload):
+    """-> (cache key, cached audio or None); decodes, hashes and may read disk, so runs on prep_executor"""
+    cache_key = audio_cache_key(input_data)
+    return cache_key, audio_cache().get(cache_key)
+
+def completed_response(encoded, extra: dict):
+    return {
+        "id": f"job-{str(uuid.uuid4())[:8]}",
+        "status": "COMPLETED", # RunPod serverless expects this format often
+        "output": {
+            "audio": encoded.to_base64(),
+            "format": encoded.format,
+            "sample_rate": encoded.sample_rate,
+            **extra,
+            "engine": "f5"
+        }
+    }
+
+def prepare_job(input_data: InputPayload, nfe_step: int):
+    """Decode the reference clip and preprocess it (runs on prep_executor)"""
+    ref_text = input_data.ref_text
+    if input_data.voice_id:
+        voice = voice_store.get(input_data.voice_id)
+        audio_data = voice.audio
+        ref_text = ref_text or voice.ref_text
     else:
-        return {"error": "Reference audio (ref_audio) is required"}
+        audio_data = base64.b64decode(input_data.ref_audio)
+    return runner.prepare(
+        audio_data,
+        ref_text,
+        input_data.text,
+        input_data.speed,
+        nfe_step,
+        input_data.seed if input_data.seed != -1 else None,
+    )
+
+async def synthesize(input_data: InputPayload, cache_key: Optional[str] = None):
+    loop = asyncio.get_running_loop()
+
+    # Step down the NFE ladder for long texts or when others are queued with us
+    choice = choose_steps(input_data.quality, len(input_data.text), admission.pending - 1, input_data.steps)
 
-    # Seed
-    if input_data.seed != -1:
-        torch.manual_seed(input_data.seed)
-        np.random.seed(input_data.seed)
-        random.seed(input_data.seed)
+    # Reference Audio Handling (cached by content hash)
+    try:
+        job = await loop.run_in_executor(prep_executor, prepare_job, input_data, choice.steps)
+    except Exception as e:
+        print(f"Reference Error: {str(e)}")
+        return {"error": f"Invalid reference audio: {str(e)}"}
 
-    # Inference
+    # Inference: the DiT pass is shared with concurrent requests
     try:
-        audio_output, sample_rate, _ = infer_process(
-            ref_audio_path,
-            input_data.ref_text,
-            input_data.text,
-            model,
-            vocoder,
-            nfe_step=input_data.steps,
-            speed=input_data.speed,
-            device=device
+        audio_output, sample_rate = await scheduler.submit(job, cost=job.cost, key=job.batch_key)
+        encoded = await loop.run_in_executor(
+            prep_executor,
+            encode_audio,
+            audio_output,
+            sample_rate,
+            input_data.output_format,
+            input_data.output_sample_rate,
         )
-        
-        # Cleanup
-        if os.path.exists(ref_audio_path):
-            os.remove(ref_audio_path)
-
-        # Encode
-        buffer = io.BytesIO()
-        sf.write(buffer, audio_output, sample_rate, format='WAV')
-        audio_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
-        return {
-            "id": f"job-{temp_id}",
-            "status": "COMPLETED", # RunPod serverless expects this format often
-            "output": {
-                "audio": audio_base64,
-                "format": "wav",
-                "sample_rate": sample_rate,
-                "engine": "f5"
-            }
-        }
+        tier_stats.record(choice)
+        if cache_key is not None and not choice.degraded:
+            await loop.run_in_executor(prep_executor, audio_cache().put, cache_key, encoded)
+
+        return completed_response(encoded, {**choice.info(), "cached": False})
         
     except Exception as e:
         print(f"Inference Error: {str(e)}")
@@ -0,0 +1,156 @@
+"""
+Server-side registry of F5 reference voices.
+
+Clients register a reference clip once and get back a voice_id, then send
+that id instead of re-uploading the base64 clip with every job. Voice ids are
+content-addressed (derived from the SHA-256 of the audio bytes), so
+registering the same clip twice returns the same id.
+
+With a storage_dir (e.g. a RunPod network volume) voices are persisted as
+<voice_id>.audio + <voice_id>.json and reloaded at startup, so every worker
+sharing the volume can serve them.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from ref_cache import audio_digest, normalize_ref_text
+
+VOICE_ID_LENGTH = 16
+VOICE_ID_PATTERN = re.compile(rf"^[0-9a-f]{{{VOICE_ID_LENGTH}}}$")
+
+
+def voice_identity(audio: bytes, ref_text: str = "") -> str:
+    """
+    Audio-cache identity of a reference: the voice_id it would register under
+    plus its transcript, so a registered voice and the same clip sent inline
+    share cache entries.
+    """
+    return f"{audio_digest(audio)[:VOICE_ID_LENGTH]}:{normalize_ref_text(ref_text.strip()) if ref_text else ''}"
+
+
+def is_valid_voice_id(voice_id) -> bool:
+    # voice ids end up in file paths, so only accept what register() produces
+    return isinstance(voice_id, str) and bool(VOICE_ID_PATTERN.match(voice_id))
+
+
+@dataclass
+class StoredVoice:
+    voice_id: str
+    ref_text: str = ""
+    name: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    audio: bytes = field(default=b"", repr=False)
+
+    def info(self) -> dict:
+        info = asdict(self)
+        del info["audio"]
+        info["bytes"] = len(self.audio)
+        return info
+
+
+class VoiceStore:
+    def __init__(self, storage_dir: Optional[str] = None):
+        self.storage_dir = storage_dir
+        self._voices: Dict[str, StoredVoice] = {}
+        self._lock = threading.Lock()
+
+        if storage_dir:
+            os.makedirs(storage_dir, exist_ok=True)
+            self._load_all()
+
+    def __len__(self):
+        return len(self._voices)
+
+    def __contains__(self, voice_id):
+        return voice_id in self._voices
+
+    def _paths(self, voice_id: str):
+        base = os.path.join(self.storage_dir, voice_id)
+        return f"{base}.audio", f"{base}.json"
+
+    def _load_all(self):
+        for filename in os.listdir(self.storage_dir):
+            voice_id = filename[:-len(".json")]
+            if filename.endswith(".json") and is_valid_voice_id(voice_id):
+                self._load(voice_id)
+        print(f"[VoiceStore] Loaded {len(self._voices)} voices from {self.storage_dir}")
+
+    def _load(self, voice_id: str) -> Optional[StoredVoice]:
+        audio_path, meta_path = self._paths(voice_id)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            with open(audio_path, "rb") as f:
+                audio = f.read()
+        except Exception as e:
+            print(f"[VoiceStore] Error loading voice {voice_id}: {e}")
+            return None
+
+        voice = StoredVoice(
+            voice_id=voice_id,
+            ref_text=meta.get("ref_text", ""),
+            name=meta.get("name"),
+            created_at=meta.get("created_at", time.time()),
+            audio=audio,
+        )
+        self._voices[voice_id] = voice
+        return voice
+
+    def register(self, audio: bytes, ref_text: str = "", name: Optional[str] = None) -> StoredVoice:
+        if not audio:
+            raise ValueError("Reference audio is empty")
+        voice_id = audio_digest(audio)[:VOICE_ID_LENGTH]
+
+        with self._lock:
+            existing = self._voices.get(voice_id)
+            if existing is not None and not ref_text and not name:
+                return existing
+
+            voice = StoredVoice(
+                voice_id=voice_id,
+                ref_text=ref_text or (existing.ref_text if existing else ""),
+                name=name or (existing.name if existing else None),
+                audio=audio,
+            )
+            if self.storage_dir:
+                audio_path, meta_path = self._paths(voice_id)
+                with open(audio_path, "wb") as f:
+                    f.write(audio)
+                # Write metadata last: it marks the voice as complete on disk
+                with open(meta_path, "w") as f:
+                    json.dump({k: v for k, v in voice.info().items() if k != "bytes"}, f)
+            self._voices[voice_id] = voice
+            return voice
+
+    def get(self, voice_id: str) -> Optional[StoredVoice]:
+        if not is_valid_voice_id(voice_id):
+            return None
+        voice = self._voices.get(voice_id)
+        if voice is None and self.storage_dir:
+            # Another worker on the same volume may have registered it
+            audio_path, meta_path = self._paths(voice_id)
+            if os.path.exists(meta_path):
+                with self._lock:
+                    voice = self._load(voice_id)
+        return voice
+
+    def delete(self, voice_id: str) -> bool:
+        if not is_valid_voice_id(voice_id):
+            return False
+        with self._lock:
+            removed = self._voices.pop(voice_id, None) is not None
+            if self.storage_dir:
+                for path in self._paths(voice_id):
+                    if os.path.exists(path):
+                        os.remove(path)
+                        removed = True
+            return removed
+
+    def list(self) -> List[dict]:
+        return [voice.info() for voice in self._voices.values()]
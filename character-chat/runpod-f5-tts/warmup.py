@@ -1,50 +1,112 @@
-from f5_tts.infer.utils_infer import load_checkpoint, load_vocoder, infer_process
-import torch
-import os
+"""
+In-process warmup and startup timing for the F5 worker.
+
+The server (and the RunPod handler) load the model once and call run_warmup()
+on the same F5BatchRunner that serves traffic, so CUDA kernels, cuDNN
+autotuning and the allocator pools are hot before /ready flips.
+
+Each length in WARMUP_TEXT_LENGTHS (comma-separated character counts,
+default "40,160,400") is synthesized once, at the step count the default
+quality tier picks for it on an idle queue. Boot stays at one inference per
+length bucket.
+
+  WARMUP_STEPS      comma-separated NFE step counts: warm every length at each
+                    of these instead. Set WARMUP_STEPS="" to skip warmup entirely.
+  WARMUP_ALL_TIERS  "1" warms every length at every tier step count
+                    (quality_tiers.TIER_STEPS) so no tier or degraded level hits
+                    cold kernels, at the cost of a much longer boot.
+"""
+
 import io
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
 import soundfile as sf
 
-print("Running warmup inference...")
-
-device = "cuda" if torch.cuda.is_available() else "cpu"
-
-try:
-    # We must reload/access the model (or assume it's cached/shared if using a specific runner, 
-    # but here we are a separate process in the entrypoint script flow.
-    # To keep warmup fast, we might strictly rely on the server doing the first inference,
-    # OR we load it just to prove inference works.
-    # Given the entrypoint flow "python3 load_model.py" then "python3 warmup.py", 
-    # these are separate processes. The model needs to be loaded again.
-    # However, 'load_model.py' mainly acted as a sanity check.
-    # To actually warmup, we need to load and run.
-    
-    model = load_checkpoint(target_dir=None, checkpoint_name="F5-TTS", device=device, show_progress=False)
-    vocoder = load_vocoder(is_local=False)
-
-    # Create dummy ref audio
-    dummy_wav_path = "/tmp/warmup_ref.wav"
-    # Create a 1-second silence or noise file for reference if needed
-    # F5-TTS needs a file.
-    sr = 24000
-    dummy_audio = torch.zeros(sr * 1).numpy()
-    sf.write(dummy_wav_path, dummy_audio, sr)
-
-    print("Synthesizing warmup text...")
-    audio_output, sample_rate, _ = infer_process(
-        dummy_wav_path,
-        "Warmup reference",
-        "Warmup generation text",
-        model,
-        vocoder,
-        nfe_step=16, # Fast steps
-        speed=1.0,
-        device=device
-    )
-    
-    print("Warmup complete. Audio generated.")
-
-except Exception as e:
-    print(f"WARMUP FAILED (Non-fatal, but concerning): {e}")
-    # We don't exit 1 here necessarily, but it's good to know.
-    # Ideally warmup proves the system works.
-    exit(0)
+from quality_tiers import TIER_STEPS, choose_steps
+
+WARMUP_REF_TEXT = "This is a short warmup reference clip."
+WARMUP_SENTENCE = "The quick brown fox jumps over the lazy dog while the band keeps playing. "
+
+
+def parse_int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+WARMUP_TEXT_LENGTHS = parse_int_list(os.environ.get("WARMUP_TEXT_LENGTHS", "40,160,400"))
+WARMUP_ALL_TIERS = os.environ.get("WARMUP_ALL_TIERS", "0") == "1"
+# None: per length, the step count the default tier would serve it at
+WARMUP_STEPS = TIER_STEPS if WARMUP_ALL_TIERS else (
+    parse_int_list(os.environ["WARMUP_STEPS"]) if "WARMUP_STEPS" in os.environ else None
+)
+
+
+class StartupTimer:
+    """Records wall time per startup phase and prints a breakdown"""
+
+    def __init__(self, prefix: str = "[STARTUP]"):
+        self.prefix = prefix
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - start, 3)
+            print(f"{self.prefix} {name}: {self.phases[name]:.2f}s")
+
+    def summary(self) -> dict:
+        total = round(time.perf_counter() - self.started, 3)
+        breakdown = ", ".join(f"{name}={secs:.2f}s" for name, secs in self.phases.items())
+        print(f"{self.prefix} total {total:.2f}s ({breakdown})")
+        return {"phases": dict(self.phases), "total": total}
+
+
+def warmup_reference_audio(sample_rate: int = 24000, seconds: float = 3.0) -> bytes:
+    """
+    A voiced-sounding synthetic clip. Pure silence would be trimmed away by the
+    reference preprocessing, so use a few harmonics with a slow amplitude wobble.
+    """
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    wave = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 560)))
+    wave = 0.2 * envelope * wave / np.max(np.abs(wave))
+    buffer = io.BytesIO()
+    sf.write(buffer, wave.astype(np.float32), sample_rate, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def warmup_text(length: int) -> str:
+    repeats = length // len(WARMUP_SENTENCE) + 1
+    return (WARMUP_SENTENCE * repeats)[:length].strip()
+
+
+def warmup_plan(text_lengths, steps):
+    """(text length, steps) buckets to warm; steps=None picks one count per length"""
+    if steps is None:
+        return [(length, choose_steps(None, length).steps) for length in text_lengths]
+    return [(length, nfe_step) for nfe_step in steps for length in text_lengths]
+
+
+def run_warmup(runner, timer: StartupTimer, text_lengths=None, steps=None):
+    """Synthesize each (text length, steps) bucket once through the serving path"""
+    text_lengths = WARMUP_TEXT_LENGTHS if text_lengths is None else text_lengths
+    plan = warmup_plan(text_lengths, WARMUP_STEPS if steps is None else steps)
+    if not plan:
+        print(f"{timer.prefix} Warmup disabled")
+        return
+
+    try:
+        ref_audio = warmup_reference_audio()
+        for length, nfe_step in plan:
+            with timer.phase(f"warmup_{length}ch_{nfe_step}steps"):
+                job = runner.prepare(ref_audio, WARMUP_REF_TEXT, warmup_text(length), nfe_step=nfe_step)
+                runner([job])
+    except Exception as e:
+        # Non-fatal: the worker still serves, just with a slower first request
+        print(f"{timer.prefix} WARMUP FAILED (non-fatal): {e}")
@@ -2,17 +2,59 @@
 FastMaya (Maya-1) RunPod Serverless Handler
 
 Uses the FastMaya TTSEngine for 50x realtime TTS with voice descriptions.
-Generates 48kHz audio via integrated AudioSR upsampler.
+Generates 48kHz audio via integrated AudioSR upsampler ("hd" audio tier), or
+24kHz straight from the codec with the upsampler skipped ("native" tier).
+
+The handler is async: up to MAYA_MAX_CONCURRENCY jobs run on a worker at
+once and are micro-batched into shared engine calls (see maya_engine.py),
+with the voice-description prefix reused across requests.
+
+With "stream": true, audio is decoded from the codec tokens while the LM is
+still generating and yielded in short chunks (see maya_stream.py).
+
+Long texts are split at sentence / clause boundaries; the segments are
+generated as one batch with the same voice and seed and joined with short
+cross-fades, so a long reply takes about as long as its longest sentence.
 
 GPU Requirements:
 - 8GB+ VRAM (24GB recommended for longer texts)
 - A100/L40S/RTX 4090 for best performance
 """
 
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import runpod
-import base64
-import io
-import numpy as np
+
+# Shared TTS helpers (character-chat/tts_common, copied next to this file in the image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from tts_common.audio_cache import audio_cache, is_cacheable, normalize_text, synthesis_key
+from tts_common.audio_encoding import encode_audio, output_options, to_mono_float32
+from tts_common.audio_stitching import crossfade_concat
+from tts_common.batching import MicroBatchScheduler
+from tts_common.model_store import activate_store
+from tts_common.text_segmentation import split_sentences
+
+from maya_engine import AUDIO_TIERS, HD_SAMPLE_RATE, MayaBatchRunner, load_engine
+from maya_stream import SNAC_SAMPLE_RATE, SnacStreamDecoder, snac_decoder, stream_tokens, streaming_supported
+
+# "hd" (48kHz, AudioSR) or "native" (24kHz); requests asking for <= 24kHz
+# output get "native" automatically, upsampling them would be wasted work
+DEFAULT_AUDIO_TIER = os.environ.get("DEFAULT_AUDIO_TIER", "hd")
+
+# Jobs RunPod may hand this worker at once; they share engine batches
+MAYA_MAX_CONCURRENCY = int(os.environ.get("MAYA_MAX_CONCURRENCY", "8"))
+MAYA_MAX_BATCH = int(os.environ.get("MAYA_MAX_BATCH", str(MAYA_MAX_CONCURRENCY)))
+MAYA_BATCH_WAIT_MS = float(os.environ.get("MAYA_BATCH_WAIT_MS", "15"))
+
+# Texts longer than this are generated as a batch of sentence segments
+MAYA_SEGMENT_CHARS = int(os.environ.get("MAYA_SEGMENT_CHARS", "240"))
+MAYA_SEGMENT_MIN_CHARS = int(os.environ.get("MAYA_SEGMENT_MIN_CHARS", "40"))
+MAYA_CROSSFADE_S = float(os.environ.get("MAYA_CROSSFADE_S", "0.04"))
 
 # =============================================
 # MODEL LOADING
@@ -21,91 +63,252 @@ import numpy as np
 print("[FastMaya] Loading Maya-1 TTS Engine...")
 
 try:
-    from Maya1.tts_engine import TTSEngine
-    
-    # Use 80% of available VRAM, single GPU
-    tts_engine = TTSEngine(memory_util=0.8, tp=1)
+    # Point the hub at the local Maya-1 + SNAC snapshot (offline) when one is mounted
+    activate_store("fastmaya")
+
+    # 80% of available VRAM, single GPU, prefix caching on (MAYA_* env vars)
+    tts_engine = load_engine()
     print("[FastMaya] TTSEngine loaded successfully!")
 except Exception as e:
     print(f"[FastMaya] Failed to load TTSEngine: {e}")
     tts_engine = None
 
+# One thread owns the GPU; encoding and audio cache disk I/O run on a separate pool
+infer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="maya-infer")
+encode_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="maya-encode")
+# Streams pull tokens from the pipeline, which batches them itself
+stream_executor = ThreadPoolExecutor(max_workers=MAYA_MAX_CONCURRENCY, thread_name_prefix="maya-stream")
+scheduler = None
+
+
+async def get_scheduler() -> MicroBatchScheduler:
+    """Started lazily: RunPod owns the event loop"""
+    global scheduler
+    if scheduler is None:
+        scheduler = MicroBatchScheduler(
+            MayaBatchRunner(tts_engine),
+            max_batch_size=MAYA_MAX_BATCH,
+            max_wait_ms=MAYA_BATCH_WAIT_MS,
+            executor=infer_executor,
+        )
+        await scheduler.start()
+    return scheduler
+
+
+def concurrency_modifier(current_concurrency: int) -> int:
+    return MAYA_MAX_CONCURRENCY
+
 # =============================================
 # HANDLER
 # =============================================
 
-def handler(job):
+def audio_fields(encoded, used_seed, cached):
+    return {
+        "audio": encoded.to_base64(),
+        "format": encoded.format,
+        "sample_rate": encoded.sample_rate,
+        "seed_used": used_seed,
+        "cached": cached
+    }
+
+
+def choose_tier(job_input, output_sample_rate):
+    tier = str(job_input.get("audio_tier") or "").strip().lower()
+    if not tier:
+        tier = "native" if output_sample_rate and output_sample_rate <= SNAC_SAMPLE_RATE else DEFAULT_AUDIO_TIER
+    if tier not in AUDIO_TIERS:
+        raise ValueError(f"Unsupported audio_tier '{tier}' (choose from {', '.join(AUDIO_TIERS)})")
+    return tier
+
+
+def segment_text(text):
+    if len(text) <= MAYA_SEGMENT_CHARS:
+        return [text]
+    return split_sentences(text, min_chars=MAYA_SEGMENT_MIN_CHARS, max_chars=MAYA_SEGMENT_CHARS) or [text]
+
+
+async def synthesize(text, voice_description, seed, tier, output_format, output_sample_rate, cache_key):
+    segments = segment_text(text)
+
+    # Generate audio using FastMaya, batched with concurrent jobs that share
+    # our seed (the batch is seeded once; -1 gets a fresh seed per batch).
+    # Segments of one text all use one seed, so they land in the same batch.
+    # Batches also share a tier: the upsampler runs for the whole batch or not at all.
+    seed_key = seed if seed != -1 else None
+    if seed_key is None and len(segments) > 1:
+        seed_key = random.randint(0, 2**32 - 1)
+    upsample = AUDIO_TIERS[tier]
+    batcher = await get_scheduler()
+    results = await asyncio.gather(*(
+        batcher.submit((segment, voice_description, seed_key, upsample), key=(seed_key, upsample))
+        for segment in segments
+    ))
+    _, used_seed, sample_rate = results[0]
+    waves = [to_mono_float32(audio) for audio, _, _ in results]
+    audio = crossfade_concat(waves, sample_rate, MAYA_CROSSFADE_S) if len(waves) > 1 else waves[0]
+
+    # Encode (vectorized, clipped int16 WAV by default) at the rate the engine
+    # actually produced unless the request asked for another one
+    loop = asyncio.get_running_loop()
+    encoded = await loop.run_in_executor(
+        encode_executor, encode_audio, audio, sample_rate, output_format, output_sample_rate
+    )
+    if cache_key is not None:
+        await loop.run_in_executor(encode_executor, audio_cache().put, cache_key, encoded)
+
+    # Engines that can't skip AudioSR answer "native" requests with 48kHz audio
+    used_tier = "hd" if sample_rate == HD_SAMPLE_RATE else "native"
+    print(f"[FastMaya] ✅ Generated {len(audio)} samples @ {sample_rate}Hz from {len(segments)} segment(s) "
+          f"(seed={used_seed}) -> {encoded.format} {encoded.sample_rate}Hz {len(encoded.data)} bytes")
+    return {**audio_fields(encoded, used_seed, cached=False), "audio_tier": used_tier}
+
+
+def next_windows(tokens, decoder):
+    """One generation step: pull new tokens, return decoded windows (None when done)"""
+    token_ids = next(tokens, None)
+    if token_ids is None:
+        return None
+    return decoder.push(token_ids)
+
+
+async def stream_audio(text, voice_description, seed, tier, output_format, output_sample_rate):
+    """Yield audio chunks while the LM is still generating, one segment after another"""
+    loop = asyncio.get_running_loop()
+    target_sr = output_sample_rate or (HD_SAMPLE_RATE if AUDIO_TIERS[tier] else SNAC_SAMPLE_RATE)
+    used_seed = seed if seed != -1 else random.randint(0, 2**32 - 1)
+    segments = segment_text(text)
+
+    started = time.perf_counter()
+    seq = 0
+    frames = 0
+    for index, segment in enumerate(segments):
+        last_segment = index == len(segments) - 1
+        decoder = SnacStreamDecoder(snac_decoder(tts_engine))
+        tokens = stream_tokens(tts_engine, segment, voice_description, used_seed)
+        while not decoder.finished:
+            windows = await loop.run_in_executor(stream_executor, next_windows, tokens, decoder)
+            if windows is None:
+                break
+            for window in windows:
+                encoded = await loop.run_in_executor(
+                    encode_executor, encode_audio, window, SNAC_SAMPLE_RATE, output_format, target_sr
+                )
+                if seq == 0:
+                    print(f"[FastMaya] First chunk after {(time.perf_counter() - started) * 1000:.0f}ms")
+                yield {"seq": seq, "final": False, **audio_fields(encoded, used_seed, cached=False)}
+                seq += 1
+        tokens.close()
+
+        # The segment's remaining audio; the very last chunk is marked final
+        tail = await loop.run_in_executor(stream_executor, decoder.flush)
+        frames += decoder.emitted_frames
+        chunk = {"seq": seq, "final": last_segment, "seed_used": used_seed}
+        if tail is not None and len(tail):
+            encoded = await loop.run_in_executor(
+                encode_executor, encode_audio, tail, SNAC_SAMPLE_RATE, output_format, target_sr
+            )
+            chunk.update(audio_fields(encoded, used_seed, cached=False))
+        elif not last_segment:
+            continue
+        yield chunk
+        seq += 1
+
+    print(f"[FastMaya] ✅ Streamed {frames} frames from {len(segments)} segment(s) in {seq} chunks "
+          f"({time.perf_counter() - started:.2f}s, seed={used_seed})")
+
+
+async def handler(job):
     """
-    RunPod job handler for FastMaya TTS.
+    RunPod job handler for FastMaya TTS (async generator).
     
     Input:
     {
         "text": "The text to synthesize",
         "voice_description": "Male, middle-aged, Ghanaian accent...",
-        "seed": -1  (optional)
+        "seed": -1  (optional),
+        "output_format": "wav"  (optional: wav | flac | opus/ogg | mp3 | pcm),
+        "output_sample_rate": 48000  (optional),
+        "audio_tier": "hd"  (optional: hd = 48kHz via AudioSR | native = 24kHz, no upsampler;
+                             defaults to native when output_sample_rate <= 24000),
+        "cache": true  (optional; default: cached only when a seed is given),
+        "stream": false  (optional)
     }
     
-    Output:
+    Output (yielded once):
     {
-        "audio": "<base64 encoded WAV>",
+        "audio": "<base64 encoded audio>",
         "format": "wav",
-        "sample_rate": 48000,
-        "seed_used": <int>
+        "sample_rate": 48000,  (the rate of the returned audio)
+        "audio_tier": "hd",
+        "seed_used": <int>,
+        "cached": false
     }
+
+    With "stream": true, chunks of the same shape plus "seq" and "final" are
+    yielded as the audio is generated; each chunk's audio is independently
+    decodable. Streamed chunks are always "audio_tier": "native" (resampled to
+    the output rate, no AudioSR). The final chunk may carry no audio. Consume chunks via
+    /stream/{job_id}; /run and /runsync return the aggregated list.
     """
     
     job_input = job["input"]
     
     text = job_input.get("text", "")
-    voice_description = job_input.get("voice_description", "Neutral male voice")
+    # Canonical form: same voice -> byte-identical prompt prefix -> backend prefix-cache hit
+    voice_description = normalize_text(job_input.get("voice_description", "Neutral male voice"))
     seed = job_input.get("seed", -1)
+    stream = bool(job_input.get("stream", False))
     
     if not text:
-        return {"error": "No text provided"}
+        yield {"error": "No text provided"}
+        return
+
+    try:
+        output_format, output_sample_rate = output_options(job_input)
+        tier = choose_tier(job_input, output_sample_rate)
+    except ValueError as e:
+        yield {"error": str(e)}
+        return
     
-    if tts_engine is None:
-        return {"error": "TTSEngine not loaded"}
+    # Deterministic requests (fixed seed or "cache": true) may be served from the audio cache
+    cache_key = None
+    if is_cacheable(job_input):
+        cache_key = synthesis_key(
+            "fastmaya", text, voice_description, seed if seed != -1 else None,
+            {"tier": tier}, output_format, output_sample_rate,
+        )
+        encoded = await asyncio.get_running_loop().run_in_executor(encode_executor, audio_cache().get, cache_key)
+        if encoded is not None:
+            result = {**audio_fields(encoded, seed, cached=True), "audio_tier": tier}
+            yield {"seq": 0, "final": True, **result} if stream else result
+            return
     
-    # Set seed for determinism
-    import torch
-    if seed != -1:
-        torch.manual_seed(seed)
-        used_seed = seed
-    else:
-        used_seed = torch.randint(0, 2**32 - 1, (1,)).item()
-        torch.manual_seed(used_seed)
+    if tts_engine is None:
+        yield {"error": "TTSEngine not loaded"}
+        return
     
     print(f"[FastMaya] Generating: '{text[:50]}...' with voice='{voice_description[:30]}...'")
     
     try:
-        # Generate audio using FastMaya
-        audio = tts_engine.generate(text, voice_description)
-        
-        # Convert numpy array to WAV bytes
-        import scipy.io.wavfile as wavfile
-        buffer = io.BytesIO()
-        
-        # Audio is 48kHz from FastMaya's built-in AudioSR upsampler
-        audio_int16 = (audio * 32767).astype(np.int16)
-        wavfile.write(buffer, 48000, audio_int16)
-        buffer.seek(0)
-        
-        audio_b64 = base64.b64encode(buffer.read()).decode("utf-8")
-        
-        print(f"[FastMaya] ✅ Generated {len(audio_int16)} samples (seed={used_seed})")
-        
-        return {
-            "audio": audio_b64,
-            "format": "wav",
-            "sample_rate": 48000,
-            "seed_used": used_seed
-        }
+        # Streamed windows are SNAC output resampled rather than super-resolved:
+        # label them "native" whatever tier was asked for, and don't cache them
+        if stream and streaming_supported(tts_engine):
+            async for chunk in stream_audio(text, voice_description, seed, tier, output_format, output_sample_rate):
+                yield {**chunk, "audio_tier": "native"}
+            return
+
+        result = await synthesize(text, voice_description, seed, tier, output_format, output_sample_rate, cache_key)
+        yield {"seq": 0, "final": True, **result} if stream else result
         
     except Exception as e:
         print(f"[FastMaya] Error: {e}")
         import traceback
         traceback.print_exc()
-        return {"error": str(e)}
+        yield {"error": str(e)}
 
 
-runpod.serverless.start({"handler": handler})
+runpod.serverless.start({
+    "handler": handler,
+    "concurrency_modifier": concurrency_modifier,
+    "return_aggregate_stream": True,
+})
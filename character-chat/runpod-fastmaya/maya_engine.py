@@ -0,0 +1,144 @@
+"""
+Batched access to the FastMaya TTSEngine.
+
+Maya-1 prompts start with the voice description, and traffic concentrates on
+a few dozen character voices, so consecutive prompts share long prefixes.
+load_engine() turns on the inference backend's prefix caching, so the KV
+blocks of a prefix seen before are reused instead of re-prefilled per job.
+The handler normalizes each description so every request for a voice
+produces a byte-identical prefix.
+
+MayaBatchRunner is the blocking `run_batch` for tts_common.batching's
+MicroBatchScheduler: concurrent jobs are generated as one engine batch,
+ordered by voice so shared prefixes sit next to each other.
+
+Audio tiers: "hd" runs the engine's AudioSR upsampler (48 kHz), "native"
+skips it and returns the SNAC codec's 24 kHz output.
+"""
+
+import inspect
+import os
+import sys
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from maya_stream import SNAC_SAMPLE_RATE, generate_native, streaming_supported
+
+MAYA_MEMORY_UTIL = float(os.environ.get("MAYA_MEMORY_UTIL", "0.8"))
+MAYA_TP = int(os.environ.get("MAYA_TP", "1"))
+MAYA_PREFIX_CACHING = os.environ.get("MAYA_PREFIX_CACHING", "1") == "1"
+
+# FastMaya's built-in AudioSR upsampler produces 48kHz
+HD_SAMPLE_RATE = 48000
+# audio tier -> run the upsampler?
+AUDIO_TIERS = {"hd": True, "native": False}
+
+
+@contextmanager
+def backend_prefix_caching(enabled: bool, *modules):
+    """
+    Set enable_prefix_caching on every backend config handed to lmdeploy's
+    pipeline() while TTSEngine builds its pipeline (lmdeploy leaves it off
+    by default and TTSEngine doesn't expose it).
+    """
+    def wrap(pipeline):
+        def prefix_cached_pipeline(model_path, backend_config=None, *args, **kwargs):
+            if backend_config is None:
+                from lmdeploy import TurbomindEngineConfig
+                backend_config = TurbomindEngineConfig()
+            backend_config.enable_prefix_caching = enabled
+            return pipeline(model_path, backend_config, *args, **kwargs)
+        return prefix_cached_pipeline
+
+    patched = [(m, m.pipeline) for m in modules if m is not None and callable(getattr(m, "pipeline", None))]
+    for module, pipeline in patched:
+        module.pipeline = wrap(pipeline)
+    try:
+        yield
+    finally:
+        for module, pipeline in patched:
+            module.pipeline = pipeline
+
+
+def prefix_caching_enabled(engine) -> Optional[bool]:
+    """What the engine's backend actually runs with (None: can't tell)"""
+    config = getattr(getattr(engine, "pipe", None), "backend_config", None)
+    return getattr(config, "enable_prefix_caching", None)
+
+
+def load_engine():
+    """TTSEngine whose inference backend has prefix caching set to MAYA_PREFIX_CACHING"""
+    from Maya1 import tts_engine
+    from Maya1.tts_engine import TTSEngine
+
+    kwargs = {"memory_util": MAYA_MEMORY_UTIL, "tp": MAYA_TP}
+    if "enable_prefix_caching" in inspect.signature(TTSEngine.__init__).parameters:
+        kwargs["enable_prefix_caching"] = MAYA_PREFIX_CACHING
+        engine = TTSEngine(**kwargs)
+    else:
+        with backend_prefix_caching(MAYA_PREFIX_CACHING, tts_engine, sys.modules.get("lmdeploy")):
+            engine = TTSEngine(**kwargs)
+
+    enabled = prefix_caching_enabled(engine)
+    if enabled is None:
+        print("[FastMaya] Prefix caching: unknown (engine exposes no backend config)")
+    else:
+        print(f"[FastMaya] Prefix caching: {'on' if enabled else 'off'}")
+        if enabled != MAYA_PREFIX_CACHING:
+            print(f"[FastMaya] WARNING: MAYA_PREFIX_CACHING={int(MAYA_PREFIX_CACHING)} did not take effect")
+    return engine
+
+
+class MayaBatchRunner:
+    """
+    run_batch([(text, voice_description, seed, upsample), ...]) -> [(audio, seed_used, sample_rate), ...]
+
+    The scheduler batches by (seed, tier) key, so every item in a batch shares
+    its seed (None: a fresh random seed for the batch) and upsample flag.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.batched = hasattr(engine, "batch_generate")
+        if not self.batched:
+            print("[FastMaya] TTSEngine has no batch_generate; batches run item by item")
+        generate = engine.batch_generate if self.batched else engine.generate
+        self.upsample_kwarg = "upsample" in inspect.signature(generate).parameters
+        self.native = self.upsample_kwarg or streaming_supported(engine)
+        if not self.native:
+            print("[FastMaya] TTSEngine can't skip AudioSR; native tier requests get 48kHz audio")
+
+    def _generate(self, texts, descriptions, **kwargs):
+        if self.batched:
+            return self.engine.batch_generate(texts, descriptions, **kwargs)
+        return [self.engine.generate(t, d, **kwargs) for t, d in zip(texts, descriptions)]
+
+    def __call__(self, items: List[Tuple[str, str, Optional[int], bool]]) -> List[Tuple[np.ndarray, int, int]]:
+        import torch
+
+        seed = items[0][2]
+        if seed is None:
+            seed = torch.randint(0, 2**32 - 1, (1,)).item()
+        torch.manual_seed(seed)
+        upsample = items[0][3]
+
+        # Group by voice so the backend sees shared prefixes back to back
+        order = sorted(range(len(items)), key=lambda i: items[i][1])
+        texts = [items[i][0] for i in order]
+        descriptions = [items[i][1] for i in order]
+
+        sample_rate = SNAC_SAMPLE_RATE
+        if not upsample and self.upsample_kwarg:
+            outputs = self._generate(texts, descriptions, upsample=False)
+        elif not upsample and self.native:
+            outputs = generate_native(self.engine, texts, descriptions, seed)
+        else:
+            outputs = self._generate(texts, descriptions)
+            sample_rate = HD_SAMPLE_RATE
+
+        results: List[Optional[Tuple[np.ndarray, int, int]]] = [None] * len(items)
+        for position, index in enumerate(order):
+            results[index] = (outputs[position], seed, sample_rate)
+        return results
@@ -0,0 +1,185 @@
+"""
+Incremental decoding of Maya-1 output for streaming responses.
+
+Maya-1 is a Llama-style LM whose output tokens are SNAC (24 kHz) codec codes,
+7 tokens per frame (3 codebook levels), one frame = 2048 samples (~85 ms).
+Instead of waiting for the whole sequence, stream_tokens() pulls tokens from
+the engine's inference pipeline as they are generated and SnacStreamDecoder
+turns every few complete frames into audio:
+
+  * each window is decoded together with `context_frames` of already-emitted
+    frames on the left and `lookahead_frames` on the right, and only the
+    middle is emitted, so window edges don't click;
+  * the first window is short (`first_frames`) to get audio to the client
+    quickly, later windows are longer (`hop_frames`) to keep decode calls few.
+
+AudioSR super-resolution needs the whole utterance, so streamed windows are
+resampled to the output rate instead. generate_native() is the non-streaming
+counterpart for the "native" audio tier: a whole batch decoded at 24 kHz.
+"""
+
+import copy
+import os
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+# Maya-1 special tokens (Llama-3 reserved ids)
+CODE_START_TOKEN_ID = 128257   # start of speech
+CODE_END_TOKEN_ID = 128258     # end of speech
+SOH_TOKEN = "<custom_token_3>"
+EOH_TOKEN = "<custom_token_4>"
+SOA_TOKEN = "<custom_token_5>"
+SOS_TOKEN = "<custom_token_1>"
+BOS_TOKEN = "<|begin_of_text|>"
+EOT_TOKEN = "<|eot_id|>"
+
+# SNAC codes are offset into the vocabulary
+CODE_TOKEN_OFFSET = 128266
+SNAC_MIN_ID = 128266
+SNAC_MAX_ID = 156937
+SNAC_TOKENS_PER_FRAME = 7
+SNAC_SAMPLE_RATE = 24000
+SAMPLES_PER_FRAME = 2048
+
+MAYA_STREAM_FIRST_FRAMES = int(os.environ.get("MAYA_STREAM_FIRST_FRAMES", "2"))
+MAYA_STREAM_HOP_FRAMES = int(os.environ.get("MAYA_STREAM_HOP_FRAMES", "6"))
+MAYA_STREAM_CONTEXT_FRAMES = int(os.environ.get("MAYA_STREAM_CONTEXT_FRAMES", "2"))
+MAYA_STREAM_LOOKAHEAD_FRAMES = int(os.environ.get("MAYA_STREAM_LOOKAHEAD_FRAMES", "1"))
+SNAC_MODEL_ID = os.environ.get("SNAC_MODEL_ID", "hubertsiuzdak/snac_24khz")
+
+_snac = None
+
+
+def streaming_supported(engine) -> bool:
+    """Token streaming needs the engine's underlying inference pipeline and its sampling config"""
+    pipe = getattr(engine, "pipe", None)
+    return pipe is not None and hasattr(pipe, "stream_infer") and hasattr(engine, "gen_config")
+
+
+def snac_decoder(engine, device: str = "cuda"):
+    """The engine's SNAC model if it exposes one, otherwise our own copy"""
+    global _snac
+    if _snac is None:
+        _snac = getattr(engine, "snac_model", None)
+        if _snac is None:
+            from snac import SNAC
+            _snac = SNAC.from_pretrained(SNAC_MODEL_ID).eval().to(device)
+    return _snac
+
+
+def build_prompt(text: str, voice_description: str) -> str:
+    formatted = f'<description="{voice_description}"> {text}'
+    return f"{SOH_TOKEN}{BOS_TOKEN}{formatted}{EOT_TOKEN}{EOH_TOKEN}{SOA_TOKEN}{SOS_TOKEN}"
+
+
+def seeded_gen_config(engine, seed: Optional[int]):
+    """The engine's sampling config with the backend seeded (torch.manual_seed doesn't reach it)"""
+    gen_config = copy.copy(engine.gen_config)
+    if seed is not None and hasattr(gen_config, "random_seed"):
+        gen_config.random_seed = seed
+    return gen_config
+
+
+def stream_tokens(engine, text: str, voice_description: str, seed: Optional[int] = None) -> Iterator[List[int]]:
+    """Newly generated token ids, step by step"""
+    prompt = build_prompt(text, voice_description)
+    gen_config = seeded_gen_config(engine, seed)
+    for response in engine.pipe.stream_infer([prompt], gen_config=gen_config, do_preprocess=False):
+        if response.token_ids:
+            yield list(response.token_ids)
+
+
+def snac_codes(token_ids: List[int]) -> List[int]:
+    """Codec tokens of a finished generation (up to the end-of-speech token)"""
+    codes = []
+    for token in token_ids:
+        if token == CODE_END_TOKEN_ID:
+            break
+        if SNAC_MIN_ID <= token <= SNAC_MAX_ID:
+            codes.append(token)
+    return codes[:len(codes) // SNAC_TOKENS_PER_FRAME * SNAC_TOKENS_PER_FRAME]
+
+
+def decode_codes(snac, codes: List[int]) -> np.ndarray:
+    import torch
+
+    device = next(snac.parameters()).device
+    levels = [torch.tensor(level, dtype=torch.long, device=device).unsqueeze(0)
+              for level in unpack_snac_from_7(codes)]
+    with torch.inference_mode():
+        return snac.decode(levels)[0, 0].float().cpu().numpy()
+
+
+def generate_native(engine, texts: List[str], voice_descriptions: List[str],
+                    seed: Optional[int] = None) -> List[np.ndarray]:
+    """One pipeline batch decoded straight from SNAC codes at 24 kHz, without AudioSR"""
+    prompts = [build_prompt(t, d) for t, d in zip(texts, voice_descriptions)]
+    responses = engine.pipe(prompts, gen_config=seeded_gen_config(engine, seed), do_preprocess=False)
+    snac = snac_decoder(engine)
+    waves = []
+    for response in responses:
+        codes = snac_codes(list(response.token_ids))
+        waves.append(decode_codes(snac, codes) if codes else np.zeros(0, dtype=np.float32))
+    return waves
+
+
+def unpack_snac_from_7(tokens: List[int]) -> List[List[int]]:
+    """Interleaved 7-token frames -> the 3 SNAC codebook levels (1, 2, 4 codes per frame)"""
+    l1, l2, l3 = [], [], []
+    for i in range(len(tokens) // SNAC_TOKENS_PER_FRAME):
+        s = [(t - CODE_TOKEN_OFFSET) % 4096 for t in tokens[i * 7:(i + 1) * 7]]
+        l1.append(s[0])
+        l2.extend((s[1], s[4]))
+        l3.extend((s[2], s[3], s[5], s[6]))
+    return [l1, l2, l3]
+
+
+class SnacStreamDecoder:
+    def __init__(self, snac, first_frames: int = MAYA_STREAM_FIRST_FRAMES,
+                 hop_frames: int = MAYA_STREAM_HOP_FRAMES, context_frames: int = MAYA_STREAM_CONTEXT_FRAMES,
+                 lookahead_frames: int = MAYA_STREAM_LOOKAHEAD_FRAMES):
+        self.snac = snac
+        self.first_frames = max(1, first_frames)
+        self.hop_frames = max(1, hop_frames)
+        self.context_frames = context_frames
+        self.lookahead_frames = lookahead_frames
+
+        self.codes: List[int] = []
+        self.emitted_frames = 0
+        self.finished = False
+
+    @property
+    def frames(self) -> int:
+        return len(self.codes) // SNAC_TOKENS_PER_FRAME
+
+    def push(self, token_ids: List[int]) -> List[np.ndarray]:
+        """Add generated tokens; returns any audio windows that became ready"""
+        for token in token_ids:
+            if token == CODE_END_TOKEN_ID:
+                self.finished = True
+            elif SNAC_MIN_ID <= token <= SNAC_MAX_ID and not self.finished:
+                self.codes.append(token)
+
+        windows = []
+        while True:
+            hop = self.first_frames if self.emitted_frames == 0 else self.hop_frames
+            if self.frames - self.emitted_frames < hop + self.lookahead_frames:
+                return windows
+            windows.append(self._decode(self.emitted_frames + hop))
+
+    def flush(self) -> Optional[np.ndarray]:
+        """Decode whatever is left once generation has ended"""
+        if self.frames > self.emitted_frames:
+            return self._decode(self.frames)
+        return None
+
+    def _decode(self, end: int) -> np.ndarray:
+        start = self.emitted_frames
+        lo = max(0, start - self.context_frames)
+        hi = min(self.frames, end + self.lookahead_frames)
+        audio = decode_codes(self.snac, self.codes[lo * SNAC_TOKENS_PER_FRAME:hi * SNAC_TOKENS_PER_FRAME])
+
+        offset = (start - lo) * SAMPLES_PER_FRAME
+        self.emitted_frames = end
+        return audio[offset:offset + (end - start) * SAMPLES_PER_FRAME]
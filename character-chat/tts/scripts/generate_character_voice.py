@@ -1,9 +1,34 @@
-import os
+"""
+Batch renderer for character voice samples.
+
+    python tts/scripts/generate_character_voice.py [--workers N] [--force] [--only ID ...]
+
+Each worker process loads Chatterbox once and renders the character files it
+is handed. A character is skipped when its output is up to date: the
+manifest (output_audio/manifest.json) records a content hash of everything
+that shapes the audio (script, voice constraints, anchor profile, reference
+clip bytes, generation params) and the output is only re-rendered when that
+hash changes. The manifest is rewritten after every item and outputs are
+written atomically, so an interrupted run resumes where it stopped.
+"""
+
+import argparse
+import hashlib
 import json
+import multiprocessing as mp
+import os
 import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+
 import torch
 import soundfile as sf
 
+# Shared registry lives in character-chat/tts_common
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from tts_common.voice_registry import VoiceRegistry
+
 # Try-except block to handle potential missing dependency during setup
 try:
     from chatterbox import ChatterboxTTS
@@ -20,10 +45,12 @@ ARCHETYPES_PATH = f"{BASE_DIR}/archetypes"
 ANCHORS_PATH = f"{BASE_DIR}/voice_profiles/anchors"
 OUTPUT_PATH = f"{BASE_DIR}/output_audio"
 CHARACTERS_PATH = f"{BASE_DIR}/characters"
+MANIFEST_PATH = os.path.join(OUTPUT_PATH, "manifest.json")
 
-os.makedirs(OUTPUT_PATH, exist_ok=True)
-
-# ---------- utilities ----------
+SAMPLE_RATE = 24000
+# Bump when the rendering itself changes (model version, post-processing, ...)
+RENDER_VERSION = 1
+GENERATION_PARAMS = {"exaggeration": 0.5, "temperature": 0.8}
 
 # ---------- utilities ----------
 
@@ -31,83 +58,57 @@ def load_json(path):
     with open(path, "r") as f:
         return json.load(f)
 
-# Pre-load all anchor profiles once
-def load_all_anchor_profiles():
-    voice_profiles = {}
-    for root, _, files in os.walk(ANCHORS_PATH):
-        if "profile.json" in files:
-            try:
-                profile = load_json(os.path.join(root, "profile.json"))
-                # Use the directory name as the profile ID
-                profile_id = os.path.basename(root)
-                voice_profiles[profile_id] = profile
-            except Exception as e:
-                print(f"Error loading profile in {root}: {e}")
-    return voice_profiles
-
 def clamp(val, min_v, max_v):
     return max(min_v, min(val, max_v))
 
-ALL_VOICE_PROFILES = load_all_anchor_profiles()
-
-def pick_anchor(archetype_name, target_gender='unknown'):
-    # Map 'M'/'F' to 'male'/'female'
-    if target_gender.lower() in ['m', 'male']: target_gender = 'male'
-    if target_gender.lower() in ['f', 'female']: target_gender = 'female'
-
-    candidates = []
-    
-    # First pass: try to find exact match (archetype + gender)
-    for pid, profile in ALL_VOICE_PROFILES.items():
-        if profile.get("base_archetype") != archetype_name:
-            continue
-            
-        # Determine profile gender
-        p_gender = profile.get("gender", "").lower()
-        if not p_gender:
-            # Fallback: infer from ID
-            if "male" in pid and "female" not in pid: p_gender = "male"
-            elif "female" in pid: p_gender = "female"
-            
-        if p_gender == target_gender:
-            candidates.append((os.path.join(ANCHORS_PATH, pid), profile))
-
-    # Second pass: if no gender match, fallback to just archetype
-    if not candidates:
-        print(f"No gender-matched anchor found for {archetype_name}/{target_gender}. Falling back...")
-        for pid, profile in ALL_VOICE_PROFILES.items():
-            if profile.get("base_archetype") == archetype_name:
-                candidates.append((os.path.join(ANCHORS_PATH, pid), profile))
-
-    if not candidates:
-        raise ValueError(f"No anchor voice found for archetype: {archetype_name}")
-
-    return random.choice(candidates)
-
-# ---------- main generation ----------
-
-def generate(character_file):
-    print(f"Processing {character_file}...")
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stable_seed(text):
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+# Pre-load and index all anchor profiles once (chatterbox reads the reference
+# clip from disk itself, so the decoded audio isn't needed)
+VOICE_REGISTRY = VoiceRegistry(ANCHORS_PATH, load_audio=False)
+
+# ---------- planning (no model needed) ----------
+
+@dataclass
+class RenderJob:
+    character_file: str
+    character_id: str
+    script: str
+    anchor_id: str
+    ref_audio_path: str
+    out_file: str
+    seed: int
+    content_hash: str
+
+def plan(character_file):
+    """Resolve a character file into a RenderJob, or (None, reason) if it can't be rendered"""
     try:
         character = load_json(os.path.join(CHARACTERS_PATH, character_file))
     except Exception as e:
-        print(f"Failed to load character {character_file}: {e}")
-        return
+        return None, f"Failed to load character: {e}"
 
     archetype = character.get("archetype")
     script = character.get("script")
     gender = character.get("gender", "unknown")
     constraints = character.get("voice_constraints", {})
+    character_id = character.get("character_id", os.path.splitext(character_file)[0])
 
     if not archetype or not script:
-        print(f"Skipping {character_file}: Missing archetype or script")
-        return
+        return None, "Missing archetype or script"
 
-    try:
-        anchor_path, profile = pick_anchor(archetype, target_gender=gender)
-    except ValueError as e:
-        print(e)
-        return
+    # Seeded by character so re-runs keep the same anchor (and so the same hash)
+    anchor = VOICE_REGISTRY.pick(archetype, gender, rng=random.Random(character_id))
+    if anchor is None:
+        return None, f"No anchor voice found for archetype: {archetype}"
+    profile = anchor.profile
 
     conditioning = profile.get("conditioning", {})
     limits = profile.get("allowed_variation", {})
@@ -135,65 +136,171 @@ def generate(character_file):
         *limits.get("energy", [0, 1])
     )
 
-    print(f"Generating voice for {character.get('character_id', 'unknown')}")
-    print(f"Pitch: {pitch}, Speed: {speed}, Energy: {energy}")
-    print(f"Anchor: {os.path.basename(anchor_path)}")
-
     # Check for reference audio
-    ref_audio_path = os.path.join(anchor_path, "reference.wav")
-    if not os.path.exists(ref_audio_path):
-        print(f"Warning: Reference audio not found at {ref_audio_path}")
-        return
+    ref_audio_path = anchor.reference_path
+    if not ref_audio_path:
+        return None, f"Reference audio not found in {anchor.path}"
+
+    seed = stable_seed(character_id)
+    content_hash = hashlib.sha256(json.dumps({
+        "version": RENDER_VERSION,
+        "script": script,
+        "anchor": anchor.profile_id,
+        "reference_sha256": sha256_file(ref_audio_path),
+        # pitch/speed/energy aren't supported by chatterbox v0.1.6 yet, but
+        # are part of the hash so outputs refresh once they are
+        "variation": [pitch, speed, energy],
+        "params": GENERATION_PARAMS,
+        "seed": seed,
+    }, sort_keys=True).encode("utf-8")).hexdigest()
+
+    return RenderJob(
+        character_file=character_file,
+        character_id=character_id,
+        script=script,
+        anchor_id=anchor.profile_id,
+        ref_audio_path=ref_audio_path,
+        out_file=os.path.join(OUTPUT_PATH, f"{character_id}.wav"),
+        seed=seed,
+        content_hash=content_hash,
+    ), None
+
+# ---------- manifest ----------
+
+def load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        try:
+            return load_json(MANIFEST_PATH)
+        except Exception as e:
+            print(f"Ignoring unreadable manifest: {e}")
+    return {"items": {}}
+
+def save_manifest(manifest):
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def is_up_to_date(job, manifest):
+    entry = manifest["items"].get(job.character_file)
+    return (
+        entry is not None
+        and entry.get("status") == "done"
+        and entry.get("content_hash") == job.content_hash
+        and os.path.exists(job.out_file)
+    )
 
+# ---------- workers (one model per process) ----------
+
+_tts = None
+
+def init_worker(device_queue):
+    """Load the model once per worker process"""
+    global _tts
+    device = device_queue.get()
+    print(f"[worker {os.getpid()}] Loading Chatterbox on {device}...")
+    _tts = ChatterboxTTS.from_pretrained(device=device)
+
+def render(job_dict):
+    """Render one job in a worker; returns a manifest entry"""
+    job = RenderJob(**job_dict)
+    started = time.perf_counter()
+    entry = {
+        "character_id": job.character_id,
+        "anchor": job.anchor_id,
+        "content_hash": job.content_hash,
+        "output": job.out_file,
+    }
     try:
-        # Initializing from pretrained as local model path is empty
-        tts = ChatterboxTTS.from_pretrained(
-            device="cuda" if torch.cuda.is_available() else "cpu"
-        )
-        
-        print("Synthesizing...")
-        audio = tts.generate(
-            text=script,
-            audio_prompt_path=ref_audio_path, # Mapped from reference_audio
-            # pitch_shift=pitch, # Not supported in v0.1.6
-            # speed=speed,      # Not supported in v0.1.6
-            # energy=energy,    # Not supported in v0.1.6
-            exaggeration=0.5, # Default
-            temperature=0.8   # Default
-        )
-
-        print(f"Audio generated. Type: {type(audio)}, Shape: {audio.shape if hasattr(audio, 'shape') else 'N/A'}")
-        
+        torch.manual_seed(job.seed)
+        with torch.no_grad():
+            audio = _tts.generate(
+                text=job.script,
+                audio_prompt_path=job.ref_audio_path, # Mapped from reference_audio
+                **GENERATION_PARAMS
+            )
+
         # Convert PyTorch tensor to NumPy array for soundfile
         if isinstance(audio, torch.Tensor):
             audio = audio.cpu().squeeze().numpy()
 
-        out_file = os.path.join(
-            OUTPUT_PATH,
-            f"{character.get('character_id', 'output')}.wav"
-        )
-        
-        # Ensure output directory exists (redundant check)
-        os.makedirs(os.path.dirname(out_file), exist_ok=True)
-
-        # Explicitly write as WAV with 24000Hz
-        try:
-            sf.write(out_file, audio, 24000, subtype='PCM_16', format='WAV')
-            print(f"Saved → {out_file}")
-        except Exception as e:
-            print(f"sf.write failed: {e}")
-            # Fallback debug: just write a text file to confirm permissions
-            with open(out_file + ".txt", "w") as f: f.write("Debug write")
-            print("Debug text file written successfully.")
+        # Write next to the target and rename, so a crash never leaves a
+        # truncated file that looks finished
+        tmp_file = f"{job.out_file}.tmp"
+        sf.write(tmp_file, audio, SAMPLE_RATE, subtype='PCM_16', format='WAV')
+        os.replace(tmp_file, job.out_file)
+        entry.update(status="done", seconds_audio=round(len(audio) / SAMPLE_RATE, 2))
     except Exception as e:
-        print(f"Generation failed: {e}")
+        entry.update(status="failed", error=str(e))
+    entry.update(seconds=round(time.perf_counter() - started, 2), rendered_at=time.time())
+    return job.character_file, entry
+
+def worker_devices(workers):
+    """Round-robin workers over the visible GPUs (or CPU)"""
+    if torch.cuda.is_available():
+        count = torch.cuda.device_count()
+        return [f"cuda:{i % count}" for i in range(workers)]
+    return ["cpu"] * workers
 
 # ---------- entry ----------
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Render character voice samples")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("RENDER_WORKERS", "1")),
+                        help="worker processes, each holding one model (default 1)")
+    parser.add_argument("--force", action="store_true", help="re-render even if up to date")
+    parser.add_argument("--only", nargs="*", help="character files or ids to render")
+    args = parser.parse_args()
+
     if not os.path.exists(CHARACTERS_PATH):
-         print(f"Characters directory not found at {CHARACTERS_PATH}")
-    else:
-        for file in os.listdir(CHARACTERS_PATH):
-            if file.endswith(".json"):
-                generate(file)
+        print(f"Characters directory not found at {CHARACTERS_PATH}")
+        return
+    os.makedirs(OUTPUT_PATH, exist_ok=True)
+
+    files = sorted(f for f in os.listdir(CHARACTERS_PATH) if f.endswith(".json"))
+    if args.only:
+        wanted = set(args.only)
+        files = [f for f in files if f in wanted or os.path.splitext(f)[0] in wanted]
+
+    manifest = load_manifest()
+    jobs = []
+    for character_file in files:
+        job, reason = plan(character_file)
+        if job is None:
+            print(f"Skipping {character_file}: {reason}")
+            manifest["items"][character_file] = {"status": "skipped", "reason": reason}
+        elif not args.force and is_up_to_date(job, manifest):
+            print(f"Up to date: {character_file}")
+        else:
+            jobs.append(job)
+    save_manifest(manifest)
+
+    if not jobs:
+        print("Nothing to render.")
+        return
+
+    workers = max(1, min(args.workers, len(jobs)))
+    print(f"Rendering {len(jobs)} of {len(files)} characters with {workers} worker(s)...")
+    started = time.perf_counter()
+
+    ctx = mp.get_context("spawn")  # CUDA can't be forked
+    device_queue = ctx.Queue()
+    for device in worker_devices(workers):
+        device_queue.put(device)
+
+    failed = 0
+    with ctx.Pool(workers, initializer=init_worker, initargs=(device_queue,)) as pool:
+        for done, (character_file, entry) in enumerate(
+                pool.imap_unordered(render, [asdict(j) for j in jobs]), start=1):
+            manifest["items"][character_file] = entry
+            save_manifest(manifest)  # after every item, so a crash loses at most the in-flight ones
+            if entry["status"] == "done":
+                print(f"[{done}/{len(jobs)}] Saved → {entry['output']} ({entry['seconds']}s)")
+            else:
+                failed += 1
+                print(f"[{done}/{len(jobs)}] Generation failed for {character_file}: {entry.get('error')}")
+
+    print(f"Done in {time.perf_counter() - started:.1f}s ({failed} failed). Manifest: {MANIFEST_PATH}")
+
+if __name__ == "__main__":
+    main()
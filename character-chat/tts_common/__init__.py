@@ -0,0 +1,4 @@
+"""
+Shared helpers for the TTS workers (Chatterbox handler, F5, FastMaya) and the
+offline voice generation scripts.
+"""
@@ -0,0 +1,224 @@
+"""
+Content-addressed cache of synthesized audio, shared by all TTS handlers.
+
+Characters repeat greetings, catchphrases and system lines; when a request
+is deterministic (fixed seed, or the client opts in with "cache": true) the
+encoded result is stored under a digest of everything that shapes it:
+
+    engine, normalized text, voice identity (anchor / reference-audio hash /
+    voice description), seed, generation params, output format and rate
+
+Two tiers: an in-memory LRU (AUDIO_CACHE_MB) in front of an optional
+size-capped directory (AUDIO_CACHE_DIR, AUDIO_CACHE_DISK_MB) that survives
+restarts and can be shared by workers on the same volume. Disk entries are
+evicted oldest-access first.
+
+    key = synthesis_key("f5", text, voice=ref_hash, seed=7, params={"steps": 32},
+                        output_format="opus", output_sample_rate=24000)
+    encoded = audio_cache().get(key)
+    if encoded is None:
+        encoded = encode_audio(...)
+        audio_cache().put(key, encoded)
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from .audio_encoding import EncodedAudio
+
+AUDIO_CACHE_MB = float(os.environ.get("AUDIO_CACHE_MB", "256"))
+AUDIO_CACHE_DIR = os.environ.get("AUDIO_CACHE_DIR") or None
+AUDIO_CACHE_DISK_MB = float(os.environ.get("AUDIO_CACHE_DISK_MB", "2048"))
+
+_WHITESPACE = re.compile(r"\s+")
+_cache: Optional["AudioCache"] = None
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC + collapsed whitespace; case and punctuation shape prosody, so they stay"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def synthesis_key(engine: str, text: str, voice: str, seed=None, params: Optional[dict] = None,
+                  output_format: str = "wav", output_sample_rate: Optional[int] = None) -> str:
+    payload = {
+        "engine": engine,
+        "text": normalize_text(text),
+        "voice": voice,
+        "seed": seed,
+        "params": params or {},
+        "format": output_format,
+        "rate": output_sample_rate,
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(input_data: dict, seed_key: str = "seed") -> bool:
+    """
+    Deterministic requests only: an explicit seed, or "cache": true from a
+    client that accepts an earlier rendering. "cache": false always bypasses.
+    """
+    requested = input_data.get("cache")
+    if requested is not None:
+        return bool(requested)
+    seed = input_data.get(seed_key)
+    return seed is not None and seed != -1
+
+
+class AudioCache:
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, EncodedAudio]" = OrderedDict()
+        self.total_bytes = 0
+        self.disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.disk_bytes = sum(size for _, size, _ in self._disk_files())
+            print(f"[AudioCache] Disk tier at {disk_dir}: {self.disk_bytes / 1e6:.1f} MB")
+
+    # ---------- memory tier ----------
+
+    def _remember(self, key: str, encoded: EncodedAudio):
+        if key in self._entries:
+            self.total_bytes -= len(self._entries.pop(key).data)
+        if len(encoded.data) > self.max_bytes:
+            return
+        self._entries[key] = encoded
+        self.total_bytes += len(encoded.data)
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= len(evicted.data)
+
+    # ---------- disk tier ----------
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _disk_files(self):
+        for dirpath, _, filenames in os.walk(self.disk_dir):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue  # evicted by another worker
+                yield path, st.st_size, st.st_mtime
+
+    def _read_disk(self, key: str) -> Optional[EncodedAudio]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            os.utime(path)  # mtime doubles as last access for eviction
+        except FileNotFoundError:
+            return None
+        # "<format> <sample_rate>\n" header, then the encoded bytes
+        header, _, data = blob.partition(b"\n")
+        fmt, sample_rate = header.decode("ascii").split()
+        return EncodedAudio(data, fmt, int(sample_rate))
+
+    def _write_disk(self, key: str, encoded: EncodedAudio):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(f"{encoded.format} {encoded.sample_rate}\n".encode("ascii"))
+            f.write(encoded.data)
+        try:
+            # Overwriting an entry replaces its bytes rather than adding to them
+            self.disk_bytes -= os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+        self.disk_bytes += os.path.getsize(path)
+        if self.disk_bytes > self.disk_max_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        # Rescan: other workers may share the directory
+        files = sorted(self._disk_files(), key=lambda f: f[2])
+        self.disk_bytes = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * 0.9  # evict in bulk, not on every write
+        for path, size, _ in files:
+            if self.disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self.disk_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    # ---------- public API ----------
+
+    def get(self, key: str) -> Optional[EncodedAudio]:
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return encoded
+            if self.disk_dir:
+                try:
+                    encoded = self._read_disk(key)
+                except Exception as e:
+                    print(f"[AudioCache] Unreadable disk entry {key[:12]}: {e}")
+                    encoded = None
+                if encoded is not None:
+                    self._remember(key, encoded)
+                    self.disk_hits += 1
+                    return encoded
+            self.misses += 1
+            return None
+
+    def put(self, key: str, encoded: EncodedAudio):
+        with self._lock:
+            self._remember(key, encoded)
+            self.stores += 1
+            if self.disk_dir:
+                try:
+                    self._write_disk(key, encoded)
+                except OSError as e:
+                    print(f"[AudioCache] Disk write failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "memory_mb": round(self.total_bytes / 1e6, 2),
+            "disk_mb": round(self.disk_bytes / 1e6, 2) if self.disk_dir else None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+        }
+
+
+def audio_cache() -> AudioCache:
+    """Process-wide cache configured from AUDIO_CACHE_* env vars"""
+    global _cache
+    if _cache is None:
+        _cache = AudioCache(
+            max_bytes=int(AUDIO_CACHE_MB * 1024 * 1024),
+            disk_dir=AUDIO_CACHE_DIR,
+            disk_max_bytes=int(AUDIO_CACHE_DISK_MB * 1024 * 1024),
+        )
+    return _cache
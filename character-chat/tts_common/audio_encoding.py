@@ -0,0 +1,156 @@
+"""
+Output audio encoding shared by all TTS handlers.
+
+Callers pick the container/codec and sample rate per request:
+
+    {"output_format": "opus", "output_sample_rate": 24000}
+
+Supported formats:
+    wav        16-bit PCM WAV (default, unchanged behaviour)
+    flac       lossless, roughly half the size of WAV
+    opus/ogg   Opus in an OGG container, best for speech on mobile
+    mp3        MPEG layer III, for clients without Opus support
+    pcm        headerless little-endian int16 samples
+
+Encoding is CPU work, so the sync handlers run it on `encoder_pool()` rather
+than on the inference thread (see submit_encode()): the Chatterbox handler
+encodes streamed chunk N there while chunk N+1 is synthesized. The async
+services (F5 server, FastMaya) use their own executors.
+"""
+
+import base64
+import io
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from math import gcd
+from typing import Optional
+
+import numpy as np
+
+FORMAT_ALIASES = {
+    "wav": "wav",
+    "flac": "flac",
+    "opus": "opus",
+    "ogg": "opus",
+    "mp3": "mp3",
+    "pcm": "pcm",
+    "raw": "pcm",
+}
+
+MIME_TYPES = {
+    "wav": "audio/wav",
+    "flac": "audio/flac",
+    "opus": "audio/ogg; codecs=opus",
+    "mp3": "audio/mpeg",
+    "pcm": "audio/L16",
+}
+
+# (soundfile format, subtype) per output format; pcm is written by hand
+SOUNDFILE_FORMATS = {
+    "wav": ("WAV", "PCM_16"),
+    "flac": ("FLAC", "PCM_16"),
+    "opus": ("OGG", "OPUS"),
+    "mp3": ("MP3", "MPEG_LAYER_III"),
+}
+
+# Codecs that only accept a fixed set of rates
+SUPPORTED_RATES = {
+    "opus": (8000, 12000, 16000, 24000, 48000),
+    "mp3": (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000),
+}
+
+ENCODER_THREADS = int(os.environ.get("AUDIO_ENCODER_THREADS", "2"))
+_encoder_pool: Optional[ThreadPoolExecutor] = None
+
+
+@dataclass
+class EncodedAudio:
+    data: bytes
+    format: str
+    sample_rate: int
+
+    @property
+    def mime_type(self) -> str:
+        return MIME_TYPES[self.format]
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.data).decode("utf-8")
+
+
+def normalize_format(output_format: Optional[str]) -> str:
+    fmt = FORMAT_ALIASES.get((output_format or "wav").strip().lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported output_format '{output_format}' (choose from {', '.join(sorted(FORMAT_ALIASES))})")
+    return fmt
+
+
+def output_options(input_data: dict):
+    """Read (output_format, output_sample_rate) from a job input dict"""
+    output_format = normalize_format(input_data.get("output_format"))
+    output_sample_rate = input_data.get("output_sample_rate")
+    return output_format, int(output_sample_rate) if output_sample_rate else None
+
+
+def to_mono_float32(audio) -> np.ndarray:
+    """Accept torch tensors or numpy arrays of shape (T,), (1, T) or (T, 1)"""
+    if hasattr(audio, "detach"):
+        audio = audio.detach().cpu().numpy()
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim > 1:
+        audio = audio.reshape(-1) if 1 in audio.shape else audio.mean(axis=0)
+    return audio
+
+
+def to_int16(audio: np.ndarray) -> np.ndarray:
+    """Vectorised float [-1, 1] -> int16 with clipping (no wrap-around on peaks)"""
+    return (np.clip(audio, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    if orig_sr == target_sr:
+        return audio
+    from scipy.signal import resample_poly
+    g = gcd(orig_sr, target_sr)
+    return resample_poly(audio, target_sr // g, orig_sr // g).astype(np.float32)
+
+
+def pick_sample_rate(fmt: str, requested: int) -> int:
+    """Snap a requested rate to the nearest one the codec supports"""
+    rates = SUPPORTED_RATES.get(fmt)
+    if not rates or requested in rates:
+        return requested
+    return min(rates, key=lambda rate: (abs(rate - requested), -rate))
+
+
+def encode_audio(audio, sample_rate: int, output_format: str = "wav",
+                 output_sample_rate: Optional[int] = None) -> EncodedAudio:
+    fmt = normalize_format(output_format)
+    target_sr = pick_sample_rate(fmt, output_sample_rate or sample_rate)
+
+    samples = resample(to_mono_float32(audio), sample_rate, target_sr)
+
+    if fmt == "pcm":
+        return EncodedAudio(to_int16(samples).astype("<i2").tobytes(), fmt, target_sr)
+
+    import soundfile as sf
+    sf_format, subtype = SOUNDFILE_FORMATS[fmt]
+    buffer = io.BytesIO()
+    if subtype == "PCM_16":
+        sf.write(buffer, to_int16(samples), target_sr, format=sf_format, subtype=subtype)
+    else:
+        sf.write(buffer, np.clip(samples, -1.0, 1.0), target_sr, format=sf_format, subtype=subtype)
+    return EncodedAudio(buffer.getvalue(), fmt, target_sr)
+
+
+def encoder_pool() -> ThreadPoolExecutor:
+    global _encoder_pool
+    if _encoder_pool is None:
+        _encoder_pool = ThreadPoolExecutor(max_workers=ENCODER_THREADS, thread_name_prefix="audio-encode")
+    return _encoder_pool
+
+
+def submit_encode(audio, sample_rate: int, output_format: str = "wav",
+                  output_sample_rate: Optional[int] = None) -> Future:
+    """Encode on the shared encoder pool; returns a Future[EncodedAudio]"""
+    return encoder_pool().submit(encode_audio, audio, sample_rate, output_format, output_sample_rate)
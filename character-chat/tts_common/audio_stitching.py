@@ -0,0 +1,20 @@
+"""
+Joining separately synthesized segments back into one waveform.
+"""
+
+from typing import List
+
+import numpy as np
+
+
+def crossfade_concat(waves: List[np.ndarray], sample_rate: int, duration: float = 0.15) -> np.ndarray:
+    """Join chunk waveforms with a linear cross-fade of `duration` seconds"""
+    final_wave = waves[0]
+    for next_wave in waves[1:]:
+        samples = min(int(duration * sample_rate), len(final_wave), len(next_wave))
+        if samples <= 0:
+            final_wave = np.concatenate([final_wave, next_wave])
+            continue
+        overlap = final_wave[-samples:] * np.linspace(1, 0, samples) + next_wave[:samples] * np.linspace(0, 1, samples)
+        final_wave = np.concatenate([final_wave[:-samples], overlap, next_wave[samples:]])
+    return final_wave
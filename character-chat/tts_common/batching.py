@@ -0,0 +1,209 @@
+"""
+Dynamic micro-batching for the TTS workers (F5 server, FastMaya handler).
+
+Requests submitted within a short window are coalesced into one batch (up to
+max_batch_size items or max_batch_cost, e.g. total mel frames) and handed to a
+blocking `run_batch(items) -> results` callable on a worker thread. Results
+are split back to the waiting callers.
+
+The scheduler knows nothing about the engine: run_batch can be any callable,
+which keeps it runnable on CPU with a stub model.
+
+AdmissionControl bounds how many requests may be in the pipeline at once so
+overload turns into fast 429s instead of an ever-growing queue.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, List, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when a request is rejected because the admission queue is full"""
+
+    def __init__(self, depth: int, retry_after: int):
+        super().__init__(f"Inference queue full ({depth} pending)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class AdmissionControl:
+    """
+    Counts requests between admission and completion (preprocessing, waiting
+    for a batch, running). Used as a context manager around a request; all
+    access happens on the event loop thread, so no lock is needed.
+    """
+
+    def __init__(self, max_pending: int, retry_after=lambda: 1):
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.pending = 0
+        self.rejected = 0
+
+    def __enter__(self):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise QueueFullError(self.pending, self.retry_after())
+        self.pending += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.pending -= 1
+        return False
+
+
+@dataclass
+class PendingItem:
+    item: Any
+    cost: int
+    key: Hashable
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class MicroBatchScheduler:
+    """
+    Collects items for up to `max_wait_ms` after the first one arrives, then
+    runs the oldest item together with every queued item sharing its batch key
+    (e.g. the same NFE step count) until a size or cost limit is hit.
+    Batches run one at a time: the GPU is the bottleneck, not the event loop.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        max_batch_cost: Optional[int] = None,
+        executor=None,
+    ):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_cost = max_batch_cost
+        self.executor = executor
+
+        self.batches_run = 0
+        self.items_run = 0
+        self.avg_batch_seconds = 0.0  # EWMA, feeds Retry-After estimates
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._backlog: List[PendingItem] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        """Items waiting to be batched (not counting the batch currently running)"""
+        queued = self._queue.qsize() if self._queue is not None else 0
+        return queued + len(self._backlog)
+
+    def estimated_wait(self, pending: Optional[int] = None) -> int:
+        """Seconds until `pending` queued items (default: current depth) would drain"""
+        pending = self.depth if pending is None else pending
+        batches = math.ceil(pending / self.max_batch_size) + 1
+        return max(1, math.ceil(batches * self.avg_batch_seconds))
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, item: Any, cost: int = 1, key: Hashable = None) -> Any:
+        """Queue an item and wait for its result (or exception)"""
+        if self._task is None:
+            raise RuntimeError("Scheduler not started")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(PendingItem(item=item, cost=cost, key=key, future=future))
+        return await future
+
+    # ---------- batching ----------
+
+    def _drain_nowait(self):
+        while True:
+            try:
+                self._backlog.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    def _fits(self, batch: List[PendingItem], pending: PendingItem) -> bool:
+        if not batch:
+            return True
+        if len(batch) >= self.max_batch_size:
+            return False
+        if self.max_batch_cost is None:
+            return True
+        return sum(p.cost for p in batch) + pending.cost <= self.max_batch_cost
+
+    async def _next_batch(self) -> List[PendingItem]:
+        loop = asyncio.get_running_loop()
+        if not self._backlog:
+            self._backlog.append(await self._queue.get())
+
+        deadline = loop.time() + self.max_wait
+        while True:
+            self._drain_nowait()
+            if len(self._backlog) >= self.max_batch_size:
+                break
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                self._backlog.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Callers that gave up (client disconnect) don't need a GPU slot
+        self._backlog = [p for p in self._backlog if not p.future.done()]
+        if not self._backlog:
+            return []
+
+        head_key = self._backlog[0].key
+        batch, rest = [], []
+        for pending in self._backlog:
+            if pending.key == head_key and self._fits(batch, pending):
+                batch.append(pending)
+            else:
+                rest.append(pending)
+        self._backlog = rest
+        return batch
+
+    async def _run_forever(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.run_batch, [p.item for p in batch]
+                )
+                if len(results) != len(batch):
+                    raise RuntimeError(f"run_batch returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                results = [e] * len(batch)
+
+            elapsed = time.monotonic() - started
+            self.avg_batch_seconds = elapsed if not self.batches_run else 0.8 * self.avg_batch_seconds + 0.2 * elapsed
+            self.batches_run += 1
+            self.items_run += len(batch)
+
+            for pending, result in zip(batch, results):
+                if pending.future.done():
+                    continue
+                if isinstance(result, Exception):
+                    pending.future.set_exception(result)
+                else:
+                    pending.future.set_result(result)
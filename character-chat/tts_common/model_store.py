@@ -0,0 +1,243 @@
+"""
+Local model artifact store for the TTS engines.
+
+Cold starts used to fetch weights from the Hugging Face hub (or at least
+resolve them over the network) and unpickle .pt/.bin files. The store keeps a
+pinned, checksummed snapshot of every artifact an engine needs on local disk
+(a baked image layer or a network volume):
+
+    $MODEL_STORE_DIR/<engine>/
+        manifest.json            files, sizes and SHA-256 digests
+        hf/                      Hugging Face cache layout (snapshot_download)
+        converted/<repo>/        pickle weights re-saved as .safetensors
+
+Weights are loaded from .safetensors, which the loaders memory-map instead
+of deserializing. Once a store verifies, activate() switches the hub to
+offline mode so nothing touches the network.
+
+Snapshot at build time (needs network), verify/load at boot (no network):
+
+    python -m tts_common.model_store snapshot chatterbox
+    python -m tts_common.model_store verify chatterbox
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+MODEL_STORE_DIR = os.environ.get("MODEL_STORE_DIR", "/models")
+
+# "full" re-hashes files whose size/mtime changed since the last verified boot,
+# "size" only compares sizes, "off" trusts the manifest
+MODEL_STORE_VERIFY = os.environ.get("MODEL_STORE_VERIFY", "full")
+
+# repo_id -> files to fetch (None = whole repo)
+ENGINE_ARTIFACTS: Dict[str, Dict[str, Optional[List[str]]]] = {
+    "chatterbox": {
+        "ResembleAI/chatterbox": ["ve.safetensors", "t3_cfg.safetensors", "s3gen.safetensors", "tokenizer.json", "conds.pt"],
+    },
+    "f5": {
+        "SWivid/F5-TTS": ["F5TTS_Base/model_1200000.safetensors"],
+        "charactr/vocos-mel-24khz": ["config.yaml", "pytorch_model.bin"],
+    },
+    "fastmaya": {
+        "maya-research/maya1": None,
+        "hubertsiuzdak/snac_24khz": None,
+    },
+}
+
+PICKLE_SUFFIXES = (".bin", ".pt", ".pth", ".ckpt")
+# Small pickles the engines load by exact name (e.g. Chatterbox's conds.pt)
+KEEP_PICKLE = {"conds.pt"}
+
+
+def sha256_file(path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def repo_dirname(repo_id: str) -> str:
+    return repo_id.replace("/", "--")
+
+
+class ModelStoreError(Exception):
+    pass
+
+
+class ModelStore:
+    def __init__(self, engine: str, root: str = MODEL_STORE_DIR):
+        if engine not in ENGINE_ARTIFACTS:
+            raise ModelStoreError(f"Unknown engine '{engine}'")
+        self.engine = engine
+        self.root = os.path.join(root, engine)
+        self.hf_cache = os.path.join(self.root, "hf")
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        self.stamp_path = os.path.join(self.root, ".verified")
+        self._manifest = None
+
+    # ---------- manifest ----------
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            if not os.path.exists(self.manifest_path):
+                raise ModelStoreError(f"No snapshot for {self.engine} at {self.root}")
+            with open(self.manifest_path, "r") as f:
+                self._manifest = json.load(f)
+        return self._manifest
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def repo_path(self, repo_id: str) -> str:
+        """Snapshot directory of a repo (HF cache layout)"""
+        return os.path.join(self.root, self.manifest["repos"][repo_id])
+
+    def converted_path(self, repo_id: str, filename: str) -> str:
+        """Path of a pickle weight file re-saved as .safetensors"""
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        return os.path.join(self.root, "converted", repo_dirname(repo_id), f"{stem}.safetensors")
+
+    # ---------- snapshot (build time, needs network) ----------
+
+    def snapshot(self) -> dict:
+        from huggingface_hub import snapshot_download
+
+        repos = {}
+        for repo_id, files in ENGINE_ARTIFACTS[self.engine].items():
+            print(f"[ModelStore] Fetching {repo_id} for {self.engine}...")
+            local = snapshot_download(repo_id, allow_patterns=files, cache_dir=self.hf_cache)
+            repos[repo_id] = os.path.relpath(local, self.root)
+            self._convert_pickles(repo_id, local)
+
+        files = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                rel = os.path.relpath(path, self.root)
+                if rel in ("manifest.json", ".verified") or "/.locks/" in f"/{rel}" or filename.endswith(".lock"):
+                    continue
+                # HF cache snapshots are symlinks into blobs/; hash the target once
+                if os.path.islink(path) or "/blobs/" not in f"/{rel}":
+                    files[rel] = {"bytes": os.path.getsize(path), "sha256": sha256_file(path)}
+
+        manifest = {"engine": self.engine, "created_at": time.time(), "repos": repos, "files": files}
+        with open(self.manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        self._manifest = manifest
+        self._write_stamp()
+        total = sum(entry["bytes"] for entry in files.values())
+        print(f"[ModelStore] Snapshot of {self.engine}: {len(files)} files, {total / 1e9:.2f} GB")
+        return manifest
+
+    def _convert_pickles(self, repo_id: str, local: str):
+        import torch
+        from safetensors.torch import save_file
+
+        for dirpath, _, filenames in os.walk(local):
+            for filename in filenames:
+                if not filename.endswith(PICKLE_SUFFIXES) or filename in KEEP_PICKLE:
+                    continue
+                state_dict = torch.load(os.path.join(dirpath, filename), map_location="cpu", weights_only=True)
+                if not isinstance(state_dict, dict) or not all(isinstance(v, torch.Tensor) for v in state_dict.values()):
+                    continue
+                out = self.converted_path(repo_id, filename)
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                # safetensors refuses shared storage; clone so each tensor owns its buffer
+                save_file({k: v.contiguous().clone() for k, v in state_dict.items()}, out)
+                print(f"[ModelStore] Converted {filename} -> {os.path.relpath(out, self.root)}")
+
+    # ---------- verify / activate (boot time, offline) ----------
+
+    def _file_state(self) -> dict:
+        state = {}
+        for rel in self.manifest["files"]:
+            st = os.stat(os.path.join(self.root, rel))
+            state[rel] = [st.st_size, st.st_mtime_ns]
+        return state
+
+    def _write_stamp(self):
+        with open(self.stamp_path, "w") as f:
+            json.dump(self._file_state(), f)
+
+    def verify(self, mode: str = MODEL_STORE_VERIFY) -> bool:
+        """Check every manifest file; raises ModelStoreError on mismatch"""
+        if mode == "off":
+            return True
+        files = self.manifest["files"]
+        for rel, entry in files.items():
+            path = os.path.join(self.root, rel)
+            if not os.path.exists(path):
+                raise ModelStoreError(f"{self.engine}: missing {rel}")
+            if os.path.getsize(path) != entry["bytes"]:
+                raise ModelStoreError(f"{self.engine}: size mismatch for {rel}")
+        if mode == "size":
+            return True
+
+        # Skip re-hashing files unchanged since the last successful verification
+        stamp = {}
+        if os.path.exists(self.stamp_path):
+            with open(self.stamp_path, "r") as f:
+                stamp = json.load(f)
+        state = self._file_state()
+        for rel, entry in files.items():
+            if stamp.get(rel) == state[rel]:
+                continue
+            if sha256_file(os.path.join(self.root, rel)) != entry["sha256"]:
+                raise ModelStoreError(f"{self.engine}: checksum mismatch for {rel}")
+        try:
+            self._write_stamp()
+        except OSError:
+            pass  # read-only store (baked image layer): verify again next boot
+        return True
+
+    def activate(self) -> bool:
+        """
+        Verify the snapshot and point the Hugging Face hub at it in offline mode.
+        Returns False (and changes nothing) when there is no snapshot.
+        """
+        if not self.exists():
+            return False
+        started = time.perf_counter()
+        self.verify()
+        os.environ["HF_HUB_CACHE"] = self.hf_cache
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+        print(f"[ModelStore] Using local {self.engine} snapshot at {self.root} "
+              f"(verified in {time.perf_counter() - started:.2f}s, offline)")
+        return True
+
+
+def activate_store(engine: str) -> Optional[ModelStore]:
+    """
+    ModelStore for an engine if a verified snapshot exists, else None so the
+    caller falls back to its regular (network) loader.
+    """
+    store = ModelStore(engine)
+    try:
+        return store if store.activate() else None
+    except ModelStoreError as e:
+        print(f"[ModelStore] WARNING: ignoring {engine} snapshot: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in ("snapshot", "verify"):
+        print(f"Usage: python -m tts_common.model_store snapshot|verify <{'|'.join(ENGINE_ARTIFACTS)}>")
+        sys.exit(1)
+    command, engine = sys.argv[1], sys.argv[2]
+    store = ModelStore(engine)
+    if command == "snapshot":
+        store.snapshot()
+    else:
+        store.verify(mode="full")
+        print(f"[ModelStore] {engine} snapshot OK")
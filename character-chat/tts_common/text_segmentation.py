@@ -0,0 +1,78 @@
+"""
+Sentence / clause segmentation for chunked synthesis.
+
+Splits text at sentence boundaries, merges fragments that are too short to
+synthesize naturally, and breaks over-long sentences at clause boundaries
+(then whitespace) so every segment stays within the engine's comfort zone.
+"""
+
+import re
+from typing import List
+
+SENTENCE_BOUNDARY = re.compile(r"(?:(?<=[.!?…])|(?<=[.!?…][\"')\]]))\s+")
+CLAUSE_BOUNDARY = re.compile(r"(?<=[,;:—])\s+")
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Break a sentence longer than max_chars at clause boundaries, then spaces"""
+    if len(sentence) <= max_chars:
+        return [sentence]
+
+    pieces = []
+    current = ""
+    for clause in CLAUSE_BOUNDARY.split(sentence):
+        candidate = f"{current} {clause}".strip()
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        # A single clause can still be too long: fall back to word wrapping
+        while len(clause) > max_chars:
+            cut = clause.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        current = clause
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_sentences(text: str, min_chars: int = 20, max_chars: int = 250) -> List[str]:
+    """
+    Split text into synthesis segments.
+
+    Segments are whole sentences where possible. Sentences shorter than
+    min_chars are merged into the following one (short fragments like "Oh."
+    sound clipped on their own), and anything longer than max_chars is broken
+    at clause boundaries.
+    """
+    text = " ".join(text.split())
+    if not text:
+        return []
+
+    segments = []
+    pending = ""
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        for piece in _split_long(sentence.strip(), max_chars):
+            if not piece:
+                continue
+            merged = f"{pending} {piece}".strip()
+            if len(merged) < min_chars:
+                pending = merged
+            elif len(merged) <= max_chars:
+                segments.append(merged)
+                pending = ""
+            else:
+                segments.append(pending)
+                pending = piece if len(piece) < min_chars else ""
+                if not pending:
+                    segments.append(piece)
+    if pending:
+        if segments and len(segments[-1]) + len(pending) + 1 <= max_chars:
+            segments[-1] = f"{segments[-1]} {pending}"
+        else:
+            segments.append(pending)
+    return segments
@@ -0,0 +1,205 @@
+"""
+Voice Profile Registry
+
+Loads the archetype anchor profiles (profiles/<id>/profile.json + reference.wav)
+once, validates them, and indexes them by (archetype, gender) so picking an
+anchor is a dict lookup instead of a scan over every profile.
+
+The registry watches profile directories by mtime: calling refresh() (done
+automatically by pick() at most every `reload_interval` seconds) picks up
+added, changed or removed anchors without restarting the worker.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+GENDER_ALIASES = {
+    "m": "male",
+    "male": "male",
+    "f": "female",
+    "female": "female",
+}
+
+
+def normalize_gender(gender) -> str:
+    """Map 'M'/'F'/'male'/'female' (any case) to 'male'/'female', else 'unknown'"""
+    if not gender:
+        return "unknown"
+    return GENDER_ALIASES.get(str(gender).strip().lower(), "unknown")
+
+
+def infer_gender(profile_id: str) -> str:
+    """Fallback for profiles without a gender field: infer from the directory name"""
+    if "female" in profile_id:
+        return "female"
+    if "male" in profile_id:
+        return "male"
+    return "unknown"
+
+
+@dataclass
+class VoiceProfile:
+    """A validated anchor profile and its (optionally decoded) reference audio"""
+    profile_id: str
+    path: str
+    archetype: str
+    gender: str
+    profile: dict
+    reference_path: Optional[str] = None
+    reference_mtime: float = 0.0
+    reference_audio: Optional[object] = field(default=None, repr=False)  # float32 numpy array
+    sample_rate: Optional[int] = None
+
+
+class VoiceRegistry:
+    """Indexed, hot-reloadable view of an anchor profiles directory"""
+
+    def __init__(self, profiles_dir: str, reload_interval: float = 5.0, load_audio: bool = True):
+        self.profiles_dir = profiles_dir
+        self.reload_interval = reload_interval
+        self.load_audio = load_audio
+
+        self.profiles: Dict[str, VoiceProfile] = {}
+        self._signatures: Dict[str, Tuple[float, float]] = {}
+        self._by_key: Dict[Tuple[str, str], List[VoiceProfile]] = {}
+        self._by_archetype: Dict[str, List[VoiceProfile]] = {}
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+
+        self.refresh(force=True)
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def __contains__(self, profile_id):
+        return profile_id in self.profiles
+
+    def get(self, profile_id: str) -> Optional[VoiceProfile]:
+        return self.profiles.get(profile_id)
+
+    # ---------- loading ----------
+
+    def _scan(self) -> Dict[str, Tuple[str, Tuple[float, float]]]:
+        """Return {profile_id: (dir, (profile.json mtime, reference.wav mtime))}"""
+        found = {}
+        if not os.path.isdir(self.profiles_dir):
+            return found
+        for root, _, files in os.walk(self.profiles_dir):
+            if "profile.json" not in files:
+                continue
+            try:
+                json_mtime = os.path.getmtime(os.path.join(root, "profile.json"))
+                ref_file = os.path.join(root, "reference.wav")
+                ref_mtime = os.path.getmtime(ref_file) if os.path.exists(ref_file) else 0.0
+            except OSError:
+                # Directory removed mid-scan; the next refresh will settle it
+                continue
+            found[os.path.basename(root)] = (root, (json_mtime, ref_mtime))
+        return found
+
+    def _load_profile(self, profile_id: str, path: str) -> VoiceProfile:
+        with open(os.path.join(path, "profile.json"), "r") as f:
+            profile = json.load(f)
+
+        archetype = profile.get("base_archetype")
+        if not isinstance(archetype, str) or not archetype:
+            raise ValueError("profile.json is missing 'base_archetype'")
+
+        gender = normalize_gender(profile.get("gender"))
+        if gender == "unknown":
+            gender = infer_gender(profile_id)
+
+        voice = VoiceProfile(
+            profile_id=profile_id,
+            path=path,
+            archetype=archetype,
+            gender=gender,
+            profile=profile,
+        )
+
+        ref_file = os.path.join(path, "reference.wav")
+        if os.path.exists(ref_file):
+            voice.reference_path = ref_file
+            voice.reference_mtime = os.path.getmtime(ref_file)
+            if self.load_audio:
+                import soundfile as sf
+                voice.reference_audio, voice.sample_rate = sf.read(ref_file, dtype="float32")
+        else:
+            print(f"[VoiceRegistry] Warning: {profile_id} has no reference.wav")
+
+        return voice
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload added/changed/removed profiles. Returns True if anything changed."""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.reload_interval:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            found = self._scan()
+            if not found and not os.path.isdir(self.profiles_dir):
+                print(f"[VoiceRegistry] Warning: Profiles directory not found at {self.profiles_dir}")
+
+            profiles = dict(self.profiles)
+            signatures = dict(self._signatures)
+            changed = False
+
+            for profile_id in list(profiles):
+                if profile_id not in found:
+                    print(f"[VoiceRegistry] Removed profile {profile_id}")
+                    del profiles[profile_id]
+                    signatures.pop(profile_id, None)
+                    changed = True
+
+            for profile_id, (path, signature) in found.items():
+                if signatures.get(profile_id) == signature:
+                    continue
+                # Record the signature even on failure so a broken profile is
+                # reported once, not on every refresh
+                signatures[profile_id] = signature
+                changed = True
+                try:
+                    profiles[profile_id] = self._load_profile(profile_id, path)
+                except Exception as e:
+                    print(f"[VoiceRegistry] Error loading profile {path}: {e}")
+                    profiles.pop(profile_id, None)
+
+            if changed:
+                self._rebuild_index(profiles)
+                self._signatures = signatures
+            return changed
+
+    def _rebuild_index(self, profiles: Dict[str, VoiceProfile]):
+        by_key: Dict[Tuple[str, str], List[VoiceProfile]] = {}
+        by_archetype: Dict[str, List[VoiceProfile]] = {}
+        for voice in sorted(profiles.values(), key=lambda v: v.profile_id):
+            by_key.setdefault((voice.archetype, voice.gender), []).append(voice)
+            by_archetype.setdefault(voice.archetype, []).append(voice)
+
+        # Swap in whole objects so concurrent readers never see a partial index
+        self.profiles = profiles
+        self._by_key = by_key
+        self._by_archetype = by_archetype
+
+    # ---------- lookup ----------
+
+    def candidates(self, archetype: str, gender: str = "unknown") -> List[VoiceProfile]:
+        """Gender-matched anchors for an archetype, falling back to any gender"""
+        matches = self._by_key.get((archetype, normalize_gender(gender)))
+        if matches:
+            return matches
+        return self._by_archetype.get(archetype, [])
+
+    def pick(self, archetype: str, gender: str = "unknown", rng=random) -> Optional[VoiceProfile]:
+        """Pick an anchor for (archetype, gender), or None if the archetype is unknown"""
+        self.refresh()
+        matches = self.candidates(archetype, gender)
+        if not matches:
+            return None
+        return rng.choice(matches)
@@ -1,92 +1,246 @@
 import runpod
-import base64
-import io
+import copy
 import os
-import json
-import random
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import torch
-import torchaudio
 
 # Global state
 model = None
-VOICE_PROFILES = {}
+default_conds = None
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROFILES_DIR = os.path.join(BASE_DIR, "profiles")
 
-def load_json(path):
-    with open(path, "r") as f:
-        return json.load(f)
+# Shared TTS helpers live in character-chat/tts_common (copied next to this file in the image)
+sys.path.append(os.path.join(BASE_DIR, "character-chat"))
+from tts_common.audio_cache import audio_cache, is_cacheable, synthesis_key
+from tts_common.audio_encoding import output_options, submit_encode
+from tts_common.model_store import activate_store
+from tts_common.text_segmentation import split_sentences
+from tts_common.voice_registry import VoiceRegistry
 
-def load_all_profiles():
-    """Load all archetype anchor profiles from disk"""
-    profiles = {}
-    if not os.path.exists(PROFILES_DIR):
-        print(f"Warning: Profiles directory not found at {PROFILES_DIR}")
-        return profiles
-        
-    for root, _, files in os.walk(PROFILES_DIR):
-        if "profile.json" in files:
-            try:
-                profile = load_json(os.path.join(root, "profile.json"))
-                pid = os.path.basename(root)
-                profiles[pid] = profile
-            except Exception as e:
-                print(f"Error loading profile {root}: {e}")
-    return profiles
-
-VOICE_PROFILES = load_all_profiles()
-print(f"Loaded {len(VOICE_PROFILES)} voice anchor profiles.")
-
-def pick_anchor(archetype_name, target_gender='unknown'):
-    # Map 'M'/'F' to 'male'/'female'
-    if target_gender.lower() in ['m', 'male']: target_gender = 'male'
-    if target_gender.lower() in ['f', 'female']: target_gender = 'female'
-
-    candidates = []
-    
-    # First pass: try to find exact match (archetype + gender)
-    for pid, profile in VOICE_PROFILES.items():
-        if profile.get("base_archetype") != archetype_name:
+SAMPLE_RATE = 24000
+MAX_TEXT_CHARS = 500
+MAX_STREAM_CHARS = int(os.environ.get("MAX_STREAM_CHARS", "3000"))
+STREAM_CHUNK_CHARS = int(os.environ.get("STREAM_CHUNK_CHARS", "200"))
+
+# Load the model (and encode anchor conditionals) at import instead of on the first job
+EAGER_LOAD = os.environ.get("EAGER_LOAD", "0") == "1"
+
+# Upper bound for resident speaker conditionals (anchors + any custom references)
+CONDITIONING_CACHE_MB = float(os.environ.get("CONDITIONING_CACHE_MB", "512"))
+
+# Synthesis runs on this one thread, so encoding chunk N on the shared encoder
+# pool overlaps synthesis of chunk N+1 when streaming
+INFER_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chatterbox-infer")
+
+VOICE_REGISTRY = VoiceRegistry(
+    PROFILES_DIR,
+    reload_interval=float(os.environ.get("PROFILES_RELOAD_INTERVAL", "5")),
+    # Speaker conditionals are cached below, so the raw clips need not stay resident
+    load_audio=False,
+)
+print(f"Loaded {len(VOICE_REGISTRY)} voice anchor profiles.")
+
+def conditionals_nbytes(conds):
+    """Approximate resident size of a Chatterbox Conditionals object"""
+    tensors = [v for v in vars(conds.t3).values() if isinstance(v, torch.Tensor)]
+    tensors += [v for v in conds.gen.values() if isinstance(v, torch.Tensor)]
+    return sum(t.element_size() * t.nelement() for t in tensors)
+
+class ConditioningCache:
+    """
+    LRU cache of speaker conditionals keyed by (reference wav path, mtime).
+
+    Chatterbox re-encodes the reference clip (voice encoder, S3 tokenizer and
+    mel features) every time audio_prompt_path is passed to generate(). We
+    compute it once per reference and swap the result into tts.conds instead.
+    Entries are evicted least-recently-used once the byte budget is exceeded.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (ref_file, mtime) -> (conds, nbytes)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, tts, ref_file, mtime):
+        key = (ref_file, mtime)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        return self.put(tts, ref_file, mtime)
+
+    def put(self, tts, ref_file, mtime):
+        key = (ref_file, mtime)
+        tts.prepare_conditionals(ref_file)
+        conds = tts.conds
+        nbytes = conditionals_nbytes(conds)
+
+        # A re-recorded reference gets a new key; its stale entry simply ages out
+        if key in self._entries:
+            self.total_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (conds, nbytes)
+        self.total_bytes += nbytes
+
+        # Never evict the entry we just added, even if it alone exceeds the budget
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            evicted, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_bytes
+            print(f"Evicted conditionals for {evicted} ({evicted_bytes / 1e6:.1f} MB)")
+        return conds
+
+CONDITIONING_CACHE = ConditioningCache(int(CONDITIONING_CACHE_MB * 1024 * 1024))
+
+def precompute_conditionals(tts):
+    """Encode every anchor reference once so requests skip it on the hot path"""
+    for voice in list(VOICE_REGISTRY.profiles.values()):
+        key = (voice.reference_path, voice.reference_mtime)
+        if not voice.reference_path or key in CONDITIONING_CACHE:
             continue
-            
-        # Determine profile gender
-        p_gender = profile.get("gender", "").lower()
-        if not p_gender:
-            # Fallback: infer from ID
-            if "male" in pid and "female" not in pid: p_gender = "male"
-            elif "female" in pid: p_gender = "female"
-            
-        if p_gender == target_gender:
-            candidates.append((os.path.join(PROFILES_DIR, pid), profile))
-
-    # Second pass: if no gender match, fallback to just archetype (but log warning)
-    if not candidates:
-        print(f"Warning: No gender-matched anchor for {archetype_name}/{target_gender}. Fallback to any.")
-        for pid, profile in VOICE_PROFILES.items():
-            if profile.get("base_archetype") == archetype_name:
-                candidates.append((os.path.join(PROFILES_DIR, pid), profile))
-
-    if not candidates:
-        return None, None
-
-    return random.choice(candidates)
+        try:
+            CONDITIONING_CACHE.put(tts, *key)
+        except Exception as e:
+            print(f"Error precomputing conditionals for {voice.profile_id}: {e}")
+    print(f"Cached conditionals for {len(CONDITIONING_CACHE)} anchors "
+          f"({CONDITIONING_CACHE.total_bytes / 1e6:.1f} MB).")
 
 def load_model():
     """Load Chatterbox TTS model (cached between requests)"""
-    global model
+    global model, default_conds
     if model is None:
         print("Loading Chatterbox TTS model...")
         from chatterbox import ChatterboxTTS
         # Initialize with CUDA if available
         device = "cuda" if torch.cuda.is_available() else "cpu"
-        model = ChatterboxTTS.from_pretrained(device=device)
+        # Prefer the verified local snapshot (safetensors, mmap, no network)
+        store = activate_store("chatterbox")
+        if store is not None:
+            model = ChatterboxTTS.from_local(store.repo_path("ResembleAI/chatterbox"), device=device)
+        else:
+            model = ChatterboxTTS.from_pretrained(device=device)
+        default_conds = model.conds
         print(f"Model loaded successfully on {device}!")
+        precompute_conditionals(model)
     return model
 
+def use_voice(tts, anchor):
+    """Point tts.conds at the anchor's cached conditionals (or the model default)"""
+    if anchor is not None:
+        # generate() rewrites conds.t3 when exaggeration changes, so hand it a
+        # shallow copy to keep the cached entry untouched.
+        conds = CONDITIONING_CACHE.get(tts, anchor.reference_path, anchor.reference_mtime)
+    else:
+        conds = default_conds
+    tts.conds = copy.copy(conds) if conds is not None else None
+
+def synthesize(tts, text, anchor, language, accent_hint, exaggeration, temperature):
+    with torch.no_grad():
+        if anchor is not None:
+            # Elite Mode: Clone from reference using cached conditionals
+            return tts.generate(
+                text,
+                exaggeration=exaggeration,
+                temperature=temperature
+            )
+        # Legacy Mode: Zero-shot with language/accent
+        return tts.generate(
+            text,
+            language=language,
+            accent_hint=accent_hint,
+            exaggeration=exaggeration,
+            temperature=temperature
+        )
+
+def voice_identity(anchor, language, accent_hint):
+    """Audio cache identity of the voice a request is rendered with"""
+    if anchor is not None:
+        return f"anchor:{anchor.profile_id}:{anchor.reference_mtime}"
+    return f"legacy:{language}:{accent_hint}"
+
+def prepare_piece(text, anchor, language, accent_hint, exaggeration, temperature,
+                  output_format, output_sample_rate, seed, cacheable):
+    """
+    Inference-thread half of rendering one piece of text: the audio cache
+    lookup, else synthesis. Returns (cache key, cached audio, raw audio);
+    a deterministic request that hits the cache never touches the model.
+    """
+    key = None
+    if cacheable:
+        key = synthesis_key(
+            "chatterbox", text, voice_identity(anchor, language, accent_hint), seed,
+            {"exaggeration": exaggeration, "temperature": temperature},
+            output_format, output_sample_rate,
+        )
+        encoded = audio_cache().get(key)
+        if encoded is not None:
+            return key, encoded, None
+
+    tts = load_model()
+    use_voice(tts, anchor)
+    if seed is not None:
+        torch.manual_seed(seed)
+    return key, None, synthesize(tts, text, anchor, language, accent_hint, exaggeration, temperature)
+
+def render(pieces, anchor, language, accent_hint, exaggeration, temperature,
+           output_format, output_sample_rate, seed, cacheable):
+    """
+    Synthesize and encode pieces of text in order, yielding the response
+    audio fields of each. Synthesis runs on INFER_EXECUTOR and encoding on
+    the shared encoder pool, so piece N is encoded (and yielded) while
+    piece N+1 is already being synthesized.
+    """
+    voice_args = (anchor, language, accent_hint, exaggeration, temperature,
+                  output_format, output_sample_rate, seed, cacheable)
+    upcoming = INFER_EXECUTOR.submit(prepare_piece, pieces[0], *voice_args)
+    for i in range(len(pieces)):
+        key, encoded, audio = upcoming.result()
+        if i + 1 < len(pieces):
+            upcoming = INFER_EXECUTOR.submit(prepare_piece, pieces[i + 1], *voice_args)
+        if encoded is not None:
+            yield audio_fields(encoded, cached=True)
+            continue
+        encoded = submit_encode(audio, SAMPLE_RATE, output_format, output_sample_rate).result()
+        if key is not None:
+            audio_cache().put(key, encoded)
+        yield audio_fields(encoded, cached=False)
+
+def audio_fields(encoded, cached):
+    return {
+        "audio_base64": encoded.to_base64(),
+        "sample_rate": encoded.sample_rate,
+        "format": encoded.format,
+        "cached": cached,
+    }
+
 def handler(event):
+    """
+    Generator handler (RunPod streaming).
+
+    Default requests yield a single result. With "stream": true the text is
+    split at sentence boundaries and each chunk is yielded as soon as it is
+    synthesized, tagged with "seq" and "final" so clients can start playback
+    on the first chunk. Chunks are consumed via /stream/{job_id}; /run and
+    /runsync return the aggregated list (return_aggregate_stream), so
+    non-streaming callers get a one-element list, not the bare object the
+    handler returned before it streamed.
+    """
     try:
         input_data = event.get("input", {})
         text = input_data.get("text", "Hello!")
+        stream = bool(input_data.get("stream", False))
         
         # New "Elite" parameters
         archetype = input_data.get("archetype")
@@ -98,70 +252,64 @@ def handler(event):
         accent_hint = input_data.get("accent_hint", "")
         exaggeration = input_data.get("exaggeration", 0.5)
         temperature = input_data.get("temperature", 0.8)
+
+        # A fixed seed (or "cache": true) makes the request eligible for the audio cache
+        seed = input_data.get("seed")
+        seed = None if seed in (None, -1) else int(seed)
+        cacheable = is_cacheable(input_data)
+
+        # Output encoding: wav (default), flac, opus/ogg, mp3 or pcm
+        output_format, output_sample_rate = output_options(input_data)
         
-        if len(text) > 500: text = text[:500]
+        # Chunked synthesis keeps each generate() call short, so streaming
+        # requests may carry a full assistant reply
+        max_chars = MAX_STREAM_CHARS if stream else MAX_TEXT_CHARS
+        if len(text) > max_chars: text = text[:max_chars]
         
         print(f"Synthesizing for {character_id} ({archetype}/{gender}): '{text[:30]}...'")
         
-        tts = load_model()
-        
         # Try to use Elite Archetype System
-        audio_prompt_path = None
+        anchor = None
         if archetype:
-            anchor_path, profile = pick_anchor(archetype, gender)
-            if anchor_path:
-                ref_file = os.path.join(anchor_path, "reference.wav")
-                if os.path.exists(ref_file):
-                    audio_prompt_path = ref_file
-                    print(f"Using Elite Anchor: {os.path.basename(anchor_path)}")
-        
-        # Generate
-        with torch.no_grad():
-            if audio_prompt_path:
-                # Elite Mode: Clone from reference
-                print(f"Generating with reference audio: {audio_prompt_path}")
-                audio = tts.generate(
-                    text,
-                    audio_prompt_path=audio_prompt_path,
-                    exaggeration=exaggeration,
-                    temperature=temperature
-                )
+            anchor = VOICE_REGISTRY.pick(archetype, gender)
+            if anchor and anchor.reference_path:
+                print(f"Using Elite Anchor: {anchor.profile_id}")
             else:
-                # Legacy Mode: Zero-shot with language/accent
-                print(f"Generating with legacy mode (lang={language})")
-                audio = tts.generate(
-                    text,
-                    language=language,
-                    accent_hint=accent_hint,
-                    exaggeration=exaggeration,
-                    temperature=temperature
-                )
-        
-        # Convert to WAV bytes
-        buffer = io.BytesIO()
-        # Ensure audio is CPU tensor and correct shape
-        if isinstance(audio, torch.Tensor):
-            audio = audio.cpu()
-        
-        # torchaudio.save expects (C, T)
-        if audio.dim() == 1:
-            audio = audio.unsqueeze(0)
-            
-        torchaudio.save(buffer, audio, 24000, format="wav")
-        buffer.seek(0)
-        
-        audio_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-        
-        return {
-            "audio_base64": audio_base64,
-            "sample_rate": 24000,
-            "format": "wav",
-            "used_anchor": os.path.basename(audio_prompt_path) if audio_prompt_path else "legacy"
-        }
+                anchor = None
+
+        if anchor is not None:
+            print(f"Generating with reference audio: {anchor.reference_path}")
+        else:
+            print(f"Generating with legacy mode (lang={language})")
+        used_anchor = os.path.basename(anchor.reference_path) if anchor else "legacy"
+        voice_args = (anchor, language, accent_hint, exaggeration, temperature,
+                      output_format, output_sample_rate, seed, cacheable)
+
+        if not stream:
+            fields, = render([text], *voice_args)
+            yield {
+                **fields,
+                "used_anchor": used_anchor
+            }
+            return
+
+        # Chunks are cached individually, so recurring sentences hit across replies
+        chunks = split_sentences(text, max_chars=STREAM_CHUNK_CHARS) or [text]
+        for seq, (chunk, fields) in enumerate(zip(chunks, render(chunks, *voice_args))):
+            yield {
+                "seq": seq,
+                "final": seq == len(chunks) - 1,
+                "text": chunk,
+                **fields,
+                "used_anchor": used_anchor
+            }
         
     except Exception as e:
         print(f"Error: {str(e)}")
         # Return error structure RunPod expects
-        return {"error": str(e)}
+        yield {"error": str(e)}
+
+if EAGER_LOAD:
+    load_model()
 
-runpod.serverless.start({"handler": handler})
+runpod.serverless.start({"handler": handler, "return_aggregate_stream": True})